@@ -0,0 +1,98 @@
+"""Stored comment sort keys (score, best, controversial) with per-post indexes
+
+Revision ID: 20261019_01
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+Databases created by init_db.py (create_all) after this change already
+have these columns; the upgrade skips whatever exists, so it is safe to
+run either way.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "20261019_01"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    sa.Column("score", sa.Integer(), nullable=False, server_default="0"),
+    sa.Column("best_score", sa.Float(), nullable=False, server_default="0"),
+    sa.Column("controversial_score", sa.Float(), nullable=False, server_default="0"),
+]
+
+INDEXES = {
+    "idx_comments_post_score": ["post_id", "score", "created_at"],
+    "idx_comments_post_best": ["post_id", "best_score", "created_at"],
+    "idx_comments_post_controversial": ["post_id", "controversial_score", "created_at"],
+    "idx_comments_post_created": ["post_id", "created_at"],
+}
+
+# Same formulas as app/services/comment_ranking.py (z = 1.281551565545)
+BACKFILL_POSTGRES = """
+UPDATE comments SET
+    score = COALESCE(upvotes, 0) - COALESCE(downvotes, 0),
+    best_score = CASE WHEN COALESCE(upvotes, 0) + COALESCE(downvotes, 0) = 0 THEN 0 ELSE (
+        p + 1.642374415149 / (2 * n) - 1.281551565545 * sqrt((p * (1 - p) + 1.642374415149 / (4 * n)) / n)
+    ) / (1 + 1.642374415149 / n) END,
+    controversial_score = CASE WHEN COALESCE(upvotes, 0) > 0 AND COALESCE(downvotes, 0) > 0 THEN
+        power(upvotes + downvotes,
+              CASE WHEN upvotes > downvotes THEN downvotes::float / upvotes
+                   ELSE upvotes::float / downvotes END)
+    ELSE 0 END
+FROM (
+    SELECT comment_id AS id,
+           (COALESCE(upvotes, 0) + COALESCE(downvotes, 0))::float AS n,
+           COALESCE(upvotes, 0)::float / GREATEST(COALESCE(upvotes, 0) + COALESCE(downvotes, 0), 1) AS p
+    FROM comments
+) AS v
+WHERE comments.comment_id = v.id
+"""
+
+
+def _backfill(bind):
+    if bind.dialect.name == "postgresql":
+        op.execute(BACKFILL_POSTGRES)
+        return
+
+    from app.services.comment_ranking import comment_scores
+
+    comments = sa.table(
+        "comments",
+        sa.column("comment_id"), sa.column("upvotes"), sa.column("downvotes"),
+        sa.column("score"), sa.column("best_score"), sa.column("controversial_score"),
+    )
+    rows = bind.execute(sa.select(comments.c.comment_id, comments.c.upvotes, comments.c.downvotes)).all()
+    for comment_id, up, down in rows:
+        bind.execute(
+            comments.update().where(comments.c.comment_id == comment_id).values(**comment_scores(up, down))
+        )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = {c["name"] for c in inspector.get_columns("comments")}
+    added = False
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column("comments", column.copy())
+            added = True
+    if added:
+        _backfill(bind)
+
+    existing_indexes = {ix["name"] for ix in inspector.get_indexes("comments")}
+    for name, columns in INDEXES.items():
+        if name not in existing_indexes:
+            op.create_index(name, "comments", columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="comments")
+    for column in COLUMNS:
+        op.drop_column("comments", column.name)
@@ -0,0 +1,30 @@
+"""Backfill the denormalized post and comment counters
+
+Revision ID: 20261019_02
+Revises: 20261019_01
+Create Date: 2026-10-19 00:00:00
+
+Reads use the stored faces/posts/agents counter columns instead of live
+COUNT queries, but older databases never maintained them. This sets each
+one from a full count once; the periodic reconciler keeps them correct
+afterwards.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20261019_02"
+down_revision: Union[str, None] = "20261019_01"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    from app.services.counters import recount_all
+
+    recount_all(op.get_bind())
+
+
+def downgrade() -> None:
+    pass  # the counts stay valid
@@ -0,0 +1,35 @@
+"""Drop the post/comment count triggers from database/schema.sql
+
+Revision ID: 20261019_03
+Revises: 20261019_02
+Create Date: 2026-10-19 00:00:00
+
+The API increments these counters itself when it creates posts and
+comments, so on databases loaded from schema.sql the triggers counted
+every write twice. Only Postgres databases built from that file have them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20261019_03"
+down_revision: Union[str, None] = "20261019_02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP TRIGGER IF EXISTS trigger_update_post_counts ON posts")
+    op.execute("DROP TRIGGER IF EXISTS trigger_update_comment_counts ON comments")
+    op.execute("DROP FUNCTION IF EXISTS update_counts()")
+    # Undo anything the triggers double-counted
+    from app.services.counters import recount_all
+
+    recount_all(op.get_bind())
+
+
+def downgrade() -> None:
+    pass  # the API maintains the counters; the triggers are not restored
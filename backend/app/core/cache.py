@@ -0,0 +1,76 @@
+"""
+Synapse Response Cache
+Short-TTL cache for pre-encoded response bodies.
+Uses Redis if available, falls back to a bounded in-process LRU.
+"""
+
+import threading
+import time as _time
+from collections import OrderedDict
+from typing import Optional
+
+CACHE_PREFIX = "respcache:"
+
+
+class ResponseCache:
+    """
+    Stores response payloads as raw bytes so a hit costs no serialization.
+
+    The Redis client passed in must be created WITHOUT decode_responses,
+    otherwise binary payloads would be decoded to str on read.
+    """
+
+    def __init__(self, redis_client=None, max_entries: int = 512):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached payload, or None on a miss or expiry."""
+        if self.redis is not None:
+            try:
+                return self.redis.get(CACHE_PREFIX + key)
+            except Exception:
+                pass  # Redis failed, fall through to in-memory
+
+        now = _time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: bytes, ttl: int):
+        """Store a payload for `ttl` seconds."""
+        if self.redis is not None:
+            try:
+                self.redis.setex(CACHE_PREFIX + key, ttl, payload)
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            self._entries[key] = (_time.monotonic() + ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, prefix: str):
+        """Drop every entry whose key starts with `prefix`."""
+        if self.redis is not None:
+            try:
+                keys = list(self.redis.scan_iter(match=f"{CACHE_PREFIX}{prefix}*", count=500))
+                if keys:
+                    self.redis.delete(*keys)
+            except Exception:
+                pass
+
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
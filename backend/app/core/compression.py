@@ -0,0 +1,173 @@
+"""
+Synapse Response Compression
+Negotiated gzip/brotli compression middleware plus helpers for serving
+payloads that were compressed ahead of time (cache entries, static files).
+"""
+
+import gzip
+import hashlib
+import os
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is in requirements.txt
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # fast enough for per-request compression
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/",
+    "application/javascript",
+    "application/xml",
+)
+
+# Preference order when the client accepts several encodings equally
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+# ============================================
+# NEGOTIATION & CODECS
+# ============================================
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the best supported encoding from an Accept-Encoding header.
+
+    Returns:
+        "br", "gzip", or None for identity
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(payload: bytes, encoding: str, best: bool = False) -> bytes:
+    """Compress payload with the given encoding. `best` trades CPU for ratio."""
+    if encoding == "br":
+        return brotli.compress(payload, quality=11 if best else BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(payload, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def precompress(payload: bytes, best: bool = False) -> Dict[str, bytes]:
+    """Return {encoding: body} for identity plus every supported encoding."""
+    variants = {"identity": payload}
+    if len(payload) >= COMPRESSION_MIN_SIZE:
+        for encoding in SUPPORTED_ENCODINGS:
+            variants[encoding] = compress(payload, encoding, best=best)
+    return variants
+
+
+class PrecompressedAsset:
+    """An in-memory payload held in every supported encoding, with an ETag."""
+
+    def __init__(self, payload: bytes, media_type: str):
+        self.media_type = media_type
+        self.variants = precompress(payload, best=True)
+        self.etag = '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+
+    def select(self, accept_encoding: Optional[str]):
+        """Return (body, content_encoding or None) for the request."""
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding and encoding in self.variants:
+            return self.variants[encoding], encoding
+        return self.variants["identity"], None
+
+
+def _append_vary(headers: list):
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (name, value + b", Accept-Encoding")
+            return
+    headers.append((b"vary", b"Accept-Encoding"))
+
+
+# ============================================
+# MIDDLEWARE
+# ============================================
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli or gzip.
+
+    Skips responses below `minimum_size`, non-compressible content types,
+    and responses that already carry a Content-Encoding (precompressed).
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = None
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(body_parts)
+            headers = [(k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"]
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+            _append_vary(headers)
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
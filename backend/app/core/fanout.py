@@ -0,0 +1,109 @@
+"""
+Synapse After-Commit Fan-out
+Side effects of a write that its caller does not wait for (audit rows,
+@mention and follower webhook dispatch) run after the request's
+transaction has committed, on a small dedicated thread pool with their own
+database sessions. The request returns as soon as its own transaction is
+done.
+
+Each job is called as job(db, *args) with a fresh session that is
+committed afterwards, or rolled back if the job raises. When more than
+FANOUT_QUEUE_LIMIT jobs are pending, submit() runs the job inline instead:
+a burst of writes slows down rather than dropping audit rows.
+FANOUT_WORKERS=0 always runs jobs inline.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.metrics import FANOUT_FAILURES, FANOUT_QUEUE_DEPTH
+
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "2"))  # 0 runs jobs inline
+FANOUT_QUEUE_LIMIT = int(os.getenv("FANOUT_QUEUE_LIMIT", "1000"))  # pending jobs before running inline
+
+
+class FanoutQueue:
+    """Bounded after-commit job queue with per-job database sessions."""
+
+    def __init__(self, workers: int = FANOUT_WORKERS, queue_limit: int = FANOUT_QUEUE_LIMIT,
+                 session_factory=None):
+        self.workers = max(0, workers)
+        self.queue_limit = queue_limit
+        self.session_factory = session_factory
+        self._executor = None
+        self._pending = 0
+        self._idle = threading.Condition()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._idle:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="synapse-fanout"
+                )
+            return self._executor
+
+    def submit(self, job, *args):
+        """Run job(db, *args) in the background (inline when disabled or saturated)."""
+        with self._idle:
+            inline = self.workers == 0 or self._pending >= self.queue_limit
+            if not inline:
+                self._pending += 1
+        if inline:
+            self._run(job, args)
+            return
+        FANOUT_QUEUE_DEPTH.inc()
+        try:
+            self._get_executor().submit(self._run_pending, job, args)
+        except BaseException:
+            self._release()
+            raise
+
+    def _run_pending(self, job, args):
+        try:
+            self._run(job, args)
+        finally:
+            self._release()
+
+    def _release(self):
+        FANOUT_QUEUE_DEPTH.dec()
+        with self._idle:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _run(self, job, args):
+        factory = self.session_factory
+        if factory is None:
+            from app.database import SessionLocal
+            factory = SessionLocal
+        name = getattr(job, "__name__", "job")
+        db = factory()
+        try:
+            job(db, *args)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            FANOUT_FAILURES.inc(name)
+            print(f"⚠️ Fan-out job {name} failed: {e}")
+        finally:
+            db.close()
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Wait until no jobs are pending. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def shutdown(self):
+        """Finish pending jobs, then stop the workers."""
+        with self._idle:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+fanout = FanoutQueue()
@@ -0,0 +1,191 @@
+"""
+Synapse Key Hashing Pool
+PBKDF2 is deliberately slow (tens of ms of CPU per call), so register and
+login run it on a small dedicated thread pool instead of the event loop.
+The pool is bounded twice: HASH_WORKERS threads do the work and at most
+HASH_QUEUE_LIMIT jobs may be pending. Past that, callers get a 503 at
+once rather than queueing behind a login storm while feed reads starve.
+
+Login also has a cheap failure throttle per (client IP, username) that is
+checked before any hashing, so repeated bad keys from one address stop
+costing CPU. Behind a proxy the client IP is only the real one when uvicorn
+trusts its X-Forwarded-For (--forwarded-allow-ips); otherwise every client
+shares the proxy's address.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from app.core.metrics import HASH_QUEUE_DEPTH, HASH_REJECTIONS
+from app.core.security import RateLimitExceeded, hash_api_key, verify_api_key
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))  # running + waiting jobs
+LOGIN_FAILURE_LIMIT = int(os.getenv("LOGIN_FAILURE_LIMIT", "10"))  # failed logins per IP and username...
+LOGIN_FAILURE_WINDOW = int(os.getenv("LOGIN_FAILURE_WINDOW", "300"))  # ...per this many seconds
+
+
+class HashPoolBusy(HTTPException):
+    """Raised when the hashing queue is full."""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy. Please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+
+class HashPool:
+    """Bounded executor for key hashing with a hard cap on pending jobs."""
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self.workers = max(1, workers)
+        self.queue_limit = max(self.workers, queue_limit)
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="synapse-hash"
+                    )
+        return self._executor
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+        HASH_QUEUE_DEPTH.dec()
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on the pool, or raise HashPoolBusy if the queue is full."""
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                HASH_REJECTIONS.inc()
+                raise HashPoolBusy()
+            self._pending += 1
+        HASH_QUEUE_DEPTH.inc()
+        try:
+            # Run in a copy of the caller's context so timed_phase("auth") lands in its RequestStats
+            future = self._get_executor().submit(contextvars.copy_context().run, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Release on completion, not on await: a cancelled request must not
+        # free its slot while the thread is still hashing.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hash_pool = HashPool()
+
+
+async def hash_api_key_async(api_key: str) -> tuple[str, str]:
+    """hash_api_key on the hashing pool."""
+    return await hash_pool.run(hash_api_key, api_key)
+
+
+async def verify_api_key_async(plain_key: str, hashed_key: str) -> bool:
+    """verify_api_key on the hashing pool."""
+    return await hash_pool.run(verify_api_key, plain_key, hashed_key)
+
+
+# ============================================
+# LOGIN FAILURE THROTTLE
+# ============================================
+
+_memory_failures: dict = {}  # "ip:username" -> (count, window_start)
+_memory_failures_lock = threading.Lock()
+
+
+def _failure_name(ip: str, username: str) -> str:
+    return f"{ip}:{username.lower()}"
+
+
+def _failure_key(name: str) -> str:
+    return f"login_fail:{name}"
+
+
+def check_login_throttle(redis_client, ip: str, username: str, limit: Optional[int] = None,
+                         window: Optional[int] = None):
+    """Raise RateLimitExceeded if `ip` has too many recent failed logins as `username`. Never hashes."""
+    if not ip:
+        return
+    name = _failure_name(ip, username)
+    limit = LOGIN_FAILURE_LIMIT if limit is None else limit
+    window = LOGIN_FAILURE_WINDOW if window is None else window
+    if redis_client is not None:
+        try:
+            count = redis_client.get(_failure_key(name))
+            if count is not None and int(count) >= limit:
+                raise RateLimitExceeded()
+            return
+        except RateLimitExceeded:
+            raise
+        except Exception:
+            pass  # Redis failed, fall through to in-memory
+
+    now = time.time()
+    with _memory_failures_lock:
+        entry = _memory_failures.get(name)
+        if entry and now - entry[1] <= window and entry[0] >= limit:
+            raise RateLimitExceeded()
+
+
+def record_login_failure(redis_client, ip: str, username: str, window: Optional[int] = None):
+    """Count a failed login as `username` from `ip` for the current window."""
+    if not ip:
+        return
+    name = _failure_name(ip, username)
+    window = LOGIN_FAILURE_WINDOW if window is None else window
+    if redis_client is not None:
+        try:
+            key = _failure_key(name)
+            if redis_client.incr(key) == 1:
+                redis_client.expire(key, window)
+            return
+        except Exception:
+            pass
+
+    now = time.time()
+    with _memory_failures_lock:
+        if len(_memory_failures) > 1000:
+            for stale in [k for k, (_, start) in _memory_failures.items() if now - start > window]:
+                del _memory_failures[stale]
+        count, start = _memory_failures.get(name, (0, now))
+        if now - start > window:
+            count, start = 0, now
+        _memory_failures[name] = (count + 1, start)
+
+
+def clear_login_failures(redis_client, ip: str, username: str):
+    """Forget failures for `username` from `ip` after it logs in."""
+    if not ip:
+        return
+    name = _failure_name(ip, username)
+    if redis_client is not None:
+        try:
+            redis_client.delete(_failure_key(name))
+        except Exception:
+            pass
+    with _memory_failures_lock:
+        _memory_failures.pop(name, None)
@@ -0,0 +1,212 @@
+"""
+Synapse Idempotency Keys
+Stored responses for write requests sent with an Idempotency-Key header,
+so a client retrying after a timeout gets the original response instead
+of a second post, comment or vote toggle.
+
+Records are keyed by (agent, key). The first request claims the key with
+a short-lived pending record (IDEMPOTENCY_LOCK_TTL, so a crashed worker
+does not hold it forever); when its write succeeds the status code and
+encoded body replace it for IDEMPOTENCY_TTL seconds. Requests that fail
+release the key, so a retry runs the write again. Each record carries a
+fingerprint of the route and request body: reusing a key for a different
+request is an error, not a replay.
+
+Uses Redis if available (SET NX claims the key across workers). Without
+it, records live in the idempotency_keys table, whose unique (agent, key)
+constraint makes the claim atomic, so a retry that lands on another worker
+or a restarted process is still replayed. Only if the database is
+unreachable too does a bounded in-process dict take over.
+"""
+
+import hashlib
+import os
+import threading
+import time as _time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models.idempotency import IdempotencyKey
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))  # seconds a stored response is replayed
+IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", "30"))  # seconds a pending claim is held
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10"))  # seconds a duplicate waits for the first
+
+MAX_KEY_LENGTH = 255
+KEY_PREFIX = "idem:"
+
+
+class Record(NamedTuple):
+    fingerprint: str
+    status_code: Optional[int]  # None while the first request is in flight
+    body: bytes = b""
+
+    @property
+    def pending(self) -> bool:
+        return self.status_code is None
+
+
+def fingerprint(scope: str, payload: bytes) -> str:
+    """Digest identifying the request a key was first used for."""
+    return hashlib.sha256(scope.encode() + b"\0" + payload).hexdigest()[:32]
+
+
+class IdempotencyStore:
+    """Claims, stored responses and releases for idempotency keys."""
+
+    def __init__(self, redis_client=None, session_factory=None, max_entries: int = 10000):
+        self.redis = redis_client
+        self.session_factory = session_factory  # None means app.database.SessionLocal
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, Record)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(agent_id: str, key: str) -> str:
+        return f"{agent_id}:{key}"
+
+    def claim(self, agent_id: str, key: str, digest: str) -> Optional[Record]:
+        """
+        Claim the key for a new request. Returns None if this caller now owns
+        it, otherwise the existing (pending or completed) record.
+        """
+        name = self._key(agent_id, key)
+        pending = Record(digest, None)
+        if self.redis is not None:
+            try:
+                for _ in range(2):  # the holder may release between SET and GET
+                    if self.redis.set(KEY_PREFIX + name, _encode(pending), nx=True, ex=IDEMPOTENCY_LOCK_TTL):
+                        return None
+                    raw = self.redis.get(KEY_PREFIX + name)
+                    if raw is not None:
+                        return _decode(raw)
+                return None
+            except Exception:
+                pass  # Redis failed, fall through to the database
+
+        try:
+            return self._db_claim(agent_id, key, digest)
+        except Exception:
+            pass  # database failed, fall through to in-memory
+
+        now = _time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] >= now:
+                return entry[1]
+            self._put(name, now + IDEMPOTENCY_LOCK_TTL, pending)
+            return None
+
+    def complete(self, agent_id: str, key: str, digest: str, status_code: int, body: bytes):
+        """Store the response for replay."""
+        name = self._key(agent_id, key)
+        record = Record(digest, status_code, body)
+        if self.redis is not None:
+            try:
+                self.redis.set(KEY_PREFIX + name, _encode(record), ex=IDEMPOTENCY_TTL)
+                return
+            except Exception:
+                pass
+
+        try:
+            self._db_write(agent_id, key, update(IdempotencyKey).values(
+                fingerprint=digest, status_code=status_code, body=body,
+                expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL),
+            ))
+            return
+        except Exception:
+            pass
+
+        with self._lock:
+            self._put(name, _time.monotonic() + IDEMPOTENCY_TTL, record)
+
+    def release(self, agent_id: str, key: str):
+        """Drop a pending claim so the request can be retried."""
+        name = self._key(agent_id, key)
+        if self.redis is not None:
+            try:
+                self.redis.delete(KEY_PREFIX + name)
+                return
+            except Exception:
+                pass
+
+        try:
+            self._db_write(agent_id, key, delete(IdempotencyKey))
+            return
+        except Exception:
+            pass
+
+        with self._lock:
+            self._entries.pop(name, None)
+
+    # ---- database ----
+
+    def _session(self):
+        factory = self.session_factory
+        if factory is None:
+            from app.database import SessionLocal
+            factory = SessionLocal
+        return factory()
+
+    def _db_claim(self, agent_id: str, key: str, digest: str) -> Optional[Record]:
+        agent_uuid, now = uuid.UUID(agent_id), datetime.utcnow()
+        where = (IdempotencyKey.agent_id == agent_uuid, IdempotencyKey.key == key)
+        db = self._session()
+        try:
+            for _ in range(2):  # another worker may claim or release in between
+                row = db.execute(
+                    select(IdempotencyKey.fingerprint, IdempotencyKey.status_code,
+                           IdempotencyKey.body, IdempotencyKey.expires_at)
+                    .where(*where)
+                ).first()
+                if row is not None and row.expires_at >= now:
+                    return Record(row.fingerprint, row.status_code, row.body or b"")
+                if row is not None:  # expired, as good as none
+                    db.execute(delete(IdempotencyKey).where(*where, IdempotencyKey.expires_at < now))
+                db.add(IdempotencyKey(agent_id=agent_uuid, key=key, fingerprint=digest,
+                                      expires_at=now + timedelta(seconds=IDEMPOTENCY_LOCK_TTL)))
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    db.rollback()  # lost the race on the unique key; read the winner's record
+            return None
+        finally:
+            db.close()
+
+    def _db_write(self, agent_id: str, key: str, statement):
+        db = self._session()
+        try:
+            db.execute(statement.where(IdempotencyKey.agent_id == uuid.UUID(agent_id),
+                                       IdempotencyKey.key == key))
+            db.commit()
+        finally:
+            db.close()
+
+    def _put(self, name: str, expires_at: float, record: Record):
+        self._entries[name] = (expires_at, record)
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _encode(record: Record) -> str:
+    status_code = "" if record.status_code is None else str(record.status_code)
+    return f"{record.fingerprint}|{status_code}|{record.body.decode('utf-8')}"
+
+
+def _decode(raw: str) -> Record:
+    digest, status_code, body = raw.split("|", 2)
+    return Record(digest, int(status_code) if status_code else None, body.encode("utf-8"))
+
+
+idempotency_store = IdempotencyStore()
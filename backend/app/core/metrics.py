@@ -0,0 +1,344 @@
+"""
+Synapse Metrics
+In-process Prometheus-style metrics: request counts, latency histograms,
+in-flight requests, per-request SQL counts/time, Redis latency, webhook
+and key-hashing queue depth and rate-limit rejections. Rendered in the
+Prometheus text exposition format by GET /metrics.
+
+Collection is a few dict updates under a lock per request plus two
+perf_counter() calls per SQL statement, cheap enough to leave on.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds. Covers cache hits (sub-ms) through slow feed pages.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+
+# ============================================
+# PRIMITIVES
+# ============================================
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labels=()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, v in items:
+            lines.append(f"{self.name}{_label_str(self.labels, values)} {_fmt(v)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *label_values) -> int:
+        series = self._series.get(label_values)
+        return series[-1] if series else 0
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for values, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, values, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labels, values, inf)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, values)} {_fmt(series[-2])}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, values)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "synapse_http_requests_total", "HTTP requests by route template, method and status.",
+    ("method", "route", "status")))
+HTTP_LATENCY = registry.register(Histogram(
+    "synapse_http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route")))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "synapse_http_requests_in_flight", "Requests currently being handled."))
+DB_QUERIES = registry.register(Histogram(
+    "synapse_db_queries_per_request", "SQL statements executed per request.",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS))
+DB_TIME = registry.register(Histogram(
+    "synapse_db_time_per_request_seconds", "Time spent in SQL per request.",
+    ("method", "route")))
+DB_QUERIES_TOTAL = registry.register(Counter(
+    "synapse_db_queries_total", "SQL statements executed, by route template.",
+    ("route",)))
+HASH_QUEUE_DEPTH = registry.register(Gauge(
+    "synapse_hash_queue_depth", "API key hash/verify jobs running or waiting on the hashing pool."))
+HASH_REJECTIONS = registry.register(Counter(
+    "synapse_hash_rejections_total", "Hash jobs refused because the hashing queue was full."))
+REDIS_LATENCY = registry.register(Histogram(
+    "synapse_redis_command_duration_seconds", "Redis command latency.",
+    ("command",), buckets=REDIS_BUCKETS))
+REDIS_ERRORS = registry.register(Counter(
+    "synapse_redis_errors_total", "Redis commands that raised.", ("command",)))
+WEBHOOK_QUEUE = registry.register(Gauge(
+    "synapse_webhook_queue_depth", "Webhook deliveries dispatched but not finished."))
+WEBHOOK_DELIVERIES = registry.register(Counter(
+    "synapse_webhook_deliveries_total", "Webhook POSTs by outcome.", ("outcome",)))
+FANOUT_QUEUE_DEPTH = registry.register(Gauge(
+    "synapse_fanout_queue_depth", "After-commit fan-out jobs running or waiting."))
+FANOUT_FAILURES = registry.register(Counter(
+    "synapse_fanout_failures_total", "After-commit fan-out jobs that raised, by job.", ("job",)))
+IDEMPOTENT_REPLAYS = registry.register(Counter(
+    "synapse_idempotent_replays_total", "Writes answered with a stored Idempotency-Key response, by scope.",
+    ("scope",)))
+RATE_LIMIT_REJECTIONS = registry.register(Counter(
+    "synapse_rate_limit_rejections_total", "Requests rejected with 429, by route template.",
+    ("route",)))
+
+
+# ============================================
+# PER-REQUEST SQL ACCOUNTING
+# ============================================
+
+class RequestStats:
+    """SQL statement count/time and named phase timings for one request (or one tracked block)."""
+
+    __slots__ = ("queries", "db_time", "statements", "phases")
+
+    def __init__(self, record_statements: bool = False):
+        self.queries = 0
+        self.db_time = 0.0
+        # (sql, seconds) tuples, only kept when a caller asked for them
+        self.statements = [] if record_statements else None
+        self.phases: Dict[str, float] = {}  # e.g. auth/serialize/sanitize -> seconds
+
+
+current_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "synapse_request_stats", default=None
+)
+
+
+@contextmanager
+def timed_phase(name: str):
+    """Add the block's wall time to the current request's `name` phase (no-op outside a request)."""
+    stats = current_stats.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.phases[name] = stats.phases.get(name, 0.0) + (time.perf_counter() - start)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.queries += 1
+    stats.db_time += elapsed
+    if stats.statements is not None:
+        stats.statements.append((statement, elapsed))
+
+
+# ============================================
+# REDIS & WEBHOOK HOOKS
+# ============================================
+
+def instrument_redis(client):
+    """Time every command issued through `client` (wraps execute_command in place)."""
+    if client is None or getattr(client, "_synapse_instrumented", False):
+        return client
+    execute = client.execute_command
+
+    def timed_execute(*args, **options):
+        command = str(args[0]).upper() if args else "UNKNOWN"
+        start = time.perf_counter()
+        try:
+            return execute(*args, **options)
+        except Exception:
+            REDIS_ERRORS.inc(command)
+            raise
+        finally:
+            REDIS_LATENCY.observe(time.perf_counter() - start, command)
+
+    client.execute_command = timed_execute
+    client._synapse_instrumented = True
+    return client
+
+
+# ============================================
+# MIDDLEWARE & EXPOSITION
+# ============================================
+
+def route_label(scope) -> str:
+    """Route template (e.g. /api/v1/posts/{post_id}) so labels stay low-cardinality."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route count, latency, status and SQL usage.
+
+    Installs a RequestStats in `current_stats` for the request; sync
+    endpoints run in a worker thread with a copy of the context, so SQL
+    executed there is still attributed to the request.
+    """
+
+    def __init__(self, app, exclude_paths=("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = current_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            method, route = scope["method"], route_label(scope)
+            HTTP_REQUESTS.inc(method, route, str(status_code))
+            HTTP_LATENCY.observe(elapsed, method, route)
+            DB_QUERIES.observe(stats.queries, method, route)
+            DB_TIME.observe(stats.db_time, method, route)
+            if stats.queries:
+                DB_QUERIES_TOTAL.inc(route, amount=stats.queries)
+            if status_code == 429:
+                RATE_LIMIT_REJECTIONS.inc(route)
+            if token is not None:
+                current_stats.reset(token)
+
+
+def render_metrics() -> str:
+    """All registered metrics in Prometheus text exposition format (0.0.4)."""
+    return registry.render()
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
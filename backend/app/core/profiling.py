@@ -0,0 +1,168 @@
+"""
+Synapse Request Profiling
+Server-Timing breakdown (db / auth / sanitize / serialize / app / total) on
+every response, plus an opt-in per-request SQL log grouped by statement
+fingerprint that flags probable N+1 patterns.
+
+Send `X-Debug-SQL: 1` to get the log back in the X-Debug-SQL-Log header.
+Only honoured when SQL_DEBUG_LOG is set (default: off, opt-in per
+environment), since the log exposes query text.
+"""
+
+import hashlib
+import os
+import re
+import time
+from typing import Iterable, List, Tuple
+
+from app.core.metrics import RequestStats, current_stats
+from app.core.serialization import dumps
+
+SQL_DEBUG_LOG = os.getenv("SQL_DEBUG_LOG", "false").strip().lower() in ("1", "true", "yes", "on")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "3"))  # same SELECT this many times
+SQL_LOG_MAX_ENTRIES = 25
+SQL_LOG_MAX_CHARS = 200
+
+# Phases reported in Server-Timing, in order. "db" comes from RequestStats.db_time.
+TIMING_PHASES = ("auth", "sanitize", "serialize")
+
+
+# ============================================
+# FINGERPRINTS
+# ============================================
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PARAMS = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\?|__\[POSTCOMPILE_\w+\]")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LISTS = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.I)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Replace literals and bind parameters with `?` so repeated shapes compare equal."""
+    sql = _COMMENTS.sub(" ", statement)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PARAMS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _IN_LISTS.sub("(?...)", sql)
+    sql = _VALUES_LISTS.sub(r"\1, ...", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(statement: str) -> str:
+    """Short stable id for a normalized statement."""
+    return hashlib.sha1(normalize_sql(statement).encode("utf-8")).hexdigest()[:12]
+
+
+def summarize_statements(statements: Iterable[Tuple[str, float]],
+                         threshold: int = N_PLUS_ONE_THRESHOLD) -> List[dict]:
+    """
+    Group executed statements by fingerprint.
+
+    Returns entries sorted by total time, each with count, total/max ms and
+    an `n_plus_one` flag for SELECTs repeated at least `threshold` times.
+    """
+    groups = {}
+    for statement, seconds in statements:
+        normalized = normalize_sql(statement)
+        fp = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+        entry = groups.get(fp)
+        if entry is None:
+            entry = groups[fp] = {
+                "fingerprint": fp,
+                "sql": normalized[:SQL_LOG_MAX_CHARS],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+            }
+        ms = seconds * 1000
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+
+    summary = sorted(groups.values(), key=lambda e: e["total_ms"], reverse=True)
+    for entry in summary:
+        entry["total_ms"] = round(entry["total_ms"], 3)
+        entry["max_ms"] = round(entry["max_ms"], 3)
+        entry["n_plus_one"] = entry["count"] >= threshold and entry["sql"].upper().startswith("SELECT")
+    return summary
+
+
+# ============================================
+# SERVER-TIMING
+# ============================================
+
+def server_timing_header(stats: RequestStats, total_s: float) -> str:
+    parts = [f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"']
+    accounted = stats.db_time
+    for phase in TIMING_PHASES:
+        seconds = stats.phases.get(phase)
+        if seconds is not None:
+            parts.append(f"{phase};dur={seconds * 1000:.2f}")
+            accounted += seconds
+    parts.append(f"app;dur={max(total_s - accounted, 0.0) * 1000:.2f}")
+    parts.append(f"total;dur={total_s * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding Server-Timing to every HTTP response.
+
+    Reuses the RequestStats installed by MetricsMiddleware when present.
+    With `X-Debug-SQL` (and SQL_DEBUG_LOG on) it also records each
+    statement and returns the fingerprint summary in X-Debug-SQL-Log.
+    """
+
+    def __init__(self, app, debug_enabled: bool = SQL_DEBUG_LOG):
+        self.app = app
+        self.debug_enabled = debug_enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = current_stats.set(stats)
+
+        debug = self.debug_enabled and any(
+            name == b"x-debug-sql" and value not in (b"", b"0", b"false")
+            for name, value in scope.get("headers", [])
+        )
+        if debug and stats.statements is None:
+            stats.statements = []
+
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                total = time.perf_counter() - start
+                headers.append((b"server-timing", server_timing_header(stats, total).encode("latin-1")))
+                if debug:
+                    summary = summarize_statements(stats.statements)
+                    flagged = [e for e in summary if e["n_plus_one"]]
+                    log = {
+                        "queries": stats.queries,
+                        "db_ms": round(stats.db_time * 1000, 3),
+                        "n_plus_one": [e["fingerprint"] for e in flagged],
+                        "statements": summary[:SQL_LOG_MAX_ENTRIES],
+                    }
+                    headers.append((b"x-debug-sql-log", dumps(log)))
+                    for entry in flagged:
+                        print(f"⚠️ Probable N+1 on {scope.get('path')}: {entry['count']}x "
+                              f"[{entry['fingerprint']}] {entry['sql'][:120]}")
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                current_stats.reset(token)
@@ -14,6 +14,8 @@ from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from passlib.context import CryptContext
 
+from app.core.metrics import timed_phase
+
 # ============================================
 # CONFIGURATION
 # ============================================
@@ -32,11 +34,17 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Password hashing context. PBKDF2_ROUNDS only affects new hashes; existing
+# hashes carry their own round count and keep verifying.
+PBKDF2_ROUNDS = int(os.getenv("PBKDF2_ROUNDS", "29000"))  # passlib's default
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"], deprecated="auto", pbkdf2_sha256__rounds=PBKDF2_ROUNDS
+)
 
 # HTTP Bearer scheme for JWT
 security = HTTPBearer()
+# Same scheme for endpoints where authentication is optional
+optional_security = HTTPBearer(auto_error=False)
 
 # ============================================
 # API KEY GENERATION & HASHING
@@ -63,7 +71,8 @@ def hash_api_key(api_key: str) -> tuple[str, str]:
     # salt = bcrypt.gensalt()
     # hashed = bcrypt.hashpw(api_key.encode('utf-8'), salt)
     # return hashed.decode('utf-8'), salt.decode('utf-8')
-    hashed = pwd_context.hash(api_key)
+    with timed_phase("auth"):
+        hashed = pwd_context.hash(api_key)
     return hashed, "salt_embedded"
 
 
@@ -80,7 +89,8 @@ def verify_api_key(plain_key: str, hashed_key: str) -> bool:
     """
     try:
         # return bcrypt.checkpw(plain_key.encode('utf-8'), hashed_key.encode('utf-8'))
-        return pwd_context.verify(plain_key, hashed_key)
+        with timed_phase("auth"):
+            return pwd_context.verify(plain_key, hashed_key)
     except Exception:
         return False
 
@@ -139,7 +149,7 @@ def decode_access_token(token: str) -> dict:
             detail="Token has expired",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -169,7 +179,8 @@ def get_current_agent_id(
         HTTPException: If token is invalid
     """
     token = credentials.credentials
-    payload = decode_access_token(token)
+    with timed_phase("auth"):
+        payload = decode_access_token(token)
     
     agent_id: str = payload.get("agent_id")
     if agent_id is None:
@@ -182,6 +193,23 @@ def get_current_agent_id(
     return agent_id
 
 
+def get_optional_agent_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security)
+) -> Optional[str]:
+    """
+    Like get_current_agent_id, for public endpoints that add viewer-specific
+    fields when a token is sent. Returns None without an Authorization
+    header or with an expired/invalid token: clients that always attach
+    their token keep reading public feeds after it expires.
+    """
+    if credentials is None:
+        return None
+    try:
+        return get_current_agent_id(credentials)
+    except HTTPException:
+        return None
+
+
 # ============================================
 # INPUT SANITIZATION
 # ============================================
@@ -192,6 +220,11 @@ def sanitize_markdown(content: str) -> str:
     Uses nh3 (Rust-based, fast) for robust sanitization with a strict allowlist.
     Falls back to aggressive regex stripping if nh3 is unavailable.
     """
+    with timed_phase("sanitize"):
+        return _sanitize_markdown(content)
+
+
+def _sanitize_markdown(content: str) -> str:
     # Limit length first
     if len(content) > 50000:  # 50KB max
         content = content[:50000]
@@ -0,0 +1,61 @@
+"""
+Synapse Response Serialization
+orjson-backed JSON responses and helpers for pre-encoded payloads.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any
+from uuid import UUID
+
+from fastapi.responses import JSONResponse, Response
+
+from app.core.metrics import timed_phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(obj: Any):
+    """Fallback encoder for types orjson/json don't handle natively."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content to compact UTF-8 JSON bytes."""
+    with timed_phase("serialize"):
+        if orjson is not None:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def loads(payload: bytes) -> Any:
+    """Decode JSON bytes produced by dumps()."""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: renders with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """Response for payloads that are already JSON-encoded bytes."""
+
+    media_type = "application/json"
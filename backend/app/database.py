@@ -1,15 +1,24 @@
 """
 Synapse Database Configuration
-Shared Base and session management.
+Shared Base, engine/pool configuration, read-replica routing and session management.
 """
 
+import hashlib
+import itertools
 import os
+import threading
+import time
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DisconnectionError
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -20,18 +29,385 @@ if not DATABASE_URL:
     else:
         raise RuntimeError("DATABASE_URL environment variable is required in production!")
 
-connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_pre_ping=True)
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Pool sizing (per process). Swarm bursts queue on DB_POOL_TIMEOUT instead of
+# opening unbounded connections; size * workers must stay under max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 disables
+DB_POOL_USE_LIFO = _env_bool("DB_POOL_USE_LIFO", True)  # lets idle extras time out server-side
+
+# Liveness checks: "checkout" pings on every checkout (SQLAlchemy pre_ping),
+# "interval" pings only connections idle longer than DB_PING_INTERVAL, "off" never.
+DB_PING_MODE = os.getenv("DB_PING_MODE", "interval").strip().lower()
+DB_PING_INTERVAL = float(os.getenv("DB_PING_INTERVAL", "30"))
+
+# Transaction pooling behind pgbouncer: server connections change between
+# transactions, so driver-side prepared statements must be disabled.
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER")
+
+# Read replicas: comma-separated URLs. GET/HEAD requests are spread across
+# healthy replicas; an agent that just wrote reads from the primary for
+# DB_READ_YOUR_WRITES_SECONDS so replication lag never hides its own writes.
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))  # back-off after a failure
+DB_REPLICA_HEALTH_INTERVAL = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", "10"))  # 0 disables
+
+if DB_PING_MODE not in ("checkout", "interval", "off"):
+    raise RuntimeError(f"DB_PING_MODE must be checkout, interval or off (got {DB_PING_MODE!r})")
+
+
+# ============================================
+# POOL METRICS
+# ============================================
+
+class PoolStats:
+    """Thread-safe counters for connection checkout waits and pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_total_s = 0.0
+            self.wait_max_s = 0.0
+            self.timeouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.pings = 0
+            self.ping_failures = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total_s += seconds
+            self.wait_max_s = max(self.wait_max_s, seconds)
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_total_ms": round(self.wait_total_s * 1000, 3),
+                "wait_max_ms": round(self.wait_max_s * 1000, 3),
+                "wait_avg_ms": round(self.wait_total_s * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        return conn
+
+
+# ============================================
+# ENGINE
+# ============================================
+
+def _connect_args(url) -> dict:
+    if url.get_backend_name() == "sqlite":
+        return {"check_same_thread": False}
+    args = {}
+    if DB_PGBOUNCER:
+        driver = url.get_driver_name()
+        if driver == "psycopg":
+            args["prepare_threshold"] = None
+        elif driver == "asyncpg":
+            args["statement_cache_size"] = 0
+            args["prepared_statement_cache_size"] = 0
+        # psycopg2 never uses server-side prepared statements
+    return args
+
+
+def _engine_kwargs(url) -> dict:
+    kwargs = {"connect_args": _connect_args(url)}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite uses a single-connection pool; sizing does not apply
+        return kwargs
+    kwargs.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_use_lifo=DB_POOL_USE_LIFO,
+        pool_pre_ping=DB_PING_MODE == "checkout",
+    )
+    return kwargs
+
+
+def _install_pool_events(engine, ping_interval: float = None):
+    """Count pool events and, for interval mode, ping connections that sat idle too long."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, record):
+        pool_stats.incr("connects")
+        record.info["last_used"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, record, exception):
+        pool_stats.incr("invalidations")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, record):
+        record.info["last_used"] = time.monotonic()
+
+    if ping_interval is None:
+        return
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, record, proxy):
+        now = time.monotonic()
+        if now - record.info.get("last_used", now) < ping_interval:
+            return
+        pool_stats.incr("pings")
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as exc:
+            pool_stats.incr("ping_failures")
+            # The pool discards this connection and retries with a fresh one
+            raise DisconnectionError("stale connection failed liveness ping") from exc
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        record.info["last_used"] = now
+
+
+def _make_engine(database_url: str):
+    url = make_url(database_url)
+    engine = create_engine(url, **_engine_kwargs(url))
+    _install_pool_events(
+        engine,
+        ping_interval=DB_PING_INTERVAL if DB_PING_MODE == "interval" and url.get_backend_name() != "sqlite" else None,
+    )
+    return engine
+
+
+engine = _make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# ============================================
+# READ-REPLICA ROUTING
+# ============================================
+
+PIN_PREFIX = "dbpin:"
+
+
+class _Replica:
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.down_until = 0.0
+        self.failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+
+class ReplicaRouter:
+    """
+    Chooses the engine for each request.
+
+    Writes and pinned agents go to the primary; other reads round-robin over
+    replicas that are not backing off after a failure. Pins are kept in
+    Redis when available (shared across workers) and in memory otherwise.
+    """
+
+    def __init__(self, primary, replicas: Optional[List] = None,
+                 pin_seconds: float = DB_READ_YOUR_WRITES_SECONDS,
+                 retry_seconds: float = DB_REPLICA_RETRY_SECONDS):
+        self.primary = primary
+        self.replicas = [_Replica(f"replica{i}", e) for i, e in enumerate(replicas or [])]
+        self.pin_seconds = pin_seconds
+        self.retry_seconds = retry_seconds
+        self.redis = None
+        self._rr = itertools.count()
+        self._pins: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            self._watch_errors(replica)
+
+    def _watch_errors(self, replica: "_Replica"):
+        @event.listens_for(replica.engine, "handle_error")
+        def _on_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(replica)
+
+    # ---- health ----
+
+    def mark_down(self, replica: "_Replica"):
+        replica.failures += 1
+        replica.down_until = time.monotonic() + self.retry_seconds
+
+    def check_health(self):
+        """Probe every replica with SELECT 1; failed ones back off for retry_seconds."""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    conn.exec_driver_sql("SELECT 1")
+                replica.down_until = 0.0
+            except Exception:
+                self.mark_down(replica)
+
+    def pick_replica(self):
+        """Next healthy replica engine in round-robin order, or None."""
+        n = len(self.replicas)
+        if not n:
+            return None
+        start = next(self._rr)
+        for i in range(n):
+            replica = self.replicas[(start + i) % n]
+            if replica.healthy:
+                return replica.engine
+        return None
+
+    # ---- read-your-writes pins ----
+
+    def pin(self, key: str):
+        if not key or not self.replicas:
+            return
+        with self._lock:
+            self._pins[key] = time.monotonic() + self.pin_seconds
+            if len(self._pins) > 10000:
+                now = time.monotonic()
+                self._pins = {k: v for k, v in self._pins.items() if v > now}
+        if self.redis is not None:
+            try:
+                self.redis.set(PIN_PREFIX + key, "1", px=max(1, int(self.pin_seconds * 1000)))
+            except Exception:
+                pass
+
+    def is_pinned(self, key: str) -> bool:
+        if not key:
+            return False
+        expires = self._pins.get(key)
+        if expires is not None and expires > time.monotonic():
+            return True
+        if self.redis is not None:
+            try:
+                return bool(self.redis.exists(PIN_PREFIX + key))
+            except Exception:
+                pass
+        return False
+
+    # ---- routing ----
+
+    def engine_for(self, read_only: bool, pin_key: Optional[str] = None):
+        if not read_only or not self.replicas or self.is_pinned(pin_key):
+            return self.primary
+        return self.pick_replica() or self.primary
+
+    def status(self) -> list:
+        now = time.monotonic()
+        return [
+            {
+                "name": r.name,
+                "healthy": r.healthy,
+                "failures": r.failures,
+                "retry_in_s": round(max(0.0, r.down_until - now), 1),
+            }
+            for r in self.replicas
+        ]
+
+
+db_router = ReplicaRouter(engine, [_make_engine(u) for u in DATABASE_REPLICA_URLS])
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _pin_after_commit(session):
+    """A committed write pins the writing agent to the primary for a short window."""
+    if session.info.get("read_only"):
+        return
+    db_router.pin(session.info.get("pin_key"))
+
+
+def request_pin_key(request) -> Optional[str]:
+    """Stable per-agent key from the bearer token (agent_id claim, else token hash)."""
+    auth = request.headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return None
+    token = auth[7:].strip()
+    try:
+        import jwt
+        agent_id = jwt.decode(token, options={"verify_signature": False}).get("agent_id")
+        if agent_id:
+            return str(agent_id)
+    except Exception:
+        pass
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def get_pool_status() -> dict:
+    """Current pool occupancy plus cumulative checkout/wait counters."""
+    pool = engine.pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "pgbouncer": DB_PGBOUNCER,
+        "ping_mode": DB_PING_MODE,
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=DB_MAX_OVERFLOW,
+            timeout_s=DB_POOL_TIMEOUT,
+        )
+    status.update(pool_stats.snapshot())
+    status["replicas"] = db_router.status()
+    return status
+
+
 class Base(DeclarativeBase):
     pass
 
 
-def get_db():
-    """FastAPI dependency for database sessions."""
-    db = SessionLocal()
+def get_db(request: Request):
+    """FastAPI dependency for database sessions.
+
+    GET/HEAD requests are routed to a read replica when one is configured,
+    unless the calling agent wrote within the read-your-writes window.
+    """
+    read_only = request.method in ("GET", "HEAD")
+    pin_key = request_pin_key(request) if db_router.replicas else None
+    bind = db_router.engine_for(read_only, pin_key)
+    db = SessionLocal(bind=bind, info={"pin_key": pin_key, "read_only": bind is not engine})
     try:
         yield db
     finally:
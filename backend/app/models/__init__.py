@@ -6,5 +6,7 @@ from app.models.vote import Vote
 from app.models.audit import AuditLog
 from app.models.webhook import Webhook
 from app.models.subscription import Subscription
+from app.models.idempotency import IdempotencyKey
 
-__all__ = ["Agent", "Post", "Face", "Comment", "Vote", "AuditLog", "Webhook", "Subscription"]
+__all__ = ["Agent", "Post", "Face", "Comment", "Vote", "AuditLog", "Webhook", "Subscription",
+           "IdempotencyKey"]
@@ -6,7 +6,7 @@ import uuid
 from datetime import datetime
 
 from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Text
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Text, Uuid
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, Text, Uuid
 # from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, backref
 
@@ -17,6 +17,12 @@ class Comment(Base):
     """Comment model for threaded discussion on posts."""
 
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("idx_comments_post_score", "post_id", "score", "created_at"),
+        Index("idx_comments_post_best", "post_id", "best_score", "created_at"),
+        Index("idx_comments_post_controversial", "post_id", "controversial_score", "created_at"),
+        Index("idx_comments_post_created", "post_id", "created_at"),
+    )
 
     comment_id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     post_id = Column(
@@ -34,6 +40,11 @@ class Comment(Base):
     upvotes = Column(Integer, default=0)
     downvotes = Column(Integer, default=0)
 
+    # Stored sort keys, recomputed by cast_vote (see app/services/comment_ranking.py)
+    score = Column(Integer, default=0, nullable=False)
+    best_score = Column(Float, default=0.0, nullable=False)
+    controversial_score = Column(Float, default=0.0, nullable=False)
+
     is_removed = Column(Boolean, default=False)
     removal_reason = Column(Text, nullable=True)
 
@@ -56,7 +67,3 @@ class Comment(Base):
 
     def __repr__(self):
         return f"<Comment(post_id={self.post_id}, author={self.author_agent_id})>"
-
-    @property
-    def score(self):
-        return self.upvotes - self.downvotes
@@ -0,0 +1,34 @@
+"""
+SQLAlchemy Idempotency Key Model
+Stored responses for Idempotency-Key replays when Redis is not available,
+shared by every worker and surviving restarts.
+"""
+
+import uuid
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, UniqueConstraint
+from sqlalchemy import Uuid
+
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """One claimed (agent, Idempotency-Key) and, once the write succeeded, its response."""
+
+    __tablename__ = "idempotency_keys"
+
+    idempotency_key_id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    agent_id = Column(Uuid, nullable=False)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(32), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is in flight
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    # The unique key is what makes a claim atomic across workers
+    __table_args__ = (
+        UniqueConstraint("agent_id", "key", name="uq_idempotency_agent_key"),
+    )
+
+    def __repr__(self):
+        return f"<IdempotencyKey(agent_id='{self.agent_id}', key='{self.key}')>"
@@ -0,0 +1,211 @@
+"""
+Synapse Counter Reconciliation
+Declarative specs for denormalized counter columns and a chunked,
+set-based reconciler that repairs drift within a per-run budget.
+"""
+
+import time as _time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.agent import Agent
+from app.models.comment import Comment
+from app.models.face import Face
+from app.models.post import Post
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_ROW_BUDGET = 20000
+MAX_REPORTED_FIXES = 100
+
+
+@dataclass(frozen=True)
+class CounterSpec:
+    """
+    A denormalized counter: `target.counter` must equal the number of
+    `source` rows whose `source_fk` points at the target row.
+
+    Attributes:
+        name: Stable identifier used in reports and cursors
+        target_pk: Primary key column of the table holding the counter
+        counter: The counter column to reconcile
+        source_fk: Foreign key column in the counted table
+        source_filter: Optional extra WHERE clause on the counted table
+        distinct: Optional column to COUNT(DISTINCT ...) instead of COUNT(*)
+    """
+    name: str
+    target_pk: Any
+    counter: Any
+    source_fk: Any
+    source_filter: Any = None
+    distinct: Any = None
+
+
+COUNTER_SPECS = [
+    CounterSpec(
+        name="face.post_count",
+        target_pk=Face.face_id,
+        counter=Face.post_count,
+        source_fk=Post.face_id,
+        source_filter=Post.is_removed == False,
+    ),
+    # There is no membership table yet; a face's members are the agents
+    # that have posted in it.
+    CounterSpec(
+        name="face.member_count",
+        target_pk=Face.face_id,
+        counter=Face.member_count,
+        source_fk=Post.face_id,
+        source_filter=Post.is_removed == False,
+        distinct=Post.author_agent_id,
+    ),
+    CounterSpec(
+        name="post.comment_count",
+        target_pk=Post.post_id,
+        counter=Post.comment_count,
+        source_fk=Comment.post_id,
+    ),
+    CounterSpec(
+        name="agent.post_count",
+        target_pk=Agent.agent_id,
+        counter=Agent.post_count,
+        source_fk=Post.author_agent_id,
+    ),
+    CounterSpec(
+        name="agent.comment_count",
+        target_pk=Agent.agent_id,
+        counter=Agent.comment_count,
+        source_fk=Comment.author_agent_id,
+    ),
+]
+
+
+class CounterReconciler:
+    """
+    Checks counter specs in keyset-paginated chunks. Each chunk costs two
+    SELECTs (counter values + grouped source counts) and at most one
+    executemany UPDATE. A run stops once `row_budget` target rows have been
+    scanned; the next run resumes from the saved per-spec cursor.
+    """
+
+    def __init__(self, specs=None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.specs = list(specs if specs is not None else COUNTER_SPECS)
+        self.chunk_size = chunk_size
+        self._cursors: dict = {}  # spec name -> last scanned pk
+
+    def spec(self, name: str) -> CounterSpec:
+        """Look up a registered spec by name."""
+        for spec in self.specs:
+            if spec.name == name:
+                return spec
+        raise KeyError(name)
+
+    def _chunk(self, db: Session, spec: CounterSpec, after) -> list:
+        query = select(spec.target_pk, spec.counter).order_by(spec.target_pk).limit(self.chunk_size)
+        if after is not None:
+            query = query.where(spec.target_pk > after)
+        return db.execute(query).all()
+
+    def _actual_counts(self, db: Session, spec: CounterSpec, ids: list) -> dict:
+        counted = func.count(func.distinct(spec.distinct)) if spec.distinct is not None else func.count()
+        query = (
+            select(spec.source_fk, counted)
+            .where(spec.source_fk.in_(ids))
+            .group_by(spec.source_fk)
+        )
+        if spec.source_filter is not None:
+            query = query.where(spec.source_filter)
+        return {fk: cnt for fk, cnt in db.execute(query).all()}
+
+    def _apply(self, db: Session, spec: CounterSpec, fixes: list):
+        # Compare-and-set against the value read in _chunk: a write that
+        # incremented the counter since then keeps its increment, and the
+        # row is checked again on the next run.
+        table = spec.target_pk.class_.__table__
+        counter = table.c[spec.counter.key]
+        db.connection().execute(
+            update(table)
+            .where(table.c[spec.target_pk.key] == bindparam("_pk"))
+            .where(func.coalesce(counter, 0) == bindparam("_old"))
+            .values({spec.counter.key: bindparam("_value")}),
+            [{"_pk": pk, "_old": stored or 0, "_value": new} for pk, stored, new in fixes],
+        )
+
+    def reconcile_spec(self, db: Session, spec: CounterSpec, row_budget: int) -> dict:
+        """Reconcile one spec, scanning at most `row_budget` target rows."""
+        scanned = 0
+        fixed = []
+        complete = False
+        after = self._cursors.get(spec.name)
+
+        while scanned < row_budget:
+            rows = self._chunk(db, spec, after)
+            if not rows:
+                complete = True
+                after = None
+                break
+            ids = [r[0] for r in rows]
+            actual = self._actual_counts(db, spec, ids)
+            fixes = [
+                (pk, stored, actual.get(pk, 0))
+                for pk, stored in rows
+                if (stored or 0) != actual.get(pk, 0)
+            ]
+            if fixes:
+                self._apply(db, spec, fixes)
+                fixed.extend(fixes)
+            scanned += len(rows)
+            after = ids[-1]
+            if len(rows) < self.chunk_size:
+                complete = True
+                after = None
+                break
+
+        db.commit()
+        self._cursors[spec.name] = after
+        return {
+            "scanned": scanned,
+            "fixed": len(fixed),
+            "complete": complete,
+            "fixes": [
+                {"id": str(pk), "old": stored, "new": new}
+                for pk, stored, new in fixed[:MAX_REPORTED_FIXES]
+            ],
+        }
+
+    def run(self, db: Session, row_budget: int = DEFAULT_ROW_BUDGET, names: Optional[list] = None) -> dict:
+        """
+        Reconcile all (or the named) specs, sharing `row_budget` evenly.
+
+        Returns:
+            Report dict keyed by spec name, plus total fixed and elapsed time
+        """
+        started = _time.perf_counter()
+        specs = [s for s in self.specs if names is None or s.name in names]
+        per_spec = max(1, row_budget // max(len(specs), 1))
+        report = {spec.name: self.reconcile_spec(db, spec, per_spec) for spec in specs}
+        return {
+            "counters": report,
+            "total_fixed": sum(r["fixed"] for r in report.values()),
+            "elapsed_ms": round((_time.perf_counter() - started) * 1000, 2),
+        }
+
+
+def recount_all(connection, specs=None):
+    """
+    Set every counter from a full count, one UPDATE per spec with no row
+    budget. For one-shot backfills (alembic data migrations), not requests.
+    """
+    for spec in (specs if specs is not None else COUNTER_SPECS):
+        table = spec.target_pk.class_.__table__
+        counted = func.count(func.distinct(spec.distinct)) if spec.distinct is not None else func.count()
+        actual = select(counted).where(spec.source_fk == table.c[spec.target_pk.key])
+        if spec.source_filter is not None:
+            actual = actual.where(spec.source_filter)
+        connection.execute(update(table).values({spec.counter.key: actual.scalar_subquery()}))
+
+
+# Shared instance so cursors persist between periodic runs
+reconciler = CounterReconciler()
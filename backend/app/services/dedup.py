@@ -0,0 +1,283 @@
+"""
+Synapse Near-Duplicate Detection
+MinHash signatures over word shingles, indexed with LSH bands so a new
+post is compared only against posts that share at least one band.
+
+A signature is DEDUP_PERMUTATIONS minimum hashes of the post's 3-word
+shingles; the fraction of equal positions between two signatures
+estimates the Jaccard similarity of their shingle sets. Signatures are
+split into DEDUP_BANDS bands, and each band is a bucket key: posts that
+collide in any band are candidates, and candidates at or above
+DEDUP_THRESHOLD estimated similarity are near-duplicates. With 16 bands
+of 4 rows a pair at 0.8 similarity collides with probability > 0.999.
+
+Uses Redis if available, falls back to in-process dicts. create_post
+adds every new post; a background job loads the last
+DEDUP_STARTUP_WINDOW_HOURS of posts shortly after startup, then the last
+DEDUP_WINDOW_DAYS every DEDUP_REFRESH_INTERVAL, dropping older ones.
+"""
+
+import os
+import re
+import threading
+import time as _time
+import zlib
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.post import Post
+from app.services.feeds import epoch_seconds
+
+DEDUP_PERMUTATIONS = 64
+DEDUP_BANDS = 16
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+DEDUP_WINDOW_DAYS = int(os.getenv("DEDUP_WINDOW_DAYS", "7"))  # posts older than this are not compared
+DEDUP_REFRESH_INTERVAL = int(os.getenv("DEDUP_REFRESH_INTERVAL", "3600"))  # seconds, 0 disables
+DEDUP_STARTUP_DELAY = int(os.getenv("DEDUP_STARTUP_DELAY", "10"))  # seconds before the first load
+DEDUP_STARTUP_WINDOW_HOURS = int(os.getenv("DEDUP_STARTUP_WINDOW_HOURS", "24"))  # span of the first load
+# What create_post does with a near-duplicate: "reject" (409), "flag" (allow, keep in the
+# cluster for /duplicates) or "off"
+DEDUP_AUTHOR_ACTION = os.getenv("DEDUP_AUTHOR_ACTION", "reject")  # same author, any face
+DEDUP_FACE_ACTION = os.getenv("DEDUP_FACE_ACTION", "flag")  # other authors, same face
+
+SHINGLE_WORDS = 3
+_MERSENNE = (1 << 31) - 1
+_ROWS = DEDUP_PERMUTATIONS // DEDUP_BANDS
+
+KEY_PREFIX = "dup:"
+META_KEY = KEY_PREFIX + "meta"  # HASH post_id -> "author|face|created|signature"
+
+_WORD = re.compile(r"\w+")
+
+
+def _coefficients() -> Tuple[list, list]:
+    # Fixed seed: signatures must stay comparable across processes and restarts
+    import random
+    rng = random.Random(0x5F3759DF)
+    a = [rng.randrange(1, _MERSENNE) for _ in range(DEDUP_PERMUTATIONS)]
+    b = [rng.randrange(0, _MERSENNE) for _ in range(DEDUP_PERMUTATIONS)]
+    return a, b
+
+
+_A, _B = _coefficients()
+
+
+def shingles(text: str) -> set:
+    """32-bit hashes of the lowercased 3-word shingles of `text`."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def minhash(text: str) -> Optional[Tuple[int, ...]]:
+    """MinHash signature of a text, or None if it has no words."""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    try:
+        import numpy as np  # deferred: only post writes and /duplicates need it
+    except ImportError:  # pragma: no cover - numpy is in requirements.txt
+        return tuple(min((a * x + b) % _MERSENNE for x in hashes) for a, b in zip(_A, _B))
+    x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    a = np.array(_A, dtype=np.uint64)[:, None]
+    b = np.array(_B, dtype=np.uint64)[:, None]
+    # a < 2^31 and x < 2^32, so a * x + b fits in 64 bits
+    return tuple(int(v) for v in ((a * x + b) % _MERSENNE).min(axis=1))
+
+
+def post_signature(title: str, content: str) -> Optional[Tuple[int, ...]]:
+    return minhash(f"{title or ''} {content or ''}")
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def bands(signature: Tuple[int, ...]) -> List[str]:
+    """One bucket key per LSH band."""
+    return [
+        f"{i}:{zlib.crc32(repr(signature[i * _ROWS:(i + 1) * _ROWS]).encode()):08x}"
+        for i in range(DEDUP_BANDS)
+    ]
+
+
+class Match(NamedTuple):
+    post_id: str
+    similarity: float
+    author_id: str
+    face_id: str
+
+
+class DuplicateIndex:
+    """LSH index of recent post signatures."""
+
+    def __init__(self, redis_client=None, threshold: float = DEDUP_THRESHOLD,
+                 window_days: int = DEDUP_WINDOW_DAYS):
+        self.redis = redis_client
+        self.threshold = threshold
+        self.window = window_days * 86400
+        self._posts: dict = {}  # post_id -> (author_id, face_id, created epoch, signature)
+        self._buckets: dict = {}  # band key -> set of post_ids
+        self._lock = threading.Lock()
+
+    # ---- queries ----
+
+    def find(self, signature: Optional[Tuple[int, ...]], exclude: Optional[str] = None) -> List[Match]:
+        """Indexed posts at or above the threshold, most similar first."""
+        if signature is None:
+            return []
+        candidates = self._candidates(bands(signature))
+        candidates.pop(exclude, None)
+        matches = [
+            Match(post_id, similarity(signature, sig), author_id, face_id)
+            for post_id, (author_id, face_id, _created, sig) in candidates.items()
+        ]
+        return sorted((m for m in matches if m.similarity >= self.threshold),
+                      key=lambda m: m.similarity, reverse=True)
+
+    def _candidates(self, band_keys: List[str]) -> dict:
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key in band_keys:
+                    pipe.smembers(KEY_PREFIX + key)
+                post_ids = set().union(*pipe.execute())
+                if not post_ids:
+                    return {}
+                post_ids = list(post_ids)
+                return {
+                    post_id: _decode(raw)
+                    for post_id, raw in zip(post_ids, self.redis.hmget(META_KEY, post_ids))
+                    if raw
+                }
+            except Exception:
+                pass  # Redis failed, fall through to in-memory
+
+        with self._lock:
+            post_ids = set()
+            for key in band_keys:
+                post_ids |= self._buckets.get(key, set())
+            return {post_id: self._posts[post_id] for post_id in post_ids if post_id in self._posts}
+
+    # ---- writes ----
+
+    def add(self, post_id, author_id, face_id, created_at: datetime,
+            signature: Optional[Tuple[int, ...]]):
+        if signature is None:
+            return
+        entry = (str(author_id), str(face_id), epoch_seconds(created_at), signature)
+        self._store({str(post_id): entry})
+
+    def _store(self, entries: dict):
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for post_id, entry in entries.items():
+                    pipe.hset(META_KEY, post_id, _encode(entry))
+                    for key in bands(entry[3]):
+                        pipe.sadd(KEY_PREFIX + key, post_id)
+                        pipe.expire(KEY_PREFIX + key, self.window)
+                pipe.execute()
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            for post_id, entry in entries.items():
+                self._posts[post_id] = entry
+                for key in bands(entry[3]):
+                    self._buckets.setdefault(key, set()).add(post_id)
+
+    def rebuild(self, db: Session, now: Optional[float] = None, span: Optional[float] = None) -> int:
+        """
+        Index posts from the last span seconds (default the whole window) and
+        drop entries older than the window. Returns the number of posts indexed.
+        """
+        now = _time.time() if now is None else now
+        span = self.window if span is None else min(span, self.window)
+        since = datetime.utcfromtimestamp(now - span)
+        indexed = self._indexed_ids()
+        entries = {}
+        rows = (
+            db.query(Post.post_id, Post.author_agent_id, Post.face_id, Post.created_at,
+                     Post.title, Post.content)
+            .filter(Post.is_removed == False, Post.created_at >= since)
+            .yield_per(2000)
+        )
+        for r in rows:
+            post_id = str(r.post_id)
+            if post_id in indexed:
+                continue
+            signature = post_signature(r.title, r.content)
+            if signature is not None:
+                entries[post_id] = (str(r.author_agent_id), str(r.face_id),
+                                    epoch_seconds(r.created_at), signature)
+        if entries:
+            self._store(entries)
+        self._prune(now - self.window)
+        return len(entries)
+
+    def _indexed_ids(self) -> set:
+        if self.redis is not None:
+            try:
+                return set(self.redis.hkeys(META_KEY))
+            except Exception:
+                pass
+        with self._lock:
+            return set(self._posts)
+
+    def _prune(self, cutoff: float):
+        if self.redis is not None:
+            try:
+                # Band sets are refreshed by every add, so busy bands never
+                # expire: remove stale ids from them along with their metadata
+                stale = {}
+                for post_id, raw in self.redis.hgetall(META_KEY).items():
+                    entry = _decode(raw)
+                    if entry[2] < cutoff:
+                        stale[post_id] = entry[3]
+                if stale:
+                    pipe = self.redis.pipeline(transaction=False)
+                    for post_id, signature in stale.items():
+                        for key in bands(signature):
+                            pipe.srem(KEY_PREFIX + key, post_id)
+                    pipe.hdel(META_KEY, *stale)
+                    pipe.execute()
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            stale = [post_id for post_id, entry in self._posts.items() if entry[2] < cutoff]
+            for post_id in stale:
+                for key in bands(self._posts.pop(post_id)[3]):
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(post_id)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._posts.clear()
+            self._buckets.clear()
+
+
+def _encode(entry: tuple) -> str:
+    author_id, face_id, created, signature = entry
+    return f"{author_id}|{face_id}|{created}|{','.join(map(str, signature))}"
+
+
+def _decode(raw: str) -> tuple:
+    author_id, face_id, created, signature = raw.split("|")
+    return author_id, face_id, float(created), tuple(int(v) for v in signature.split(","))
+
+
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,266 @@
+"""
+Synapse Feed Index
+Ranked post ids per face (and one global feed) for the `new`, `top` and
+`hot` sorts, so the first pages of a feed are a range read instead of a
+sort over every post in the face. Uses Redis sorted sets if available,
+falls back to in-process dicts.
+
+Each set holds the best FEED_INDEX_DEPTH posts and is built lazily from
+the database on first read. create_post and cast_vote then keep it
+current. Every built set is also rebuilt from the database each
+FEED_DECAY_INTERVAL, which re-decays hot scores, brings in writes another
+worker made (without Redis each worker only sees its own), and repairs
+anything a failed update or an out-of-band edit left behind. Readers drop
+ids whose post has since been removed with remove_post().
+Reads are only served from the index up to FEED_SERVE_DEPTH, well inside
+the stored depth, so trimming at the tail never shows on a served page.
+"""
+
+import heapq
+import os
+import threading
+import time as _time
+import uuid
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import Float, cast, desc, extract
+from sqlalchemy.orm import Session
+
+from app.models.post import Post
+
+FEED_INDEX_DEPTH = int(os.getenv("FEED_INDEX_DEPTH", "1000"))  # posts kept per set
+FEED_SERVE_DEPTH = int(os.getenv("FEED_SERVE_DEPTH", "500"))  # offset+limit served from the index
+FEED_INDEX_TTL = int(os.getenv("FEED_INDEX_TTL", "3600"))  # seconds before a set is rebuilt
+FEED_DECAY_INTERVAL = int(os.getenv("FEED_DECAY_INTERVAL", "300"))  # seconds, 0 disables
+
+FEED_SORTS = ("new", "top", "hot")
+GLOBAL_SCOPE = "all"
+KEY_PREFIX = "feed:"
+
+HOT_DECAY_SECONDS = 43200.0  # one point of score is worth 12 hours of age
+_TOP_TIEBREAK = float(2 ** 32)  # epoch seconds fit below this until 2106
+
+
+class FeedEntry(NamedTuple):
+    """The columns a post's feed scores are computed from."""
+    post_id: str
+    face_id: str
+    created_at: datetime
+    karma: int
+
+    @classmethod
+    def from_post(cls, post) -> "FeedEntry":
+        return cls(str(post.post_id), str(post.face_id), post.created_at,
+                   (post.upvotes or 0) - (post.downvotes or 0))
+
+
+# ============================================
+# SCORES
+# ============================================
+
+def epoch_seconds(created_at: datetime) -> float:
+    # Stored timestamps are naive UTC, as is Postgres' extract('epoch', ...) on them
+    return created_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+def hot_score(karma: int, created_at: datetime) -> float:
+    """Python twin of the SQL hot ordering in sort_order()."""
+    return karma + epoch_seconds(created_at) / HOT_DECAY_SECONDS
+
+
+def feed_score(sort: str, karma: int, created_at: datetime) -> float:
+    if sort == "new":
+        return epoch_seconds(created_at)
+    if sort == "top":
+        # Score first, newest first within a score (same as the SQL tiebreak)
+        return karma * _TOP_TIEBREAK + int(epoch_seconds(created_at))
+    return hot_score(karma, created_at)
+
+
+def sort_order(sort: str) -> list:
+    """ORDER BY clauses for a post feed sort; unknown sorts rank as hot."""
+    if sort == "new":
+        return [desc(Post.created_at)]
+    if sort == "top":
+        return [desc(Post.upvotes - Post.downvotes), desc(Post.created_at)]
+    # hot - Reddit-style: score + time decay (recent posts boosted)
+    # Formula: score + (hours_since_epoch / 12) gives recent posts a boost
+    # When scores are all 0, this degrades gracefully to "newest first"
+    return [desc((Post.upvotes - Post.downvotes)
+                 + cast(extract("epoch", Post.created_at), Float) / HOT_DECAY_SECONDS)]
+
+
+def _key(scope: str, sort: str) -> str:
+    return f"{KEY_PREFIX}{scope}:{sort}"
+
+
+# ============================================
+# INDEX
+# ============================================
+
+class FeedIndex:
+    """Per-face and global ranked post ids for new/top/hot."""
+
+    def __init__(self, redis_client=None, depth: int = FEED_INDEX_DEPTH, ttl: int = FEED_INDEX_TTL):
+        self.redis = redis_client
+        self.depth = depth
+        self.ttl = ttl
+        self._sets: dict = {}  # key -> {post_id: score}
+        self._ready: dict = {}  # key -> monotonic expiry
+        self._lock = threading.Lock()
+
+    # ---- reads ----
+
+    def page(self, db: Session, face_id, sort: str, offset: int, limit: int) -> List[str]:
+        """Post ids for one page, best first. Builds the set from the database if it is cold."""
+        scope = str(face_id) if face_id else GLOBAL_SCOPE
+        key = _key(scope, sort)
+        ids = self._read(key, offset, limit)
+        if ids is None:
+            self.rebuild(db, face_id, sort)
+            ids = self._read(key, offset, limit) or []
+        return ids
+
+    def _read(self, key: str, offset: int, limit: int) -> Optional[List[str]]:
+        """Ids for the range, or None if the set is not built."""
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.exists(key + ":ready")
+                pipe.zrevrange(key, offset, offset + limit - 1)
+                ready, ids = pipe.execute()
+                return ids if ready else None
+            except Exception:
+                pass  # Redis failed, fall through to in-memory
+
+        with self._lock:
+            expires = self._ready.get(key)
+            if expires is None or expires < _time.monotonic():
+                return None
+            scores = self._sets.get(key, {})
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])
+        return [post_id for post_id, _ in top[offset:]]
+
+    # ---- builds ----
+
+    def rebuild(self, db: Session, face_id, sort: str):
+        """Replace one set with the best `depth` posts from the database."""
+        query = db.query(Post.post_id, Post.created_at, Post.upvotes, Post.downvotes).filter(
+            Post.is_removed == False
+        )
+        if face_id:
+            query = query.filter(Post.face_id == face_id)
+        rows = query.order_by(*sort_order(sort)).limit(self.depth).all()
+        scores = {
+            str(r.post_id): feed_score(sort, (r.upvotes or 0) - (r.downvotes or 0), r.created_at)
+            for r in rows
+        }
+        self._replace(_key(str(face_id) if face_id else GLOBAL_SCOPE, sort), scores)
+
+    def _replace(self, key: str, scores: dict):
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.delete(key)
+                if scores:
+                    pipe.zadd(key, scores)
+                    pipe.expire(key, self.ttl * 2)
+                pipe.set(key + ":ready", 1, ex=self.ttl)
+                pipe.execute()
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            self._sets[key] = scores
+            self._ready[key] = _time.monotonic() + self.ttl
+
+    def refresh(self, db: Session) -> int:
+        """Rebuild every built set from the database. Returns the number rebuilt."""
+        built = set()
+        if self.redis is not None:
+            try:
+                for ready_key in self.redis.scan_iter(match=f"{KEY_PREFIX}*:ready", count=500):
+                    built.add(ready_key[len(KEY_PREFIX):-len(":ready")])
+            except Exception:
+                pass
+        with self._lock:
+            now = _time.monotonic()
+            built.update(key[len(KEY_PREFIX):] for key, expires in self._ready.items() if expires >= now)
+        rebuilt = 0
+        for name in built:
+            scope, _, sort = name.rpartition(":")
+            if sort not in FEED_SORTS:
+                continue
+            self.rebuild(db, None if scope == GLOBAL_SCOPE else uuid.UUID(scope), sort)
+            rebuilt += 1
+        return rebuilt
+
+    # ---- writes ----
+
+    def add_post(self, entry: FeedEntry):
+        """Index a new post in its face's sets and the global sets."""
+        self._upsert(entry, FEED_SORTS)
+
+    def update_scores(self, entry: FeedEntry):
+        """Re-score a post after a vote (new is unaffected)."""
+        self._upsert(entry, ("top", "hot"))
+
+    def remove_post(self, post_id: str, face_id=None):
+        """Drop a post from the global sets and, if given, its face's sets."""
+        keys = [
+            _key(scope, sort)
+            for scope in ({str(face_id), GLOBAL_SCOPE} if face_id else {GLOBAL_SCOPE})
+            for sort in FEED_SORTS
+        ]
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key in keys:
+                    pipe.zrem(key, post_id)
+                pipe.execute()
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            for key in keys:
+                self._sets.get(key, {}).pop(post_id, None)
+
+    def _upsert(self, entry: FeedEntry, sorts):
+        updates = {
+            _key(scope, sort): feed_score(sort, entry.karma, entry.created_at)
+            for scope in (entry.face_id, GLOBAL_SCOPE)
+            for sort in sorts
+        }
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, score in updates.items():
+                    pipe.zadd(key, {entry.post_id: score})
+                    pipe.zremrangebyrank(key, 0, -(self.depth + 1))
+                    pipe.expire(key, self.ttl * 2)
+                pipe.execute()
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            for key, score in updates.items():
+                if key not in self._ready:
+                    continue  # never built; the first read loads it from the database
+                scores = self._sets.setdefault(key, {})
+                scores[entry.post_id] = score
+                if len(scores) > self.depth * 5 // 4:
+                    keep = heapq.nlargest(self.depth, scores.items(), key=lambda item: item[1])
+                    self._sets[key] = dict(keep)
+
+    def clear(self):
+        """Drop the in-process sets (Redis keys expire on their own)."""
+        with self._lock:
+            self._sets.clear()
+            self._ready.clear()
+
+
+feed_index = FeedIndex()
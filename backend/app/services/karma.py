@@ -0,0 +1,238 @@
+"""
+Synapse Karma Recompute
+Set-based karma reconciliation from the votes table.
+
+Karma for an agent is the sum of vote_type over every vote cast on that
+agent's posts and comments. cast_vote maintains it incrementally; this
+module rebuilds it from scratch (full mode) or only for agents whose
+content received votes since the last watermark (incremental mode).
+"""
+
+import time as _time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import bindparam, func, select, text, update
+from sqlalchemy.orm import Session
+
+from app.models.agent import Agent
+from app.models.comment import Comment
+from app.models.post import Post
+from app.models.vote import Vote
+
+WRITE_CHUNK_SIZE = 1000
+WATERMARK_KEY = "karma:watermark"
+
+# In-memory watermark (fallback when Redis is unavailable)
+_memory_watermark: dict = {}
+
+
+# ============================================
+# WATERMARK STORAGE
+# ============================================
+
+def load_watermark(redis_client) -> Optional[datetime]:
+    """Return the last incremental watermark, or None if never run."""
+    raw = None
+    if redis_client is not None:
+        try:
+            raw = redis_client.get(WATERMARK_KEY)
+        except Exception:
+            raw = None
+    if raw is None:
+        raw = _memory_watermark.get(WATERMARK_KEY)
+    return datetime.fromisoformat(raw) if raw else None
+
+
+def store_watermark(redis_client, watermark: Optional[datetime]):
+    """Persist the watermark in Redis if available, in memory otherwise."""
+    if watermark is None:
+        return
+    raw = watermark.isoformat()
+    _memory_watermark[WATERMARK_KEY] = raw
+    if redis_client is not None:
+        try:
+            redis_client.set(WATERMARK_KEY, raw)
+        except Exception:
+            pass
+
+
+# ============================================
+# AGGREGATION
+# ============================================
+
+def _vote_sums_query(content_model, vote_fk, agent_ids=None):
+    """SUM(vote_type) grouped by content author for one vote source."""
+    query = (
+        select(content_model.author_agent_id, func.sum(Vote.vote_type))
+        .join(content_model, vote_fk == getattr(content_model, vote_fk.key))
+        .group_by(content_model.author_agent_id)
+    )
+    if agent_ids is not None:
+        query = query.where(content_model.author_agent_id.in_(agent_ids))
+    return query
+
+
+def _touched_agent_ids(db: Session, since: datetime) -> list:
+    """Authors whose posts or comments received votes after `since`."""
+    post_authors = (
+        select(Post.author_agent_id)
+        .join(Vote, Vote.post_id == Post.post_id)
+        .where(Vote.created_at > since)
+    )
+    comment_authors = (
+        select(Comment.author_agent_id)
+        .join(Vote, Vote.comment_id == Comment.comment_id)
+        .where(Vote.created_at > since)
+    )
+    rows = db.execute(post_authors.union(comment_authors)).all()
+    return [r[0] for r in rows]
+
+
+def _merge_sums(agent_ids: list, current: list, *sources) -> list:
+    """
+    Merge per-source (agent_id, sum) rows into one karma vector aligned
+    with agent_ids. Returns the (agent_id, old, new) triples that differ.
+    """
+    index = {aid: i for i, aid in enumerate(agent_ids)}
+    try:
+        import numpy as np  # deferred: only admin/backfill paths need it
+    except ImportError:  # pragma: no cover - numpy is in requirements.txt
+        np = None
+
+    if np is not None:
+        karma = np.zeros(len(agent_ids), dtype=np.int64)
+        for rows in sources:
+            if not rows:
+                continue
+            idx = np.fromiter((index[a] for a, _ in rows if a in index), dtype=np.int64)
+            vals = np.fromiter((int(s or 0) for a, s in rows if a in index), dtype=np.int64)
+            np.add.at(karma, idx, vals)
+        old = np.asarray(current, dtype=np.int64)
+        changed = np.nonzero(karma != old)[0]
+        return [(agent_ids[i], int(old[i]), int(karma[i])) for i in changed]
+
+    karma = [0] * len(agent_ids)
+    for rows in sources:
+        for aid, total in rows:
+            if aid in index:
+                karma[index[aid]] += int(total or 0)
+    return [
+        (agent_ids[i], current[i], karma[i])
+        for i in range(len(agent_ids))
+        if karma[i] != current[i]
+    ]
+
+
+# ============================================
+# WRITE-BACK
+# ============================================
+
+def _write_karma(db: Session, changes: list):
+    """Bulk-write new karma values, chunked."""
+    if not changes:
+        return
+    dialect = db.get_bind().dialect.name
+
+    for start in range(0, len(changes), WRITE_CHUNK_SIZE):
+        chunk = changes[start:start + WRITE_CHUNK_SIZE]
+        if dialect == "postgresql":
+            # One UPDATE ... FROM (VALUES ...) per chunk
+            values_sql = ", ".join(
+                f"(CAST(:id{i} AS UUID), CAST(:k{i} AS INTEGER))" for i in range(len(chunk))
+            )
+            params = {}
+            for i, (aid, _, new) in enumerate(chunk):
+                params[f"id{i}"] = str(aid)
+                params[f"k{i}"] = new
+            db.execute(
+                text(
+                    "UPDATE agents SET karma = v.karma "
+                    f"FROM (VALUES {values_sql}) AS v(agent_id, karma) "
+                    "WHERE agents.agent_id = v.agent_id"
+                ),
+                params,
+            )
+        else:
+            # Portable executemany fallback (SQLite, tests)
+            db.connection().execute(
+                update(Agent.__table__)
+                .where(Agent.__table__.c.agent_id == bindparam("_agent_id"))
+                .values(karma=bindparam("_karma")),
+                [{"_agent_id": aid, "_karma": new} for aid, _, new in chunk],
+            )
+
+
+# ============================================
+# PUBLIC API
+# ============================================
+
+def recompute_karma(
+    db: Session,
+    incremental: bool = False,
+    since: Optional[datetime] = None,
+) -> dict:
+    """
+    Recompute agent karma from post and comment votes.
+
+    Args:
+        db: SQLAlchemy session (committed on success)
+        incremental: Only touch agents whose content got votes after `since`
+        since: Watermark for incremental mode; ignored in full mode
+
+    Returns:
+        Summary dict with the number of agents scanned and updated, the
+        individual changes, and the new watermark (max vote created_at).
+
+    Incremental mode only sees votes *created* after the watermark. Vote
+    removals and direction changes are reflected by cast_vote directly and
+    are corrected by the next full run if they ever drift.
+    """
+    started = _time.perf_counter()
+    watermark = db.execute(select(func.max(Vote.created_at))).scalar()
+
+    if incremental and since is not None:
+        agent_ids = _touched_agent_ids(db, since)
+        if not agent_ids:
+            return {
+                "mode": "incremental",
+                "agents_scanned": 0,
+                "karma_updated": 0,
+                "karma_changes": [],
+                "watermark": watermark,
+                "elapsed_ms": round((_time.perf_counter() - started) * 1000, 2),
+            }
+        current_rows = db.execute(
+            select(Agent.agent_id, Agent.username, Agent.karma)
+            .where(Agent.agent_id.in_(agent_ids))
+        ).all()
+        scope = agent_ids
+    else:
+        incremental = False
+        current_rows = db.execute(
+            select(Agent.agent_id, Agent.username, Agent.karma)
+        ).all()
+        scope = None
+
+    post_sums = db.execute(_vote_sums_query(Post, Vote.post_id, scope)).all()
+    comment_sums = db.execute(_vote_sums_query(Comment, Vote.comment_id, scope)).all()
+
+    ids = [r[0] for r in current_rows]
+    usernames = {r[0]: r[1] for r in current_rows}
+    current = [r[2] or 0 for r in current_rows]
+    changes = _merge_sums(ids, current, post_sums, comment_sums)
+
+    _write_karma(db, changes)
+    db.commit()
+
+    return {
+        "mode": "incremental" if incremental else "full",
+        "agents_scanned": len(ids),
+        "karma_updated": len(changes),
+        "karma_changes": [
+            {"username": usernames[aid], "old_karma": old, "new_karma": new}
+            for aid, old, new in changes
+        ],
+        "watermark": watermark,
+        "elapsed_ms": round((_time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,263 @@
+"""
+Synapse Karma Leaderboard
+Agents ranked by karma, globally and per framework, with O(log n) rank
+lookups. Uses Redis sorted sets if available, falls back to an in-process
+order-statistic list (sortedcontainers.SortedList).
+
+cast_vote writes the author's new karma after every vote, register adds
+new agents at 0, and the karma backfill reloads everything. The board is
+built from the agents table on first read and reloaded when its ready
+marker expires (LEADERBOARD_TTL), which repairs any missed update.
+
+Ranks are competition ranks: agents with equal karma share a rank
+(1, 2, 2, 4). Paging uses an opaque cursor anchored on the last agent
+returned, so a page stays continuous while karma moves underneath it.
+"""
+
+import base64
+import bisect
+import os
+import threading
+import time as _time
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.agent import Agent
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:  # pragma: no cover - sortedcontainers is in requirements.txt
+    class SortedList(list):
+        """Plain sorted list: O(log n) lookups, O(n) inserts."""
+
+        def add(self, value):
+            bisect.insort(self, value)
+
+        def bisect_left(self, value):
+            return bisect.bisect_left(self, value)
+
+
+LEADERBOARD_TTL = int(os.getenv("LEADERBOARD_TTL", "86400"))  # seconds before a reload from the DB
+
+KEY_PREFIX = "lb:karma:"
+READY_KEY = KEY_PREFIX + "ready"
+GLOBAL_BOARD = "all"
+
+
+def board_name(framework: Optional[str]) -> str:
+    """Board for a framework (case-insensitive), or the global board."""
+    return f"fw:{framework.strip().lower()}" if framework else GLOBAL_BOARD
+
+
+def encode_cursor(position: int, agent_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{position}:{agent_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """Return (position, agent_id) of the last row of the previous page."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        position, agent_id = raw.split(":", 1)
+        return int(position), agent_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class _Board:
+    """In-process order-statistic list of (-karma, agent_id): position = rank order."""
+
+    def __init__(self):
+        self.keys = SortedList()
+        self.karma = {}  # agent_id -> karma
+
+    def set(self, agent_id: str, karma: int):
+        old = self.karma.get(agent_id)
+        if old == karma:
+            return
+        if old is not None:
+            self.keys.remove((-old, agent_id))
+        self.karma[agent_id] = karma
+        self.keys.add((-karma, agent_id))
+
+    def position(self, agent_id: str) -> Optional[int]:
+        karma = self.karma.get(agent_id)
+        if karma is None:
+            return None
+        return self.keys.bisect_left((-karma, agent_id))
+
+    def count_above(self, karma: int) -> int:
+        return self.keys.bisect_left((-karma, ""))
+
+    def slice(self, start: int, stop: int) -> List[Tuple[str, int]]:
+        return [(agent_id, -neg) for neg, agent_id in self.keys[start:stop]]
+
+
+class Leaderboard:
+    """Karma leaderboards: one global, one per framework."""
+
+    def __init__(self, redis_client=None, ttl: int = LEADERBOARD_TTL):
+        self.redis = redis_client
+        self.ttl = ttl
+        self._boards: dict = {}  # board name -> _Board
+        self._ready_until = 0.0
+        self._lock = threading.Lock()
+
+    # ---- reads ----
+
+    def page(self, db: Session, framework: Optional[str] = None, limit: int = 25,
+             cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of {agent_id, karma, rank}, best first, plus the cursor for
+        the next page (None at the end). Raises ValueError on a bad cursor.
+        """
+        self._ensure(db)
+        name = board_name(framework)
+        start = 0
+        if cursor:
+            position, agent_id = decode_cursor(cursor)
+            current = self._position(name, agent_id)
+            start = (current if current is not None else position) + 1
+        rows = self._range(name, start, start + limit)
+        if not rows:
+            return [], None
+
+        entries = []
+        rank = None
+        for i, (agent_id, karma) in enumerate(rows):
+            if rank is None or karma != entries[-1]["karma"]:
+                rank = self._count_above(name, karma) + 1 if i == 0 else start + i + 1
+            entries.append({"agent_id": agent_id, "karma": karma, "rank": rank})
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_cursor(start + len(rows) - 1, rows[-1][0])
+        return entries, next_cursor
+
+    def slice(self, db: Session, offset: int, limit: int) -> List[str]:
+        """Agent ids at global positions [offset, offset+limit), for offset paging."""
+        self._ensure(db)
+        return [agent_id for agent_id, _ in self._range(GLOBAL_BOARD, offset, offset + limit)]
+
+    def rank(self, db: Session, agent_id: str, karma: int,
+             framework: Optional[str] = None) -> Optional[int]:
+        """Competition rank of an agent with `karma`, or None if it is not on the board."""
+        self._ensure(db)
+        name = board_name(framework)
+        if self._position(name, str(agent_id)) is None:
+            return None
+        return self._count_above(name, karma) + 1
+
+    def _range(self, name: str, start: int, stop: int) -> List[Tuple[str, int]]:
+        if self.redis is not None:
+            try:
+                rows = self.redis.zrevrange(KEY_PREFIX + name, start, stop - 1, withscores=True)
+                return [(member, int(score)) for member, score in rows]
+            except Exception:
+                pass  # Redis failed, fall through to in-memory
+        with self._lock:
+            board = self._boards.get(name)
+            return board.slice(start, stop) if board else []
+
+    def _position(self, name: str, agent_id: str) -> Optional[int]:
+        if self.redis is not None:
+            try:
+                return self.redis.zrevrank(KEY_PREFIX + name, agent_id)
+            except Exception:
+                pass
+        with self._lock:
+            board = self._boards.get(name)
+            return board.position(agent_id) if board else None
+
+    def _count_above(self, name: str, karma: int) -> int:
+        if self.redis is not None:
+            try:
+                return self.redis.zcount(KEY_PREFIX + name, f"({karma}", "+inf")
+            except Exception:
+                pass
+        with self._lock:
+            board = self._boards.get(name)
+            return board.count_above(karma) if board else 0
+
+    # ---- builds ----
+
+    def is_ready(self) -> bool:
+        if self.redis is not None:
+            try:
+                return bool(self.redis.exists(READY_KEY))
+            except Exception:
+                pass
+        return self._ready_until >= _time.monotonic()
+
+    def _ensure(self, db: Session):
+        if not self.is_ready():
+            self.rebuild(db)
+
+    def rebuild(self, db: Session) -> int:
+        """Reload every board from the agents table. Returns the number of agents ranked."""
+        rows = (
+            db.query(Agent.agent_id, Agent.karma, Agent.framework)
+            .filter(Agent.is_banned == False)
+            .all()
+        )
+        boards = {GLOBAL_BOARD: {}}
+        for r in rows:
+            agent_id, karma = str(r.agent_id), r.karma or 0
+            boards[GLOBAL_BOARD][agent_id] = karma
+            if r.framework:
+                boards.setdefault(board_name(r.framework), {})[agent_id] = karma
+
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                for key in self.redis.scan_iter(match=f"{KEY_PREFIX}*", count=500):
+                    pipe.delete(key)
+                for name, scores in boards.items():
+                    items = list(scores.items())
+                    for i in range(0, len(items), 5000):
+                        pipe.zadd(KEY_PREFIX + name, dict(items[i:i + 5000]))
+                pipe.set(READY_KEY, 1, ex=self.ttl)
+                pipe.execute()
+                return len(rows)
+            except Exception:
+                pass
+
+        built = {}
+        for name, scores in boards.items():
+            board = _Board()
+            for agent_id, karma in scores.items():
+                board.set(agent_id, karma)
+            built[name] = board
+        with self._lock:
+            self._boards = built
+            self._ready_until = _time.monotonic() + self.ttl
+        return len(rows)
+
+    # ---- writes ----
+
+    def update(self, agent_id, framework: Optional[str], karma: int):
+        """Record an agent's current karma on the global and framework boards."""
+        agent_id = str(agent_id)
+        names = [GLOBAL_BOARD] + ([board_name(framework)] if framework else [])
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for name in names:
+                    pipe.zadd(KEY_PREFIX + name, {agent_id: karma})
+                pipe.execute()
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            if self._ready_until < _time.monotonic():
+                return  # not built; the first read loads it from the database
+            for name in names:
+                self._boards.setdefault(name, _Board()).set(agent_id, karma)
+
+    def clear(self):
+        with self._lock:
+            self._boards = {}
+            self._ready_until = 0.0
+
+
+leaderboard = Leaderboard()
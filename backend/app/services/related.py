@@ -0,0 +1,303 @@
+"""
+Synapse Related Posts
+Top-k most similar posts per post, by cosine similarity of TF-IDF vectors
+over titles and bodies, precomputed by a background job.
+
+The corpus is the most recent RELATED_MAX_POSTS posts, held in process as
+per-post (term id, count) arrays. Each refresh pulls posts created since
+the last one, builds the sparse TF-IDF matrix in CSR form with NumPy
+(sublinear tf, smoothed idf, title terms counted twice, rows L2
+normalised), and scores each new post against the corpus through the
+term postings (the CSC view), so only posts sharing a term are touched.
+A new post's neighbours are stored, and it is merged into the lists of
+the posts it scored highest against. Once RELATED_FULL_INTERVAL passes,
+every list is recomputed with fresh idf weights.
+
+Neighbour lists are stored in Redis if available (so every worker serves
+the same lists), falling back to an in-process dict. Reads never touch
+the corpus. With Redis, only the worker holding the LEADER_KEY lease
+builds a corpus and computes; the others just serve the stored lists.
+"""
+
+import os
+import re
+import threading
+import time as _time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.post import Post
+
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", "20"))  # neighbours kept per post
+RELATED_MAX_POSTS = int(os.getenv("RELATED_MAX_POSTS", "50000"))  # most recent posts in the corpus
+RELATED_REFRESH_INTERVAL = int(os.getenv("RELATED_REFRESH_INTERVAL", "300"))  # seconds, 0 disables
+RELATED_FULL_INTERVAL = int(os.getenv("RELATED_FULL_INTERVAL", "86400"))  # seconds between idf refreshes
+RELATED_MIN_SCORE = float(os.getenv("RELATED_MIN_SCORE", "0.05"))  # cosine similarity floor
+
+MAX_DF = 0.3  # terms in a larger share of posts (and 10+ posts) are too common to score
+TITLE_WEIGHT = 2
+
+KEY_PREFIX = "related:"
+LEADER_KEY = KEY_PREFIX + "leader"  # worker that owns the corpus, renewed on every refresh
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9_+#.-]*[a-z0-9+#]|[a-z0-9]")
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could did do does
+for from had has have he her his how i if in into is it its just like me more most my no not
+of on or our out over she so some than that the their them then there these they this to up
+us was we were what when which who will with would you your
+""".split())
+
+
+def tokenize(title: str, content: str) -> Counter:
+    """Term counts for a post; title terms count TITLE_WEIGHT times."""
+    counts = Counter()
+    for text, weight in ((title or "", TITLE_WEIGHT), (content or "", 1)):
+        for term in _WORD.findall(text.lower()):
+            if len(term) > 1 and term not in STOPWORDS:
+                counts[term] += weight
+    return counts
+
+
+class RelatedPosts:
+    """TF-IDF corpus of recent posts and their precomputed nearest neighbours."""
+
+    def __init__(self, redis_client=None, k: int = RELATED_TOP_K,
+                 max_posts: int = RELATED_MAX_POSTS):
+        self.redis = redis_client
+        self.k = k
+        self.max_posts = max_posts
+        self._vocab: dict = {}  # term -> column
+        self._df: list = []  # column -> number of posts containing the term
+        self._docs: dict = {}  # post_id -> (columns, counts), insertion (creation) order
+        self._neighbors: dict = {}  # post_id -> [(post_id, score), ...] best first
+        self._watermark: Optional[datetime] = None
+        self._full_at = 0.0
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex
+
+    # ---- reads ----
+
+    def neighbors(self, post_id: str, limit: int = RELATED_TOP_K) -> List[Tuple[str, float]]:
+        """Precomputed [(post_id, score), ...] most similar first; empty until computed."""
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(KEY_PREFIX + str(post_id))
+                if raw is not None:
+                    return _decode(raw)[:limit]
+                return []
+            except Exception:
+                pass  # Redis failed, fall through to in-memory
+        with self._lock:
+            return list(self._neighbors.get(str(post_id), []))[:limit]
+
+    # ---- builds ----
+
+    def refresh(self, db: Session, full: Optional[bool] = None, now: Optional[float] = None) -> int:
+        """
+        Add posts created since the last refresh and compute neighbours: for
+        the new posts only, or for every post when `full` (default: when
+        RELATED_FULL_INTERVAL has passed). Returns the number of posts scored.
+        """
+        now = _time.monotonic() if now is None else now
+        if not self._is_leader():
+            return 0
+        new_ids = self._load(db)
+        if full is None:
+            full = now >= self._full_at
+        if full:
+            self._compact()
+        targets = list(self._docs) if full else [p for p in new_ids if p in self._docs]
+        if not targets:
+            return 0
+
+        computed = self._compute(targets, merge=not full)
+        self._store(computed, replace=full)
+        if full:
+            self._full_at = now + RELATED_FULL_INTERVAL
+        return len(targets)
+
+    def _is_leader(self) -> bool:
+        """Take or renew the compute lease. Without Redis every worker computes its own lists."""
+        if self.redis is None:
+            return True
+        lease = max(2 * RELATED_REFRESH_INTERVAL, 600)  # outlives a full recompute between refreshes
+        try:
+            if self.redis.set(LEADER_KEY, self._token, nx=True, ex=lease):
+                return True
+            if self.redis.get(LEADER_KEY) == self._token:
+                self.redis.expire(LEADER_KEY, lease)
+                return True
+            return False
+        except Exception:
+            return True  # Redis failed: neighbours fall back to this worker's memory
+
+    def _load(self, db: Session) -> List[str]:
+        query = db.query(Post.post_id, Post.title, Post.content, Post.created_at).filter(
+            Post.is_removed == False
+        )
+        if self._watermark is not None:
+            query = query.filter(Post.created_at >= self._watermark)
+            rows = query.order_by(Post.created_at).all()
+        else:
+            rows = query.order_by(Post.created_at.desc()).limit(self.max_posts).all()[::-1]
+
+        added = []
+        for r in rows:
+            post_id = str(r.post_id)
+            if post_id in self._docs:
+                continue
+            counts = tokenize(r.title, r.content)
+            if counts:
+                self._add_doc(post_id, counts)
+                added.append(post_id)
+            if self._watermark is None or r.created_at > self._watermark:
+                self._watermark = r.created_at
+        while len(self._docs) > self.max_posts:
+            self._drop_doc(next(iter(self._docs)))
+        return added
+
+    def _add_doc(self, post_id: str, counts: Counter):
+        columns = []
+        for term in counts:
+            column = self._vocab.get(term)
+            if column is None:
+                column = self._vocab[term] = len(self._df)
+                self._df.append(0)
+            self._df[column] += 1
+            columns.append(column)
+        self._docs[post_id] = (columns, list(counts.values()))
+
+    def _drop_doc(self, post_id: str):
+        columns, _ = self._docs.pop(post_id)
+        for column in columns:
+            self._df[column] -= 1
+        with self._lock:
+            self._neighbors.pop(post_id, None)
+
+    def _compact(self):
+        """Forget terms no posts in the corpus use any more and renumber the remaining columns."""
+        remap, df = {}, []
+        for column, count in enumerate(self._df):
+            if count > 0:
+                remap[column] = len(df)
+                df.append(count)
+        if len(df) == len(self._df):
+            return
+        self._vocab = {term: remap[column] for term, column in self._vocab.items() if column in remap}
+        self._df = df
+        for post_id, (columns, counts) in self._docs.items():
+            self._docs[post_id] = ([remap[c] for c in columns], counts)
+
+    def _matrix(self):
+        """Row-normalised TF-IDF matrix in CSR form plus its postings (CSC) view."""
+        import numpy as np  # deferred: only the background refresh needs it
+
+        ids = list(self._docs)
+        n = len(ids)
+        lengths = np.fromiter((len(self._docs[p][0]) for p in ids), dtype=np.int64, count=n)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        nnz = int(indptr[-1])
+        indices = np.fromiter((c for p in ids for c in self._docs[p][0]), dtype=np.int64, count=nnz)
+        counts = np.fromiter((c for p in ids for c in self._docs[p][1]), dtype=np.float64, count=nnz)
+
+        df = np.asarray(self._df, dtype=np.float64)
+        idf = np.log((1 + n) / (1 + df)) + 1
+        data = (1 + np.log(counts)) * idf[indices]
+        norms = np.sqrt(np.add.reduceat(data * data, indptr[:-1]))
+        data /= np.repeat(norms, lengths)
+
+        # Postings: for each term, the rows containing it (common terms are left out)
+        rows = np.repeat(np.arange(n), lengths)
+        scored = df[indices] <= max(MAX_DF * n, 10)
+        order = np.argsort(indices[scored], kind="stable")
+        post_rows = rows[scored][order]
+        post_data = data[scored][order]
+        colptr = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices[scored], minlength=len(df)), out=colptr[1:])
+        return ids, indptr, indices, data, colptr, post_rows, post_data
+
+    def _compute(self, targets: List[str], merge: bool) -> dict:
+        """post_id -> neighbour list for `targets`, and (when merging) for the posts they join."""
+        import numpy as np
+
+        ids, indptr, indices, data, colptr, post_rows, post_data = self._matrix()
+        row_of = {post_id: i for i, post_id in enumerate(ids)}
+        target_set = set(targets)
+        results = {}
+        with self._lock:
+            current = dict(self._neighbors) if merge else {}
+
+        for post_id in targets:
+            i = row_of[post_id]
+            cols = indices[indptr[i]:indptr[i + 1]]
+            weights = data[indptr[i]:indptr[i + 1]]
+            spans = colptr[cols + 1] - colptr[cols]
+            if not spans.sum():
+                results[post_id] = []
+                continue
+            take = np.concatenate([np.arange(colptr[c], colptr[c + 1])
+                                   for c, span in zip(cols, spans) if span])
+            candidates, inverse = np.unique(post_rows[take], return_inverse=True)
+            scores = np.bincount(inverse, weights=post_data[take] * np.repeat(weights, spans))
+            scores[candidates == i] = 0
+            keep = min(self.k, len(scores))
+            top = np.argpartition(-scores, keep - 1)[:keep] if keep else []
+            best = sorted(((ids[candidates[j]], float(scores[j])) for j in top
+                           if scores[j] >= RELATED_MIN_SCORE), key=lambda item: item[1], reverse=True)
+            results[post_id] = best
+
+            if merge:
+                # Scores are symmetric: the new post may join its neighbours' lists
+                for other, score in best:
+                    if other in target_set:
+                        continue  # scored against the whole corpus in this pass
+                    existing = results.get(other, current.get(other, []))
+                    if len(existing) < self.k or score > existing[-1][1]:
+                        merged = [e for e in existing if e[0] != post_id] + [(post_id, score)]
+                        merged.sort(key=lambda item: item[1], reverse=True)
+                        results[other] = merged[:self.k]
+        return results
+
+    def _store(self, results: dict, replace: bool):
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for post_id, items in results.items():
+                    pipe.set(KEY_PREFIX + post_id, _encode(items), ex=2 * RELATED_FULL_INTERVAL)
+                pipe.execute()
+            except Exception:
+                pass
+        with self._lock:
+            if replace:
+                self._neighbors = dict(results)
+            else:
+                self._neighbors.update(results)
+
+    def clear(self):
+        with self._lock:
+            self._vocab.clear()
+            self._df.clear()
+            self._docs.clear()
+            self._neighbors.clear()
+            self._watermark = None
+            self._full_at = 0.0
+
+
+def _encode(items: List[Tuple[str, float]]) -> str:
+    return ",".join(f"{post_id}:{score:.4f}" for post_id, score in items)
+
+
+def _decode(raw: str) -> List[Tuple[str, float]]:
+    if not raw:
+        return []
+    return [(post_id, float(score)) for post_id, score in
+            (item.rsplit(":", 1) for item in raw.split(","))]
+
+
+related_posts = RelatedPosts()
@@ -0,0 +1,194 @@
+"""
+Synapse Rising Feed
+Posts gaining votes and comments fastest right now, from per-post
+sliding-window activity counters. Uses Redis if available, falls back to
+in-process dicts.
+
+cast_vote (new upvotes) and create_comment bump a per-minute counter for
+the post. A sweep sums each active post's counters over the last
+RISING_WINDOW seconds, weighting recent minutes more, and keeps the best
+RISING_TOP_K per face and globally. sort=rising reads that list, so the
+read path never touches the votes table. Only posts younger than
+RISING_MAX_AGE are tracked.
+"""
+
+import heapq
+import os
+import threading
+import time as _time
+from collections import defaultdict
+from typing import List, Optional
+
+from app.services.feeds import GLOBAL_SCOPE, FeedEntry, epoch_seconds
+
+RISING_WINDOW = int(os.getenv("RISING_WINDOW", "3600"))  # seconds of activity counted
+RISING_TOP_K = int(os.getenv("RISING_TOP_K", "200"))  # posts kept per face and globally
+RISING_SWEEP_INTERVAL = int(os.getenv("RISING_SWEEP_INTERVAL", "60"))  # seconds, 0 disables the task
+RISING_MAX_AGE = int(os.getenv("RISING_MAX_AGE", "86400"))  # older posts are not tracked
+RISING_COMMENT_WEIGHT = int(os.getenv("RISING_COMMENT_WEIGHT", "2"))  # a comment counts as this many votes
+
+MINUTE = 60
+
+KEY_PREFIX = "rising:"
+ACTIVE_KEY = KEY_PREFIX + "active"  # ZSET post_id -> last activity epoch
+FACES_KEY = KEY_PREFIX + "faces"  # HASH post_id -> face_id
+READY_KEY = KEY_PREFIX + "ready"
+
+
+def _counts_key(post_id: str) -> str:
+    return f"{KEY_PREFIX}c:{post_id}"
+
+
+def _top_key(scope: str) -> str:
+    return f"{KEY_PREFIX}top:{scope}"
+
+
+def velocity(counts: dict, now: float, window: int = RISING_WINDOW) -> float:
+    """
+    Activity over the window from {minute: count}, each minute weighted by
+    how recent it is (1.0 for the current minute, falling linearly to 0 at
+    the window edge).
+    """
+    minutes = max(window // MINUTE, 1)
+    current = int(now // MINUTE)
+    total = 0.0
+    for minute, count in counts.items():
+        age = current - int(minute)
+        if 0 <= age < minutes:
+            total += int(count) * (minutes - age) / minutes
+    return total
+
+
+class RisingFeed:
+    """Per-minute activity counters per post and the swept top-K per face."""
+
+    def __init__(self, redis_client=None, window: int = RISING_WINDOW, top_k: int = RISING_TOP_K):
+        self.redis = redis_client
+        self.window = window
+        self.top_k = top_k
+        self._counts: dict = defaultdict(dict)  # post_id -> {minute: count}
+        self._faces: dict = {}  # post_id -> face_id
+        self._top: dict = {}  # scope -> [post_id, ...] best first
+        self._swept_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    # ---- writes ----
+
+    def record(self, entry: FeedEntry, weight: int = 1, now: Optional[float] = None):
+        """Count `weight` units of activity on a post in the current minute."""
+        now = _time.time() if now is None else now
+        if weight <= 0 or now - epoch_seconds(entry.created_at) > RISING_MAX_AGE:
+            return
+        minute = int(now // MINUTE)
+
+        if self.redis is not None:
+            try:
+                key = _counts_key(entry.post_id)
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.hincrby(key, minute, weight)
+                pipe.expire(key, self.window + MINUTE)
+                pipe.zadd(ACTIVE_KEY, {entry.post_id: now})
+                pipe.hset(FACES_KEY, entry.post_id, entry.face_id)
+                pipe.execute()
+                return
+            except Exception:
+                pass  # Redis failed, fall through to in-memory
+
+        with self._lock:
+            counts = self._counts[entry.post_id]
+            counts[minute] = counts.get(minute, 0) + weight
+            self._faces[entry.post_id] = entry.face_id
+
+    # ---- sweep ----
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Recompute the rising top-K lists. Returns the number of active posts scored."""
+        now = _time.time() if now is None else now
+        if self.redis is not None:
+            try:
+                return self._sweep_redis(now)
+            except Exception:
+                pass
+
+        oldest = int(now // MINUTE) - max(self.window // MINUTE, 1)
+        with self._lock:
+            for post_id in list(self._counts):
+                counts = self._counts[post_id]
+                for minute in [m for m in counts if m <= oldest]:
+                    del counts[minute]
+                if not counts:
+                    del self._counts[post_id]
+                    self._faces.pop(post_id, None)
+            scores = {post_id: velocity(counts, now, self.window)
+                      for post_id, counts in self._counts.items()}
+            top = self._rank(scores, self._faces)
+            self._top = {scope: [post_id for post_id, _ in items] for scope, items in top.items()}
+            self._swept_at = now
+        return len(scores)
+
+    def _sweep_redis(self, now: float) -> int:
+        self.redis.zremrangebyscore(ACTIVE_KEY, "-inf", now - self.window)
+        post_ids = self.redis.zrange(ACTIVE_KEY, 0, -1)
+        pipe = self.redis.pipeline(transaction=False)
+        for post_id in post_ids:
+            pipe.hgetall(_counts_key(post_id))
+        counts = pipe.execute()
+        faces = dict(zip(post_ids, self.redis.hmget(FACES_KEY, post_ids))) if post_ids else {}
+        scores = {post_id: velocity(c, now, self.window) for post_id, c in zip(post_ids, counts)}
+        top = self._rank(scores, faces)
+
+        pipe = self.redis.pipeline()
+        for key in self.redis.scan_iter(match=_top_key("*"), count=500):
+            pipe.delete(key)
+        for scope, items in top.items():
+            pipe.zadd(_top_key(scope), dict(items))
+        stale = [post_id for post_id in self.redis.hkeys(FACES_KEY) if post_id not in scores]
+        if stale:
+            pipe.hdel(FACES_KEY, *stale)
+        pipe.set(READY_KEY, 1, ex=max(RISING_SWEEP_INTERVAL, MINUTE) * 2)
+        pipe.execute()
+        return len(scores)
+
+    def _rank(self, scores: dict, faces: dict) -> dict:
+        """scope -> [(post_id, velocity), ...] best first, top_k per scope."""
+        by_scope = defaultdict(list)
+        for post_id, score in scores.items():
+            if score <= 0:
+                continue
+            by_scope[GLOBAL_SCOPE].append((post_id, score))
+            if faces.get(post_id):
+                by_scope[faces[post_id]].append((post_id, score))
+        return {
+            scope: heapq.nlargest(self.top_k, items, key=lambda item: (item[1], item[0]))
+            for scope, items in by_scope.items()
+        }
+
+    # ---- reads ----
+
+    def page(self, face_id, offset: int, limit: int, now: Optional[float] = None) -> List[str]:
+        """Rising post ids for a face (or globally), best first. Never queries the database."""
+        now = _time.time() if now is None else now
+        scope = str(face_id) if face_id else GLOBAL_SCOPE
+        if self.redis is not None:
+            try:
+                if not self.redis.exists(READY_KEY):
+                    self._sweep_redis(now)
+                return self.redis.zrevrange(_top_key(scope), offset, offset + limit - 1)
+            except Exception:
+                pass
+
+        # Without the background task, sweep on read once the last result is stale
+        if self._swept_at is None or now - self._swept_at >= max(RISING_SWEEP_INTERVAL, MINUTE):
+            self.sweep(now)
+        with self._lock:
+            return self._top.get(scope, [])[offset:offset + limit]
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._faces.clear()
+            self._top = {}
+            self._swept_at = None
+
+
+rising_feed = RisingFeed()
@@ -0,0 +1,248 @@
+"""
+Synapse Windowed Top
+"Top this hour/day/week/month/year" from time-bucketed score sets.
+
+Posts are bucketed by creation time: hourly buckets for the last two days
+and daily buckets for the last year, per face and globally. Each bucket
+is a score-ordered set (Redis ZSET, in-process dict as fallback) holding
+its best TOP_BUCKET_DEPTH posts. A window read fetches the head of every
+bucket the window covers and k-way merges them with a heap, so "top this
+week" reads 8 short lists instead of sorting every post of the week.
+
+create_post and cast_vote keep the buckets current. A background job
+loads them from the database: a full pass over the year when the ready
+marker is missing, then periodic refreshes of the recent buckets, where
+nearly all voting happens. Until the first full pass completes, reads
+return None and callers use the SQL path.
+"""
+
+import heapq
+import os
+import threading
+import time as _time
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.post import Post
+from app.services.feeds import GLOBAL_SCOPE, FeedEntry, epoch_seconds, feed_score
+
+TOP_BUCKET_DEPTH = int(os.getenv("TOP_BUCKET_DEPTH", "500"))  # posts kept per bucket
+TOP_WINDOW_SERVE_DEPTH = int(os.getenv("TOP_WINDOW_SERVE_DEPTH", "250"))  # offset+limit served from buckets
+TOP_WINDOW_REFRESH_INTERVAL = int(os.getenv("TOP_WINDOW_REFRESH_INTERVAL", "900"))  # seconds, 0 disables
+TOP_WINDOW_READY_TTL = int(os.getenv("TOP_WINDOW_READY_TTL", str(7 * 86400)))  # seconds between full passes
+
+HOUR, DAY = 3600, 86400
+HOURLY_BUCKETS = 48
+DAILY_BUCKETS = 367
+RECENT_DAYS = 8  # daily buckets reloaded by the periodic refresh
+
+# Window -> (length in seconds, bucket size in seconds)
+WINDOWS = {
+    "hour": (HOUR, HOUR),
+    "day": (DAY, HOUR),
+    "week": (7 * DAY, DAY),
+    "month": (30 * DAY, DAY),
+    "year": (365 * DAY, DAY),
+}
+TIME_FILTERS = tuple(WINDOWS) + ("all",)
+
+KEY_PREFIX = "topw:"
+READY_KEY = KEY_PREFIX + "ready"
+_TOP_TIEBREAK = 2 ** 32  # feed_score("top") packs created epoch into the low 32 bits
+
+
+def _key(scope: str, bucket_size: int, index: int) -> str:
+    return f"{KEY_PREFIX}{scope}:{'h' if bucket_size == HOUR else 'd'}:{index}"
+
+
+def _created_epoch(score: float) -> int:
+    return int(score) % _TOP_TIEBREAK
+
+
+def merge_buckets(buckets: List[list], start_epoch: float, n: int) -> List[str]:
+    """
+    K-way merge of per-bucket [(post_id, score), ...] lists (each best first),
+    keeping posts created at or after `start_epoch`. Returns the best `n` ids.
+    """
+    merged = heapq.merge(*buckets, key=lambda item: item[1], reverse=True)
+    out = []
+    for post_id, score in merged:
+        if _created_epoch(score) >= start_epoch:
+            out.append(post_id)
+            if len(out) == n:
+                break
+    return out
+
+
+class WindowedTop:
+    """Hourly and daily top-score buckets per face and globally."""
+
+    def __init__(self, redis_client=None, depth: int = TOP_BUCKET_DEPTH):
+        self.redis = redis_client
+        self.depth = depth
+        self._sets: dict = {}  # key -> {post_id: score}
+        self._ready_until = 0.0
+        self._lock = threading.Lock()
+
+    # ---- reads ----
+
+    def page(self, face_id, t: str, offset: int, limit: int,
+             now: Optional[float] = None) -> Optional[List[str]]:
+        """Post ids ranked by score among posts created in the window, or None if not loaded."""
+        length, bucket_size = WINDOWS[t]
+        now = _time.time() if now is None else now
+        start = now - length
+        first, last = int(start // bucket_size), int(now // bucket_size)
+        scope = str(face_id) if face_id else GLOBAL_SCOPE
+        keys = [_key(scope, bucket_size, i) for i in range(last, first - 1, -1)]
+        n = offset + limit
+
+        buckets = self._read(keys, n)
+        if buckets is None:
+            return None
+        return merge_buckets(buckets, start, n)[offset:]
+
+    def _read(self, keys: List[str], n: int) -> Optional[List[list]]:
+        # The oldest bucket is only partly inside the window, so read it whole
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.exists(READY_KEY)
+                for i, key in enumerate(keys):
+                    pipe.zrevrange(key, 0, -1 if i == len(keys) - 1 else n - 1, withscores=True)
+                ready, *buckets = pipe.execute()
+                return buckets if ready else None
+            except Exception:
+                pass  # Redis failed, fall through to in-memory
+
+        with self._lock:
+            if self._ready_until < _time.monotonic():
+                return None
+            buckets = []
+            for i, key in enumerate(keys):
+                scores = self._sets.get(key)
+                if not scores:
+                    continue
+                if i == len(keys) - 1:
+                    buckets.append(sorted(scores.items(), key=lambda item: item[1], reverse=True))
+                else:
+                    buckets.append(heapq.nlargest(n, scores.items(), key=lambda item: item[1]))
+        return buckets
+
+    def is_ready(self) -> bool:
+        if self.redis is not None:
+            try:
+                return bool(self.redis.exists(READY_KEY))
+            except Exception:
+                pass
+        return self._ready_until >= _time.monotonic()
+
+    # ---- builds ----
+
+    def rebuild(self, db: Session, full: bool = False, now: Optional[float] = None) -> int:
+        """
+        Reload buckets from the database: the whole retention range when `full`,
+        otherwise only the recent buckets. Returns the number of posts scanned.
+        """
+        now = _time.time() if now is None else now
+        today, this_hour = int(now // DAY), int(now // HOUR)
+        first_day = today - (DAILY_BUCKETS if full else RECENT_DAYS) + 1
+        first_hour = this_hour - HOURLY_BUCKETS + 1
+
+        buckets = defaultdict(dict)
+        scanned = 0
+        rows = (
+            db.query(Post.post_id, Post.face_id, Post.created_at, Post.upvotes, Post.downvotes)
+            .filter(Post.is_removed == False,
+                    Post.created_at >= datetime.utcfromtimestamp(first_day * DAY))
+            .yield_per(5000)
+        )
+        for r in rows:
+            scanned += 1
+            created = epoch_seconds(r.created_at)
+            score = feed_score("top", (r.upvotes or 0) - (r.downvotes or 0), r.created_at)
+            for scope in (str(r.face_id), GLOBAL_SCOPE):
+                buckets[_key(scope, DAY, int(created // DAY))][str(r.post_id)] = score
+                if int(created // HOUR) >= first_hour:
+                    buckets[_key(scope, HOUR, int(created // HOUR))][str(r.post_id)] = score
+
+        trimmed = {
+            key: dict(heapq.nlargest(self.depth, scores.items(), key=lambda item: item[1]))
+            if len(scores) > self.depth else scores
+            for key, scores in buckets.items()
+        }
+        self._replace(trimmed, full)
+        return scanned
+
+    def _replace(self, buckets: dict, full: bool):
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, scores in buckets.items():
+                    pipe.delete(key)
+                    pipe.zadd(key, scores)
+                    pipe.expire(key, self._retention(key))
+                if full:
+                    pipe.set(READY_KEY, 1, ex=TOP_WINDOW_READY_TTL)
+                pipe.execute()
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            if full:
+                self._sets = dict(buckets)
+                self._ready_until = _time.monotonic() + TOP_WINDOW_READY_TTL
+            else:
+                self._sets.update(buckets)
+
+    @staticmethod
+    def _retention(key: str) -> int:
+        return (HOURLY_BUCKETS + 1) * HOUR if ":h:" in key else (DAILY_BUCKETS + 1) * DAY
+
+    # ---- writes ----
+
+    def record(self, entry: FeedEntry, now: Optional[float] = None):
+        """Set a post's score in its hour and day buckets (on create and after each vote)."""
+        now = _time.time() if now is None else now
+        created = epoch_seconds(entry.created_at)
+        score = feed_score("top", entry.karma, entry.created_at)
+        keys = []
+        if int(created // DAY) > int(now // DAY) - DAILY_BUCKETS:
+            keys += [_key(scope, DAY, int(created // DAY)) for scope in (entry.face_id, GLOBAL_SCOPE)]
+        if int(created // HOUR) > int(now // HOUR) - HOURLY_BUCKETS:
+            keys += [_key(scope, HOUR, int(created // HOUR)) for scope in (entry.face_id, GLOBAL_SCOPE)]
+        if not keys:
+            return
+
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key in keys:
+                    pipe.zadd(key, {entry.post_id: score})
+                    pipe.zremrangebyrank(key, 0, -(self.depth + 1))
+                    pipe.expire(key, self._retention(key))
+                pipe.execute()
+                return
+            except Exception:
+                pass
+
+        with self._lock:
+            for key in keys:
+                scores = self._sets.setdefault(key, {})
+                scores[entry.post_id] = score
+                if len(scores) > self.depth * 5 // 4:
+                    self._sets[key] = dict(
+                        heapq.nlargest(self.depth, scores.items(), key=lambda item: item[1])
+                    )
+
+    def clear(self):
+        with self._lock:
+            self._sets.clear()
+            self._ready_until = 0.0
+
+
+windowed_top = WindowedTop()
@@ -0,0 +1,274 @@
+"""
+Endpoint benchmark: drives the API in process with concurrent clients
+against a seeded dataset and reports latency percentiles and throughput.
+
+The app runs in this process through httpx's ASGI transport, so numbers
+include routing, middleware, validation, SQL and serialization but no
+network. The database is SQLite by default (a pristine seeded file is
+built once per scale/seed and copied for each run, so writes from one
+run never leak into the next) or a local Postgres via --database-url.
+
+Usage (from backend/):
+    python -m benchmarks.bench_endpoints [--scale 1k|100k|1m] [--seed 42]
+        [--concurrency 16] [--requests 200] [--scenario list_posts_hot ...]
+        [--database-url postgresql://...] [--output endpoints.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_DIR = os.path.join(os.path.dirname(__file__), ".data")
+
+# (name, method, needs_auth)
+SCENARIOS = [
+    ("list_posts_hot", "GET", False),
+    ("list_posts_new", "GET", False),
+    ("list_posts_top", "GET", False),
+    ("list_posts_compact", "GET", False),
+    ("list_posts_face", "GET", False),
+    ("search_all", "GET", False),
+    ("get_post", "GET", False),
+    ("list_comments", "GET", False),
+    ("list_faces", "GET", False),
+    ("get_face", "GET", False),
+    ("list_agents", "GET", False),
+    ("get_agent", "GET", False),
+    ("get_followers", "GET", False),
+    ("trending", "GET", False),
+    ("platform_info", "GET", False),
+    ("get_activity", "GET", True),
+    ("cast_vote", "POST", True),
+    ("create_post", "POST", True),
+]
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def database_url_for(args) -> str:
+    if args.database_url:
+        return args.database_url
+    return f"sqlite:///{os.path.join(DATA_DIR, 'bench_run.db')}"
+
+
+def prepare_database(args):
+    """Seed the dataset (once) and, for SQLite, copy the pristine file to the working database."""
+    from sqlalchemy import create_engine
+
+    from app.database import Base
+    from benchmarks.datasets import DATASET_VERSION, Dataset
+
+    dataset = Dataset(args.scale, args.seed)
+    if args.database_url:
+        engine = create_engine(args.database_url)
+        if not dataset.is_loaded(engine):
+            print(f"Seeding {args.scale} dataset into {engine.url.render_as_string()}...", file=sys.stderr)
+            Base.metadata.drop_all(bind=engine)
+            dataset.load(engine)
+        engine.dispose()
+        return
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    pristine = os.path.join(DATA_DIR, f"bench_{args.scale}_{args.seed}_v{DATASET_VERSION}.db")
+    if not os.path.exists(pristine):
+        print(f"Seeding {args.scale} dataset into {pristine} (one-off)...", file=sys.stderr)
+        started = time.perf_counter()
+        tmp = pristine + ".tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        engine = create_engine(f"sqlite:///{tmp}")
+        dataset.load(engine)
+        engine.dispose()
+        os.replace(tmp, pristine)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    shutil.copyfile(pristine, os.path.join(DATA_DIR, "bench_run.db"))
+
+
+class Workload:
+    """Builds (method, path, json, headers) for each scenario from the dataset."""
+
+    def __init__(self, dataset, post_ids, rng: random.Random):
+        from app.core.security import create_access_token
+        from benchmarks.datasets import WORDS
+
+        self.rng = rng
+        self.words = WORDS
+        self.post_ids = [str(p) for p in post_ids]
+        self.face_names = dataset.face_names
+        self.usernames = dataset.usernames
+        # Spread writes over many agents so per-agent rate limits rarely trip
+        sample = rng.sample(dataset.agent_ids, min(500, len(dataset.agent_ids)))
+        self.tokens = [create_access_token({"agent_id": str(a)}) for a in sample]
+
+    def request(self, name: str):
+        rng = self.rng
+        face = rng.choice(self.face_names[:10])
+        if name.startswith("list_posts"):
+            path = {
+                "list_posts_hot": "/api/v1/posts?sort=hot&limit=25",
+                "list_posts_new": "/api/v1/posts?sort=new&limit=25",
+                "list_posts_top": "/api/v1/posts?sort=top&limit=25",
+                "list_posts_compact": "/api/v1/posts?sort=hot&limit=100&view=compact",
+                "list_posts_face": f"/api/v1/posts?face_name={face}&sort=new&limit=25",
+            }[name]
+            return "GET", path, None
+        if name == "search_all":
+            return "GET", f"/api/v1/search?q={rng.choice(self.words)}&limit=20", None
+        if name == "get_post":
+            return "GET", f"/api/v1/posts/{rng.choice(self.post_ids)}", None
+        if name == "list_comments":
+            return "GET", f"/api/v1/comments?post_id={rng.choice(self.post_ids)}", None
+        if name == "list_faces":
+            return "GET", "/api/v1/faces", None
+        if name == "get_face":
+            return "GET", f"/api/v1/faces/{face}", None
+        if name == "list_agents":
+            return "GET", f"/api/v1/agents?sort={rng.choice(['active', 'karma', 'new'])}&limit=25", None
+        if name == "get_agent":
+            return "GET", f"/api/v1/agents/{rng.choice(self.usernames[:100])}", None
+        if name == "get_followers":
+            return "GET", f"/api/v1/agents/{rng.choice(self.usernames[:100])}/followers", None
+        if name == "trending":
+            return "GET", "/api/v1/trending", None
+        if name == "platform_info":
+            return "GET", "/api/v1/platform-info", None
+        if name == "get_activity":
+            return "GET", "/api/v1/agents/me/activity?limit=25", None
+        if name == "cast_vote":
+            return "POST", "/api/v1/votes", {"post_id": rng.choice(self.post_ids), "vote_type": rng.choice([1, 1, 1, -1])}
+        if name == "create_post":
+            return "POST", "/api/v1/posts", {
+                "face_name": face,
+                "title": " ".join(rng.choice(self.words) for _ in range(6)),
+                "content": " ".join(rng.choice(self.words) for _ in range(rng.randint(40, 300))),
+            }
+        raise ValueError(f"Unknown scenario {name}")
+
+    def headers(self, needs_auth: bool):
+        if not needs_auth:
+            return None
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+
+async def run_scenario(client, workload, name, needs_auth, n_requests, concurrency, warmup):
+    latencies, statuses = [], Counter()
+    queue = asyncio.Queue()
+    for _ in range(n_requests):
+        queue.put_nowait(workload.request(name))
+
+    async def worker():
+        while True:
+            try:
+                method, path, body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=workload.headers(needs_auth))
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    for _ in range(warmup):
+        method, path, body = workload.request(name)
+        await client.request(method, path, json=body, headers=workload.headers(needs_auth))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(n for code, n in statuses.items() if code >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_counts": {str(k): v for k, v in sorted(statuses.items())},
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+    }
+
+
+async def run(args, database_url):
+    import httpx
+    from sqlalchemy import select
+
+    from app.database import SessionLocal
+    from app.main import create_app
+    from app.models import Post
+    from benchmarks.datasets import Dataset
+
+    dataset = Dataset(args.scale, args.seed)
+    rng = random.Random(args.seed)
+    db = SessionLocal()
+    try:
+        post_ids = db.execute(select(Post.post_id).order_by(Post.created_at.desc()).limit(2000)).scalars().all()
+    finally:
+        db.close()
+    workload = Workload(dataset, post_ids, rng)
+
+    selected = [s for s in SCENARIOS if not args.scenario or s[0] in args.scenario]
+    results = {}
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, _method, needs_auth in selected:
+            print(f"  {name}...", file=sys.stderr)
+            results[name] = await run_scenario(
+                client, workload, name, needs_auth, args.requests, args.concurrency, args.warmup
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synapse endpoint benchmark")
+    parser.add_argument("--scale", default="1k", choices=["1k", "100k", "1m"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Postgres URL to seed and benchmark (default: SQLite file)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--scenario", action="append", help="Run only these scenarios (repeatable)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("JWT_SECRET_KEY", "bench")
+    os.environ.setdefault("COUNTER_RECONCILE_INTERVAL", "0")
+    # Must be set before anything imports app.database, which binds the engine
+    database_url = database_url_for(args)
+    os.environ["DATABASE_URL"] = database_url
+    prepare_database(args)
+
+    results = asyncio.run(run(args, database_url))
+    report = {
+        "benchmark": "endpoints",
+        "scale": args.scale,
+        "seed": args.seed,
+        "database": database_url.split(":", 1)[0],
+        "concurrency": args.concurrency,
+        "requests_per_scenario": args.requests,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Serialization benchmark: a 100-post feed page with 50KB content per post.
+
+Compares the previous response path (PostResponse models -> jsonable_encoder
+-> json.dumps, as FastAPI's default JSONResponse does) against the current
+one (plain dicts -> orjson).
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [--posts 100] [--content-kb 50] [--rounds 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.core.serialization import dumps  # noqa: E402
+from app.main import AgentSnippet, PostResponse, _post_dict  # noqa: E402
+
+
+def make_rows(n_posts: int, content_kb: int):
+    author = SimpleNamespace(
+        username="bench_agent", display_name="Bench Agent",
+        avatar_url="https://example.com/a.png", framework="LangChain",
+    )
+    body = ("Lorem ipsum **markdown** with `code` and [links](https://example.com). " * 2000)[: content_kb * 1024]
+    posts = [
+        SimpleNamespace(
+            post_id=uuid.uuid4(), title=f"Benchmark post {i}", content=body,
+            content_type="text", url=None, upvotes=i, downvotes=1,
+            comment_count=i % 7, created_at=datetime.utcnow(),
+        )
+        for i in range(n_posts)
+    ]
+    return posts, author
+
+
+def pydantic_path(posts, author) -> bytes:
+    models = [
+        PostResponse(
+            post_id=str(p.post_id),
+            face_name="general",
+            author=AgentSnippet(
+                username=author.username, display_name=author.display_name,
+                avatar_url=author.avatar_url, framework=author.framework,
+            ),
+            title=p.title, content=p.content, content_type=p.content_type,
+            url=p.url, upvotes=p.upvotes, downvotes=p.downvotes,
+            karma=p.upvotes - p.downvotes, comment_count=p.comment_count,
+            created_at=p.created_at,
+        )
+        for p in posts
+    ]
+    return json.dumps(
+        jsonable_encoder(models), ensure_ascii=False, allow_nan=False,
+        indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def orjson_path(posts, author) -> bytes:
+    return dumps([_post_dict(p, author, "general") for p in posts])
+
+
+def bench(fn, args, rounds: int) -> dict:
+    fn(*args)  # warm-up
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        payload = fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "bytes": len(payload),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--content-kb", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    posts, author = make_rows(args.posts, args.content_kb)
+    current = bench(pydantic_path, (posts, author), args.rounds)
+    fast = bench(orjson_path, (posts, author), args.rounds)
+    print(json.dumps({
+        "benchmark": "serialization",
+        "posts": args.posts,
+        "content_kb": args.content_kb,
+        "pydantic_json": current,
+        "orjson_dicts": fast,
+        "speedup": round(current["median_ms"] / fast["median_ms"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
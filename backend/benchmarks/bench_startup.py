@@ -0,0 +1,110 @@
+"""
+Startup benchmark: import cost of app.main and time to first response.
+
+Reports
+  - import_ms: cumulative `python -X importtime` cost of `import app.main`
+  - slowest_imports: the modules with the largest cumulative import time
+  - first_response_ms: spawn of `uvicorn app.main:app` until GET /health is 200
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--runs 3] [--top 15] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("JWT_SECRET_KEY", "bench")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure_imports(top: int) -> dict:
+    """Run `import app.main` under -X importtime and parse the report."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    total_us = next((cum for name, _, cum in modules if name == "app.main"), 0)
+    slowest = sorted(modules, key=lambda m: m[2], reverse=True)[:top]
+    return {
+        "import_ms": round(total_us / 1000, 1),
+        "slowest_imports": [
+            {"module": name, "cumulative_ms": round(cum / 1000, 1), "self_ms": round(own / 1000, 1)}
+            for name, own, cum in slowest
+        ],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(timeout: float = 30.0) -> float:
+    """Spawn uvicorn and poll /health until it answers. Returns milliseconds."""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"No response from uvicorn within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synapse startup benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    imports = measure_imports(args.top)
+    first = [measure_first_response() for _ in range(args.runs)]
+    report = {
+        "benchmark": "startup",
+        "import_ms": imports["import_ms"],
+        "first_response_ms": round(statistics.median(first), 1),
+        "first_response_runs_ms": [round(v, 1) for v in first],
+        "slowest_imports": imports["slowest_imports"],
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Deterministic benchmark datasets.
+
+The same (scale, seed) always produces the same rows, so runs on
+different machines or branches compare like for like. Activity is
+skewed the way a social feed is: a few agents write most posts, a few
+faces get most traffic, and vote/comment counts follow a heavy tail.
+Every counted vote is a real row from a distinct agent (never the
+author), so vote toggles and karma recomputes see the same totals.
+
+Scales:
+    1k    1,000 posts      200 agents     10 faces
+    100k  100,000 posts    5,000 agents   50 faces
+    1m    1,000,000 posts  20,000 agents  200 faces
+"""
+
+import random
+import uuid
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, select, update
+
+from app.database import Base
+from app.models import Agent, Comment, Face, Post, Vote
+from app.services.comment_ranking import comment_scores
+
+SCALES = {
+    "1k": {"posts": 1_000, "agents": 200, "faces": 10},
+    "100k": {"posts": 100_000, "agents": 5_000, "faces": 50},
+    "1m": {"posts": 1_000_000, "agents": 20_000, "faces": 200},
+}
+
+DATASET_VERSION = 2  # bump when generated rows change, so cached SQLite seeds are rebuilt
+BATCH_SIZE = 5_000
+HISTORY_DAYS = 30
+EPOCH = datetime(2026, 1, 1)  # fixed so hot/new ordering is reproducible
+
+WORDS = (
+    "agent model memory planning tool reasoning benchmark latency vector retrieval "
+    "context prompt swarm protocol graph embedding cache tokens eval alignment "
+    "orchestration workflow inference gradient dataset runtime sandbox policy"
+).split()
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _zipf_weights(n: int, s: float = 1.1):
+    """Cumulative weights for rank-frequency sampling (rank 1 is most active)."""
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _heavy_tail(rng: random.Random, alpha: float, cap: int) -> int:
+    """Pareto-distributed non-negative count: most rows get ~0, a few get a lot."""
+    return min(int(rng.paretovariate(alpha)) - 1, cap)
+
+
+def _text(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+class Dataset:
+    """Generates and loads one scale of benchmark data."""
+
+    def __init__(self, scale: str = "1k", seed: int = 42):
+        if scale not in SCALES:
+            raise ValueError(f"Unknown scale {scale!r}; choose from {', '.join(SCALES)}")
+        self.scale = scale
+        self.seed = seed
+        self.sizes = SCALES[scale]
+        rng = random.Random(f"{scale}:{seed}:ids")
+        self.agent_ids = [_uuid(rng) for _ in range(self.sizes["agents"])]
+        self.face_ids = [_uuid(rng) for _ in range(self.sizes["faces"])]
+        self.face_names = ["general"] + [f"face{i}" for i in range(1, self.sizes["faces"])]
+
+    @property
+    def usernames(self):
+        return [f"bench_agent_{i}" for i in range(len(self.agent_ids))]
+
+    # ---- rows ----
+
+    def agent_rows(self):
+        created = EPOCH - timedelta(days=HISTORY_DAYS + 1)
+        for i, agent_id in enumerate(self.agent_ids):
+            yield {
+                "agent_id": agent_id,
+                "username": f"bench_agent_{i}",
+                "display_name": f"Bench Agent {i}",
+                "bio": f"Synthetic agent {i}",
+                "framework": ("LangChain", "AutoGPT", "CrewAI", "Custom")[i % 4],
+                "api_key_hash": "!",  # unusable hash: benchmarks authenticate with JWTs
+                "salt": "salt_embedded",
+                "created_at": created,
+                "last_active": created,
+            }
+
+    def face_rows(self):
+        for i, (face_id, name) in enumerate(zip(self.face_ids, self.face_names)):
+            yield {
+                "face_id": face_id,
+                "name": name,
+                "display_name": name.title(),
+                "description": f"Benchmark face {name}",
+                "creator_agent_id": self.agent_ids[i % len(self.agent_ids)],
+            }
+
+    def _vote_rows(self, rng: random.Random, target: str, target_id, author, up: int, down: int, created):
+        """One row per counted vote, from distinct agents other than the author; downvotes first."""
+        index = self._agent_index[author]
+        voters = rng.sample(range(len(self.agent_ids)), min(up + down + 1, len(self.agent_ids)))
+        for j, voter in enumerate([v for v in voters if v != index][:up + down]):
+            yield "vote", {
+                "vote_id": _uuid(rng),
+                "agent_id": self.agent_ids[voter],
+                f"{target}_id": target_id,
+                "vote_type": -1 if j < down else 1,
+                "created_at": created + timedelta(seconds=rng.randint(1, 86400)),
+            }
+
+    def post_and_comment_rows(self):
+        """Yield ("post"|"comment"|"vote", row) tuples; comments and votes follow their target."""
+        rng = random.Random(f"{self.scale}:{self.seed}:content")
+        vote_rng = random.Random(f"{self.scale}:{self.seed}:votes")  # separate stream: content is unchanged
+        self._agent_index = {agent_id: i for i, agent_id in enumerate(self.agent_ids)}
+        vote_cap = len(self.agent_ids) - 1  # one vote per agent, and authors don't vote on their own rows
+        agent_weights = _zipf_weights(len(self.agent_ids))
+        face_weights = _zipf_weights(len(self.face_ids), s=0.9)
+        span = HISTORY_DAYS * 86400
+        for i in range(self.sizes["posts"]):
+            post_id = _uuid(rng)
+            created = EPOCH - timedelta(seconds=span * (1 - i / self.sizes["posts"]))
+            upvotes = _heavy_tail(rng, 1.3, min(5_000, vote_cap))
+            n_comments = _heavy_tail(rng, 1.6, 200)
+            post = {
+                "post_id": post_id,
+                "face_id": rng.choices(self.face_ids, cum_weights=face_weights)[0],
+                "author_agent_id": rng.choices(self.agent_ids, cum_weights=agent_weights)[0],
+                "title": f"{_text(rng, 6).capitalize()} #{i}",
+                "content": _text(rng, rng.randint(40, 400)),
+                "upvotes": upvotes,
+                "downvotes": min(int(upvotes * rng.random() * 0.3), vote_cap - upvotes),
+                "comment_count": n_comments,
+                "created_at": created,
+            }
+            yield "post", post
+            yield from self._vote_rows(vote_rng, "post", post_id, post["author_agent_id"],
+                                       post["upvotes"], post["downvotes"], created)
+            for j in range(n_comments):
+                comment = {
+                    "comment_id": _uuid(rng),
+                    "post_id": post_id,
+                    "author_agent_id": rng.choices(self.agent_ids, cum_weights=agent_weights)[0],
+                    "content": _text(rng, rng.randint(5, 60)),
+                    "upvotes": _heavy_tail(rng, 1.8, min(500, vote_cap)),
+                    "downvotes": 0,
+                    "created_at": created + timedelta(minutes=j + 1),
+                }
+                comment.update(comment_scores(comment["upvotes"], comment["downvotes"]))
+                yield "comment", comment
+                yield from self._vote_rows(vote_rng, "comment", comment["comment_id"], comment["author_agent_id"],
+                                           comment["upvotes"], 0, comment["created_at"])
+
+    # ---- loading ----
+
+    def load(self, engine, batch_size: int = BATCH_SIZE):
+        """Create the schema and bulk-load every row (COPY on Postgres), then derive counters."""
+        from benchmarks.generate_data import BulkLoader, load_rows
+
+        Base.metadata.create_all(bind=engine)
+        load_rows(engine, Agent.__table__, self.agent_rows(), batch_size)
+        load_rows(engine, Face.__table__, self.face_rows(), batch_size)
+
+        posts = BulkLoader(engine, Post.__table__, batch_size)
+        comments = BulkLoader(engine, Comment.__table__, batch_size, parents=[posts])
+        votes = BulkLoader(engine, Vote.__table__, batch_size, parents=[posts, comments])
+        loaders = {"post": posts, "comment": comments, "vote": votes}
+        for kind, row in self.post_and_comment_rows():
+            loaders[kind].add(row)
+        votes.flush()
+        comments.flush()
+        posts.flush()
+
+        with engine.begin() as conn:
+            self._derive_counters(conn)
+
+    @staticmethod
+    def _derive_counters(conn):
+        """Set denormalized counters from the loaded rows so reads match the source tables."""
+        agents, faces = Agent.__table__, Face.__table__
+        posts, comments = Post.__table__, Comment.__table__
+        post_karma = (
+            select(func.coalesce(func.sum(posts.c.upvotes - posts.c.downvotes), 0))
+            .where(posts.c.author_agent_id == agents.c.agent_id).scalar_subquery()
+        )
+        comment_karma = (
+            select(func.coalesce(func.sum(comments.c.upvotes - comments.c.downvotes), 0))
+            .where(comments.c.author_agent_id == agents.c.agent_id).scalar_subquery()
+        )
+        conn.execute(update(agents).values(
+            post_count=select(func.count()).where(posts.c.author_agent_id == agents.c.agent_id).scalar_subquery(),
+            comment_count=select(func.count()).where(comments.c.author_agent_id == agents.c.agent_id).scalar_subquery(),
+            karma=post_karma + comment_karma,
+        ))
+        conn.execute(update(faces).values(
+            post_count=select(func.count()).where(posts.c.face_id == faces.c.face_id).scalar_subquery(),
+            member_count=select(func.count(func.distinct(posts.c.author_agent_id)))
+            .where(posts.c.face_id == faces.c.face_id).scalar_subquery(),
+        ))
+
+    def is_loaded(self, engine) -> bool:
+        """True if the database already holds this dataset (checked by post count, votes and first agent)."""
+        from sqlalchemy import inspect
+        if not inspect(engine).has_table("posts"):
+            return False
+        with engine.connect() as conn:
+            n_posts = conn.execute(select(func.count()).select_from(Post.__table__)).scalar()
+            has_votes = conn.execute(select(Vote.__table__.c.vote_id).limit(1)).first() is not None
+            first = conn.execute(
+                select(Agent.__table__.c.agent_id).where(Agent.__table__.c.username == "bench_agent_0")
+            ).scalar()
+        return n_posts == self.sizes["posts"] and has_votes and first == self.agent_ids[0]
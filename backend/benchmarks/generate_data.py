@@ -0,0 +1,403 @@
+"""
+Bulk synthetic data generator for scale testing.
+
+Produces agents, faces, posts, comments, votes and subscriptions with
+power-law shapes: a few agents write most content and collect most
+followers, and votes/comments per item are Pareto-tailed. Every vote is
+a real row, and every denormalized counter (post/comment vote totals,
+comment_count, agent post/comment counts and karma, face post/member
+counts) is computed from the generated rows before loading, so the
+reconciler and karma recompute find nothing to fix.
+
+Loads through Postgres COPY (psycopg 3 or psycopg2) and batched
+executemany elsewhere (SQLite).
+
+Usage (from backend/):
+    python -m benchmarks.generate_data --agents 50000 --posts 2000000 \\
+        [--faces 500] [--seed 7] [--database-url URL] [--reset]
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import create_engine, insert, text
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+BATCH_SIZE = 10_000
+EPOCH = datetime(2026, 1, 1)
+HISTORY_DAYS = 60
+
+WORDS = (
+    "agent model memory planning tool reasoning benchmark latency vector retrieval "
+    "context prompt swarm protocol graph embedding cache tokens eval alignment "
+    "orchestration workflow inference gradient dataset runtime sandbox policy"
+).split()
+
+# Tags keep generated UUIDs unique across tables and deterministic per seed
+_TAGS = {"agent": 1, "face": 2, "post": 3, "comment": 4, "vote": 5, "sub": 6}
+
+
+def make_id(kind: str, seed: int, i: int) -> uuid.UUID:
+    return uuid.UUID(int=(_TAGS[kind] << 120) | ((seed & 0xFFFFFF) << 96) | i)
+
+
+def zipf_cum_weights(n: int, s: float = 1.1):
+    """Cumulative rank-frequency weights; index 0 is the most active."""
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def pareto_count(rng: random.Random, alpha: float, cap: int) -> int:
+    """Heavy-tailed non-negative count; lower alpha means a fatter tail."""
+    return min(int(rng.paretovariate(alpha)) - 1, cap)
+
+
+# ============================================
+# LOADING
+# ============================================
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    text_value = str(value)
+    if "\\" in text_value or "\t" in text_value or "\n" in text_value or "\r" in text_value:
+        text_value = (text_value.replace("\\", "\\\\").replace("\t", "\\t")
+                      .replace("\n", "\\n").replace("\r", "\\r"))
+    return text_value
+
+
+def _copy_chunk(raw_conn, table, columns, chunk: str):
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+    cursor = raw_conn.cursor()
+    try:
+        if hasattr(cursor, "copy"):  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(chunk)
+        else:  # psycopg2
+            cursor.copy_expert(sql, io.StringIO(chunk))
+    finally:
+        cursor.close()
+
+
+class BulkLoader:
+    """
+    Streams rows into one table. Rows are dicts; missing columns get the
+    column's scalar default so COPY (which bypasses ORM defaults) matches
+    what the ORM would have inserted. `parents` are flushed before each
+    batch so foreign keys always point at rows already loaded.
+    """
+
+    def __init__(self, engine, table, batch_size: int = BATCH_SIZE, parents=()):
+        self.engine = engine
+        self.table = table
+        self.batch_size = batch_size
+        self.parents = list(parents)
+        self.use_copy = engine.dialect.name == "postgresql"
+        self.columns = [c.name for c in table.columns]
+        self._defaults = {
+            c.name: c.default.arg
+            for c in table.columns
+            if c.default is not None and c.default.is_scalar
+        }
+        self._rows = []
+        self.count = 0
+
+    def add(self, row: dict):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def _full(self, row: dict) -> dict:
+        return {name: row.get(name, self._defaults.get(name)) for name in self.columns}
+
+    def flush(self):
+        if not self._rows:
+            return
+        for parent in self.parents:
+            parent.flush()
+        rows = [self._full(r) for r in self._rows]
+        if self.use_copy:
+            buf = "".join(
+                "\t".join(_copy_value(r[c]) for c in self.columns) + "\n" for r in rows
+            )
+            raw = self.engine.raw_connection()
+            try:
+                _copy_chunk(raw.driver_connection, self.table, self.columns, buf)
+                raw.commit()
+            finally:
+                raw.close()
+        else:
+            with self.engine.begin() as conn:
+                conn.execute(insert(self.table), rows)
+        self.count += len(rows)
+        self._rows = []
+
+
+def load_rows(engine, table, rows, batch_size: int = BATCH_SIZE) -> int:
+    """Bulk-load an iterable of row dicts into `table`. Returns the row count."""
+    loader = BulkLoader(engine, table, batch_size)
+    loader.extend(rows)
+    loader.flush()
+    return loader.count
+
+
+# ============================================
+# GENERATION
+# ============================================
+
+class SocialGraphGenerator:
+    """
+    Two-phase generator: plan() draws the shape of the data into compact
+    arrays and accumulates counters; write() materializes rows (text,
+    voters, followers) from the plan and streams them to the loaders.
+    """
+
+    def __init__(self, agents: int, faces: int, posts: int, seed: int = 7,
+                 vote_alpha: float = 1.2, comment_alpha: float = 1.5, follow_alpha: float = 1.1):
+        self.n_agents = agents
+        self.n_faces = min(faces, agents)
+        self.n_posts = posts
+        self.seed = seed
+        self.vote_alpha = vote_alpha
+        self.comment_alpha = comment_alpha
+        self.follow_alpha = follow_alpha
+        self.vote_cap = max(1, min(agents - 1, 10_000))
+
+    def plan(self):
+        rng = random.Random(f"{self.seed}:plan")
+        agent_w = zipf_cum_weights(self.n_agents)
+        face_w = zipf_cum_weights(self.n_faces, s=0.9)
+        agents = range(self.n_agents)
+        faces = range(self.n_faces)
+
+        self.post_author = array("i")
+        self.post_face = array("i")
+        self.post_up = array("i")
+        self.post_down = array("i")
+        self.post_comments = array("i")
+        self.comment_author = array("i")
+        self.comment_up = array("i")
+        self.comment_down = array("i")
+
+        self.agent_posts = array("i", [0]) * self.n_agents
+        self.agent_comments = array("i", [0]) * self.n_agents
+        self.agent_karma = array("q", [0]) * self.n_agents
+        self.face_posts = array("i", [0]) * self.n_faces
+        face_members = [set() for _ in faces]
+
+        for _ in range(self.n_posts):
+            author = rng.choices(agents, cum_weights=agent_w)[0]
+            face = rng.choices(faces, cum_weights=face_w)[0]
+            votes = pareto_count(rng, self.vote_alpha, self.vote_cap)
+            down = sum(1 for _ in range(votes) if rng.random() < 0.15)
+            n_comments = pareto_count(rng, self.comment_alpha, 500)
+
+            self.post_author.append(author)
+            self.post_face.append(face)
+            self.post_up.append(votes - down)
+            self.post_down.append(down)
+            self.post_comments.append(n_comments)
+            self.agent_posts[author] += 1
+            self.agent_karma[author] += votes - 2 * down
+            self.face_posts[face] += 1
+            face_members[face].add(author)
+
+            for _ in range(n_comments):
+                c_author = rng.choices(agents, cum_weights=agent_w)[0]
+                c_votes = pareto_count(rng, self.vote_alpha + 0.5, self.vote_cap)
+                c_down = sum(1 for _ in range(c_votes) if rng.random() < 0.1)
+                self.comment_author.append(c_author)
+                self.comment_up.append(c_votes - c_down)
+                self.comment_down.append(c_down)
+                self.agent_comments[c_author] += 1
+                self.agent_karma[c_author] += c_votes - 2 * c_down
+
+        self.face_members = array("i", (len(m) for m in face_members))
+        return self
+
+    # ---- rows ----
+
+    def _agent_rows(self):
+        created = EPOCH - timedelta(days=HISTORY_DAYS + 1)
+        for i in range(self.n_agents):
+            yield {
+                "agent_id": make_id("agent", self.seed, i),
+                "username": f"gen_agent_{i}",
+                "display_name": f"Generated Agent {i}",
+                "bio": f"Synthetic agent {i}",
+                "framework": ("LangChain", "AutoGPT", "CrewAI", "Custom")[i % 4],
+                "api_key_hash": "!",  # unusable: log in via JWTs minted for the id
+                "salt": "salt_embedded",
+                "karma": self.agent_karma[i],
+                "post_count": self.agent_posts[i],
+                "comment_count": self.agent_comments[i],
+                "created_at": created,
+                "last_active": created,
+            }
+
+    def _face_rows(self):
+        for i in range(self.n_faces):
+            name = "general" if i == 0 else f"face{i}"
+            yield {
+                "face_id": make_id("face", self.seed, i),
+                "name": name,
+                "display_name": name.title(),
+                "description": f"Generated face {name}",
+                "creator_agent_id": make_id("agent", self.seed, i),
+                "post_count": self.face_posts[i],
+                "member_count": self.face_members[i],
+                "created_at": EPOCH - timedelta(days=HISTORY_DAYS + 1),
+            }
+
+    def _sample_voters(self, rng, k: int, exclude: int):
+        voters = rng.sample(range(self.n_agents), min(k + 1, self.n_agents))
+        return [v for v in voters if v != exclude][:k]
+
+    def _votes_for(self, rng, target: str, target_id, author: int, up: int, down: int, created, counter):
+        voters = self._sample_voters(rng, up + down, author)
+        for j, voter in enumerate(voters):
+            counter[0] += 1
+            yield {
+                "vote_id": make_id("vote", self.seed, counter[0]),
+                "agent_id": make_id("agent", self.seed, voter),
+                "post_id": target_id if target == "post" else None,
+                "comment_id": target_id if target == "comment" else None,
+                "vote_type": -1 if j < down else 1,
+                "created_at": created + timedelta(minutes=5 + j),
+            }
+
+    def write(self, engine, batch_size: int = BATCH_SIZE, log=print):
+        from app.models import Agent, Comment, Face, Post, Subscription, Vote
+        from app.services.comment_ranking import comment_scores
+
+        log(f"  agents: {load_rows(engine, Agent.__table__, self._agent_rows(), batch_size):,}")
+        log(f"  faces: {load_rows(engine, Face.__table__, self._face_rows(), batch_size):,}")
+
+        rng = random.Random(f"{self.seed}:rows")
+        posts = BulkLoader(engine, Post.__table__, batch_size)
+        comments = BulkLoader(engine, Comment.__table__, batch_size, parents=[posts])
+        votes = BulkLoader(engine, Vote.__table__, batch_size, parents=[posts, comments])
+        vote_counter = [0]
+        span = HISTORY_DAYS * 86400
+        c = 0
+        for i in range(self.n_posts):
+            post_id = make_id("post", self.seed, i)
+            created = EPOCH - timedelta(seconds=span * (1 - i / max(self.n_posts, 1)))
+            author = self.post_author[i]
+            posts.add({
+                "post_id": post_id,
+                "face_id": make_id("face", self.seed, self.post_face[i]),
+                "author_agent_id": make_id("agent", self.seed, author),
+                "title": " ".join(rng.choice(WORDS) for _ in range(6)).capitalize() + f" #{i}",
+                "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 300))),
+                "upvotes": self.post_up[i],
+                "downvotes": self.post_down[i],
+                "comment_count": self.post_comments[i],
+                "created_at": created,
+            })
+            for _ in range(self.post_comments[i]):
+                comment_id = make_id("comment", self.seed, c)
+                c_created = created + timedelta(minutes=rng.randint(1, 2880))
+                c_author = self.comment_author[c]
+                comments.add({
+                    "comment_id": comment_id,
+                    "post_id": post_id,
+                    "author_agent_id": make_id("agent", self.seed, c_author),
+                    "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 60))),
+                    "upvotes": self.comment_up[c],
+                    "downvotes": self.comment_down[c],
+                    "created_at": c_created,
+                    **comment_scores(self.comment_up[c], self.comment_down[c]),
+                })
+                votes.extend(self._votes_for(rng, "comment", comment_id, c_author,
+                                             self.comment_up[c], self.comment_down[c], c_created, vote_counter))
+                c += 1
+            votes.extend(self._votes_for(rng, "post", post_id, author,
+                                         self.post_up[i], self.post_down[i], created, vote_counter))
+        votes.flush()
+        comments.flush()
+        posts.flush()
+        log(f"  posts: {posts.count:,}  comments: {comments.count:,}  votes: {votes.count:,}")
+
+        subs = load_rows(engine, Subscription.__table__, self._subscription_rows(), batch_size)
+        log(f"  subscriptions: {subs:,}")
+
+    def _subscription_rows(self):
+        """Follower counts are Pareto-tailed and concentrated on the most active agents."""
+        rng = random.Random(f"{self.seed}:follows")
+        n = 0
+        for followed in range(self.n_agents):
+            # Rank 0 is the most active agent; scale the tail by rank so stars get the crowds
+            k = pareto_count(rng, self.follow_alpha, self.n_agents - 1)
+            k = min(self.n_agents - 1, int(k * (1 + 50 / (followed + 1))))
+            for follower in self._sample_voters(rng, k, followed):
+                yield {
+                    "subscription_id": make_id("sub", self.seed, n),
+                    "follower_id": make_id("agent", self.seed, follower),
+                    "following_id": make_id("agent", self.seed, followed),
+                    "created_at": EPOCH - timedelta(days=rng.randint(0, HISTORY_DAYS)),
+                }
+                n += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synapse bulk synthetic data generator")
+    parser.add_argument("--agents", type=int, default=10_000)
+    parser.add_argument("--faces", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--vote-alpha", type=float, default=1.2, help="Pareto alpha for votes per item")
+    parser.add_argument("--follow-alpha", type=float, default=1.1, help="Pareto alpha for followers per agent")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="Defaults to $DATABASE_URL")
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    if args.agents < 2:
+        parser.error("--agents must be at least 2")
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ["DATABASE_URL"] = args.database_url
+    from app.database import Base
+    import app.models  # noqa: F401  (register tables)
+
+    engine = create_engine(args.database_url)
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+
+    started = time.perf_counter()
+    gen = SocialGraphGenerator(args.agents, args.faces, args.posts, seed=args.seed,
+                               vote_alpha=args.vote_alpha, follow_alpha=args.follow_alpha)
+    gen.plan()
+    print(f"Planned in {time.perf_counter() - started:.1f}s; loading via "
+          f"{'COPY' if engine.dialect.name == 'postgresql' else 'executemany'}...")
+    gen.write(engine, batch_size=args.batch_size)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,51 @@
+"""
+Explicit schema step. Run before the API starts:
+    python init_db.py
+A database already at the latest alembic revision is left alone after a
+single version query, so this is cheap enough to run on every start.
+A fresh database gets every table from the models and is stamped at the
+latest alembic revision. An existing database gets any new tables, then
+`alembic upgrade head` for the column and index changes create_all
+cannot make to tables that already exist.
+The API itself never runs DDL at import or startup.
+"""
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+
 from app.database import Base, engine
-from app.models import agent, post, comment, face, vote
+import app.models  # noqa: F401  (registers every model on Base.metadata)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
 
 try:
+    config = Config(os.path.join(HERE, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(HERE, "alembic"))
+    head = ScriptDirectory.from_config(config).get_current_head()
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+    if current == head:
+        print(f"Schema up to date ({head}).")
+        raise SystemExit(0)
+
+    fresh = not inspect(engine).has_table("agents")
+
     print("Creating tables...")
     Base.metadata.create_all(bind=engine)
-    print("Tables created successfully.")
+    with engine.begin() as connection:
+        # Run alembic on our engine instead of re-reading DATABASE_URL from alembic.ini
+        config.attributes["connection"] = connection
+        if fresh:
+            print("New database, stamping alembic head...")
+            command.stamp(config, "head")
+        else:
+            print("Running alembic migrations...")
+            command.upgrade(config, "head")
+    print("Schema up to date.")
 except Exception as e:
     print(f"Error: {e}")
+    raise SystemExit(1)
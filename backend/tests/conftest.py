@@ -1,43 +1,224 @@
 """
 Test configuration and fixtures for AgentFace.
+
+The schema is created once per session; each test runs inside a
+transaction on a single connection and application commits become
+SAVEPOINT releases, so everything a test writes is rolled back.
+
+TEST_DATABASE_URL selects the backend (default: in-memory SQLite). For
+Postgres, each pytest-xdist worker gets its own database cloned from a
+template that is rebuilt only when the schema changes:
+
+    TEST_DATABASE_URL=postgresql://postgres:pw@localhost/synapse_test pytest -n auto
 """
 
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
 from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateIndex, CreateTable
 
+# Read at import time by app modules: opt in to the SQL debug log the suite exercises, and
+# keep background jobs that open their own sessions from running against the app engine
+os.environ.setdefault("SQL_DEBUG_LOG", "true")
+os.environ.setdefault("DEDUP_REFRESH_INTERVAL", "0")
+os.environ.setdefault("RELATED_REFRESH_INTERVAL", "0")
+
+from app.core.fanout import fanout
+from app.core.idempotency import idempotency_store
+from app.core.profiling import summarize_statements
 from app.database import Base, get_db
 from app.main import app
+from app.models import Agent, Face, Post
+from app.services.dedup import duplicate_index
+from app.services.feeds import feed_index
+from app.services.leaderboard import leaderboard
+from app.services.related import related_posts
+from app.services.rising import rising_feed
+from app.services.top_windows import windowed_top
 
-# Use in-memory SQLite for tests
-SQLALCHEMY_TEST_DATABASE_URL = "sqlite://"
+SQLALCHEMY_TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite://")
+WORKER_ID = os.getenv("PYTEST_XDIST_WORKER", "main")  # set by pytest-xdist, e.g. "gw3"
 
-engine = create_engine(
-    SQLALCHEMY_TEST_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _schema_hash() -> str:
+    """Fingerprint of the DDL for every model, used to invalidate the template database."""
+    from sqlalchemy.dialects import postgresql
+    dialect = postgresql.dialect()
+    ddl = []
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl.extend(str(CreateIndex(ix).compile(dialect=dialect)) for ix in table.indexes)
+    return hashlib.sha1("\n".join(ddl).encode()).hexdigest()[:16]
 
-@pytest.fixture(autouse=True)
-def setup_database():
-    """Create tables before each test, drop after."""
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
+
+def _postgres_worker_url(base_url: str) -> str:
+    """Clone `<db>_template` into `<db>_<worker>`, rebuilding the template if the schema changed."""
+    url = make_url(base_url)
+    template, worker_db = f"{url.database}_template", f"{url.database}_{WORKER_ID}"
+    schema = _schema_hash()
+    admin = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": template})
+        try:
+            comment = conn.execute(
+                text("SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = :name"),
+                {"name": template},
+            ).scalar()
+            if comment != f"schema:{schema}":
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{template}"'))
+                conn.execute(text(f'CREATE DATABASE "{template}"'))
+                template_engine = create_engine(url.set(database=template))
+                Base.metadata.create_all(bind=template_engine)
+                template_engine.dispose()
+                conn.execute(text(f"COMMENT ON DATABASE \"{template}\" IS 'schema:{schema}'"))
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{worker_db}"'))
+            conn.execute(text(f'CREATE DATABASE "{worker_db}" TEMPLATE "{template}"'))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": template})
+    admin.dispose()
+    return url.set(database=worker_db).render_as_string(hide_password=False)
+
+
+def _make_test_engine():
+    if make_url(SQLALCHEMY_TEST_DATABASE_URL).get_backend_name() == "postgresql":
+        return create_engine(_postgres_worker_url(SQLALCHEMY_TEST_DATABASE_URL))
+
+    # In-memory SQLite is private to this process, so xdist workers are isolated already
+    sqlite_engine = create_engine(
+        SQLALCHEMY_TEST_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    # pysqlite manages transactions itself and breaks SAVEPOINT; take over BEGIN
+    @event.listens_for(sqlite_engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sqlite_engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(bind=sqlite_engine)
+    return sqlite_engine
+
+
+engine = _make_test_engine()
 
 
 @pytest.fixture
 def db_session():
-    """Provide a transactional database session for tests."""
-    session = TestingSessionLocal()
+    """
+    Session bound to a connection-level transaction that is rolled back
+    after the test. session.commit() inside app code releases a SAVEPOINT.
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(
+        bind=connection,
+        autoflush=False,
+        join_transaction_mode="create_savepoint",
+    )
     try:
         yield session
     finally:
         session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def make_agent(db_session):
+    """Factory adding a flushed Agent; keyword arguments override the column defaults."""
+
+    def _make(username="agent", **fields):
+        fields.setdefault("display_name", username.title())
+        fields.setdefault("framework", "pytest")
+        agent = Agent(username=username, api_key_hash="x", salt="x", **fields)
+        db_session.add(agent)
+        db_session.flush()
+        return agent
+
+    return _make
+
+
+@pytest.fixture
+def make_face(db_session):
+    """Factory adding a flushed Face created by `creator`."""
+
+    def _make(creator, name="general", **fields):
+        fields.setdefault("display_name", name.title())
+        face = Face(name=name, creator_agent_id=creator.agent_id, **fields)
+        db_session.add(face)
+        db_session.flush()
+        return face
+
+    return _make
+
+
+@pytest.fixture
+def make_post(db_session):
+    """Factory adding a flushed Post by `author` in `face`."""
+
+    def _make(face, author, title="Post", content="body", **fields):
+        post = Post(face_id=face.face_id, author_agent_id=author.agent_id, title=title,
+                    content=content, **fields)
+        db_session.add(post)
+        db_session.flush()
+        return post
+
+    return _make
+
+
+@pytest.fixture
+def poster(db_session, make_agent, make_face, make_post):
+    """An agent with three 5000-character posts in "general" (upvotes 0, 1, 2)."""
+    poster = make_agent("poster")
+    face = make_face(poster)
+    for i in range(3):
+        make_post(face, poster, f"Post {i}", "x" * 5000, upvotes=i)
+    db_session.commit()
+    return poster
+
+
+@pytest.fixture(autouse=True)
+def _reset_in_process_indexes():
+    """Derived in-process indexes would otherwise outlive the rolled-back rows they point at."""
+    yield
+    feed_index.clear()
+    windowed_top.clear()
+    leaderboard.clear()
+    rising_feed.clear()
+    duplicate_index.clear()
+    related_posts.clear()
+    idempotency_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def _test_connection_sessions(request, monkeypatch):
+    """
+    Run after-commit fan-out jobs inline, and open idempotency-key sessions,
+    on the test's connection, so the rows they write are rolled back with
+    everything else. Tests without a database get a factory that fails
+    instead (the idempotency store then falls back to memory).
+    """
+    monkeypatch.setattr(fanout, "workers", 0)
+    if "db_session" in request.fixturenames:
+        bind = request.getfixturevalue("db_session").bind
+        factory = lambda: Session(bind=bind, join_transaction_mode="create_savepoint")  # noqa: E731
+    else:
+        def factory():
+            raise RuntimeError("session opened in a test without db_session")
+    monkeypatch.setattr(fanout, "session_factory", factory)
+    monkeypatch.setattr(idempotency_store, "session_factory", factory)
 
 
 @pytest.fixture
@@ -54,3 +235,78 @@ def client(db_session):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+# Wall-clock budgets are machine-dependent, so they only fail the run when
+# PERF_BUDGETS=1 (e.g. on the dedicated benchmark runner).
+ENFORCE_LATENCY_BUDGETS = os.getenv("PERF_BUDGETS", "") == "1"
+
+# Savepoints come from the test transaction wrapper, not from the code under test
+TRANSACTION_CONTROL = ("SAVEPOINT", "RELEASE", "ROLLBACK", "BEGIN")
+
+
+class QueryLog:
+    """SQL statements executed against the test engine inside a budget block."""
+
+    def __init__(self):
+        self.statements = []  # (sql, seconds)
+        self.elapsed_ms = 0.0
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        lines = []
+        for entry in summarize_statements(self.statements, threshold=2):
+            flag = "  <-- repeated" if entry["n_plus_one"] else ""
+            lines.append(f"  {entry['count']:>3}x [{entry['fingerprint']}] {entry['sql'][:140]}{flag}")
+        return "\n".join(lines)
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Assert a block stays within a SQL statement budget (and optionally a latency budget).
+
+        with query_budget(4, label="GET /api/v1/posts?limit=100"):
+            client.get("/api/v1/posts?limit=100")
+
+    On failure the message lists the executed statements grouped by fingerprint.
+    """
+
+    @contextmanager
+    def _budget(max_queries, max_ms=None, label=""):
+        log = QueryLog()
+        starts = []
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            starts.append(time.perf_counter())
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - starts.pop()
+            if not statement.lstrip().upper().startswith(TRANSACTION_CONTROL):
+                log.statements.append((statement, elapsed))
+
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+        start = time.perf_counter()
+        try:
+            yield log
+        finally:
+            log.elapsed_ms = (time.perf_counter() - start) * 1000
+            event.remove(engine, "before_cursor_execute", before)
+            event.remove(engine, "after_cursor_execute", after)
+
+        if log.count > max_queries:
+            pytest.fail(
+                f"{label or 'block'} ran {log.count} SQL statements (budget {max_queries}):\n{log.report()}",
+                pytrace=False,
+            )
+        if max_ms is not None and ENFORCE_LATENCY_BUDGETS and log.elapsed_ms > max_ms:
+            pytest.fail(
+                f"{label or 'block'} took {log.elapsed_ms:.1f} ms (budget {max_ms} ms)",
+                pytrace=False,
+            )
+
+    return _budget
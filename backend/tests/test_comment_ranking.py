@@ -0,0 +1,87 @@
+"""
+Tests for stored comment sort keys and the list_comments sorts.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Comment
+from app.services.comment_ranking import (
+    apply_scores, comment_scores, controversy, wilson_lower_bound,
+)
+
+VOTES = {  # content -> (upvotes, downvotes, minutes after the post)
+    "solid": (60, 40, 1),
+    "unanimous": (5, 0, 2),
+    "single": (1, 0, 3),
+    "split": (30, 29, 4),
+    "buried": (0, 8, 5),
+}
+
+
+@pytest.fixture
+def seed_post(db_session, make_agent, make_face, make_post):
+    """Factory for a post carrying the VOTES comments from `commenters` agents."""
+
+    def _seed(commenters=3):
+        agents = [make_agent(f"c{i}") for i in range(commenters)]
+        base = datetime.utcnow() - timedelta(hours=1)
+        post = make_post(make_face(agents[0]), agents[0], "t", created_at=base)
+        for i, (content, (up, down, minutes)) in enumerate(VOTES.items()):
+            comment = Comment(post_id=post.post_id, author_agent_id=agents[i % commenters].agent_id,
+                              content=content, upvotes=up, downvotes=down,
+                              created_at=base + timedelta(minutes=minutes))
+            apply_scores(comment)
+            db_session.add(comment)
+        db_session.commit()
+        return post
+
+    return _seed
+
+
+def _contents(client, post, sort):
+    response = client.get(f"/api/v1/comments?post_id={post.post_id}&sort={sort}")
+    assert response.status_code == 200
+    return [c["content"] for c in response.json()]
+
+
+def test_wilson_prefers_well_supported_ratio():
+    assert wilson_lower_bound(0, 0) == 0.0
+    assert wilson_lower_bound(5, 0) > wilson_lower_bound(60, 40)
+    assert wilson_lower_bound(60, 40) > wilson_lower_bound(1, 0)
+    assert 0.0 < wilson_lower_bound(1, 0) < 1.0
+
+
+def test_controversy_rewards_even_splits():
+    assert controversy(10, 0) == 0.0
+    assert controversy(30, 29) > controversy(60, 40) > controversy(9, 1)
+    assert comment_scores(None, None) == {"score": 0, "best_score": 0.0, "controversial_score": 0.0}
+
+
+def test_sorts(client, seed_post):
+    post = seed_post()
+    # "split" and "single" tie on score; the newer comment comes first
+    assert _contents(client, post, "top") == ["solid", "unanimous", "split", "single", "buried"]
+    assert _contents(client, post, "best") == ["unanimous", "solid", "split", "single", "buried"]
+    assert _contents(client, post, "controversial")[:2] == ["split", "solid"]
+    assert _contents(client, post, "new") == ["buried", "split", "single", "unanimous", "solid"]
+    assert _contents(client, post, "old") == ["solid", "unanimous", "single", "split", "buried"]
+    # default stays "top", the previous behaviour
+    assert _contents(client, post, "top") == [
+        c["content"] for c in client.get(f"/api/v1/comments?post_id={post.post_id}").json()
+    ]
+
+
+def test_invalid_sort_and_post_id(client, seed_post):
+    post = seed_post()
+    assert client.get(f"/api/v1/comments?post_id={post.post_id}&sort=random").status_code == 400
+    assert client.get("/api/v1/comments?post_id=not-a-uuid").status_code == 400
+
+
+def test_authors_loaded_in_one_query(client, query_budget, seed_post):
+    post = seed_post(commenters=5)
+    url = f"/api/v1/comments?post_id={post.post_id}&sort=best"
+    with query_budget(2, label="GET /api/v1/comments?sort=best"):
+        data = client.get(url).json()
+    assert {c["author"]["username"] for c in data} == {f"c{i}" for i in range(5)}
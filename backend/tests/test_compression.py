@@ -0,0 +1,44 @@
+"""
+Tests for response compression and precompressed payloads.
+"""
+
+import gzip
+
+from app.core.compression import negotiate_encoding, precompress
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("*") == "br"
+
+
+def test_precompress_skips_small_payloads():
+    assert set(precompress(b"{}")) == {"identity"}
+    variants = precompress(b"x" * 4096)
+    assert set(variants) == {"identity", "gzip", "br"}
+    assert gzip.decompress(variants["gzip"]) == b"x" * 4096
+
+
+def test_large_response_is_compressed(client, poster):
+    response = client.get("/api/v1/posts", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()) == 3
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_skill_md_served_precompressed(client):
+    response = client.get("/skill.md", headers={"Accept-Encoding": "br"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "br"
+    again = client.get("/skill.md", headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
@@ -0,0 +1,83 @@
+"""
+Tests for the denormalized counter reconciler.
+"""
+
+import pytest
+from sqlalchemy import update
+
+from app.models import Agent, Comment
+from app.services.counters import CounterReconciler, recount_all
+
+
+@pytest.fixture
+def seeded(db_session, make_agent, make_face, make_post):
+    agent = make_agent("counter-agent", post_count=7, comment_count=7)
+    faces = [make_face(agent, f"face{i}", post_count=42) for i in range(3)]
+    post = make_post(faces[0], agent, "t", "c", comment_count=0)
+    make_post(faces[0], agent, "t", "c", is_removed=True)
+    db_session.add(Comment(post_id=post.post_id, author_agent_id=agent.agent_id, content="c"))
+    db_session.commit()
+    return agent, faces, post
+
+
+def test_reconcile_fixes_all_counters(db_session, seeded):
+    agent, faces, post = seeded
+
+    report = CounterReconciler().run(db_session)
+
+    db_session.expire_all()
+    assert [f.post_count for f in faces] == [1, 0, 0]
+    assert faces[0].member_count == 1
+    assert post.comment_count == 1
+    assert agent.post_count == 2
+    assert agent.comment_count == 1
+    assert report["counters"]["face.post_count"]["fixed"] == 3
+    assert all(r["complete"] for r in report["counters"].values())
+
+
+def test_reconcile_respects_budget_and_resumes(db_session, seeded):
+    _, faces, _ = seeded
+    reconciler = CounterReconciler(chunk_size=2)
+    spec = reconciler.spec("face.post_count")
+
+    first = reconciler.reconcile_spec(db_session, spec, row_budget=2)
+    assert first["scanned"] == 2
+    assert not first["complete"]
+
+    second = reconciler.reconcile_spec(db_session, spec, row_budget=2)
+    assert second["scanned"] == 1
+    assert second["complete"]
+
+    db_session.expire_all()
+    assert sorted(f.post_count for f in faces) == [0, 0, 1]
+    assert first["fixed"] + second["fixed"] == 3
+
+
+def test_recount_all_sets_every_counter(db_session, seeded):
+    agent, faces, post = seeded
+
+    recount_all(db_session.connection())
+
+    db_session.expire_all()
+    assert [f.post_count for f in faces] == [1, 0, 0]
+    assert [f.member_count for f in faces] == [1, 0, 0]
+    assert (post.comment_count, agent.post_count, agent.comment_count) == (1, 2, 1)
+
+
+def test_reconcile_keeps_concurrent_increments(db_session, monkeypatch, seeded):
+    agent, _, _ = seeded
+    reconciler = CounterReconciler()
+    spec = reconciler.spec("agent.post_count")
+    actual_counts = reconciler._actual_counts
+
+    def counted_then_written(db, spec, ids):
+        counts = actual_counts(db, spec, ids)
+        # A create_post commits between the count and the UPDATE
+        db.execute(update(Agent).where(Agent.agent_id == agent.agent_id)
+                   .values(post_count=Agent.post_count + 1))
+        return counts
+
+    monkeypatch.setattr(reconciler, "_actual_counts", counted_then_written)
+    reconciler.reconcile_spec(db_session, spec, row_budget=10)
+    db_session.expire_all()
+    assert agent.post_count == 8  # not overwritten with the stale count
@@ -0,0 +1,90 @@
+"""
+Tests for connection pool configuration, metrics and replica routing.
+"""
+
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+
+from app.core.security import create_access_token
+from app.database import (
+    ReplicaRouter,
+    TimedQueuePool,
+    _install_pool_events,
+    get_pool_status,
+    pool_stats,
+    request_pin_key,
+)
+
+
+def _engine(ping_interval=None):
+    engine = create_engine("sqlite://", poolclass=TimedQueuePool, pool_size=2, max_overflow=1)
+    _install_pool_events(engine, ping_interval=ping_interval)
+    return engine
+
+
+def test_checkout_waits_are_recorded():
+    pool_stats.reset()
+    engine = _engine()
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    stats = pool_stats.snapshot()
+    assert stats["checkouts"] == 3
+    assert stats["connects"] == 1
+    assert stats["pings"] == 0
+    assert engine.pool.checkedout() == 0
+
+
+def test_interval_ping_only_for_idle_connections():
+    pool_stats.reset()
+    engine = _engine(ping_interval=0)
+    for _ in range(2):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    # The first checkout follows a fresh connect and still counts as idle at interval 0
+    assert pool_stats.snapshot()["pings"] == 2
+
+    pool_stats.reset()
+    engine = _engine(ping_interval=3600)
+    for _ in range(2):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    assert pool_stats.snapshot()["pings"] == 0
+
+
+def test_pool_status_shape():
+    status = get_pool_status()
+    assert {"pool_class", "ping_mode", "checkouts", "wait_max_ms", "timeouts"} <= set(status)
+
+
+def test_replica_routing_and_read_your_writes():
+    primary, r1, r2 = (create_engine("sqlite://") for _ in range(3))
+    router = ReplicaRouter(primary, [r1, r2], pin_seconds=60)
+
+    assert router.engine_for(read_only=False) is primary
+    assert {router.engine_for(read_only=True) for _ in range(4)} == {r1, r2}
+
+    router.pin("agent-1")
+    assert router.engine_for(read_only=True, pin_key="agent-1") is primary
+    assert router.engine_for(read_only=True, pin_key="agent-2") in (r1, r2)
+
+
+def test_unhealthy_replica_is_skipped_until_recheck():
+    primary, r1, r2 = (create_engine("sqlite://") for _ in range(3))
+    router = ReplicaRouter(primary, [r1, r2], retry_seconds=3600)
+
+    router.mark_down(router.replicas[0])
+    assert {router.engine_for(read_only=True) for _ in range(4)} == {r2}
+    router.mark_down(router.replicas[1])
+    assert router.engine_for(read_only=True) is primary
+
+    router.check_health()
+    assert all(r["healthy"] for r in router.status())
+
+
+def test_pin_key_uses_agent_id_claim():
+    token = create_access_token({"agent_id": "abc"})
+    request = SimpleNamespace(headers={"authorization": f"Bearer {token}"})
+    assert request_pin_key(request) == "abc"
+    assert request_pin_key(SimpleNamespace(headers={})) is None
@@ -0,0 +1,135 @@
+"""
+Tests for near-duplicate post detection.
+"""
+
+import time
+from datetime import datetime
+
+import pytest
+
+from app.services.dedup import DuplicateIndex, duplicate_index, post_signature, similarity
+
+ORIGINAL = ("Weekly agent benchmark results",
+            "We ran the planner, retriever and critic agents on the new eval set and the planner "
+            "improved by four points while the critic stayed flat across every task category.")
+NEAR_COPY = (ORIGINAL[0], ORIGINAL[1].replace("four points", "five points"))
+UNRELATED = ("Looking for collaborators",
+             "Anyone interested in building a shared memory layer for multi agent teams? Reply below.")
+
+
+@pytest.fixture
+def seeded(db_session, make_agent, make_face, make_post):
+    agents = [make_agent(f"dup{i}") for i in range(2)]
+    face = make_face(agents[0])
+    posts = {
+        "original": make_post(face, agents[0], *ORIGINAL),
+        "copy": make_post(face, agents[1], *NEAR_COPY),
+        "unrelated": make_post(face, agents[1], *UNRELATED),
+    }
+    db_session.commit()
+    return {name: str(p.post_id) for name, p in posts.items()}
+
+
+def test_signature_similarity():
+    original = post_signature(*ORIGINAL)
+    assert similarity(original, post_signature(*ORIGINAL)) == 1.0
+    assert similarity(original, post_signature(*NEAR_COPY)) >= 0.7
+    assert similarity(original, post_signature(*UNRELATED)) < 0.2
+    assert post_signature("", "!!!") is None
+
+
+def test_find_scopes_by_author_and_face():
+    index = DuplicateIndex(threshold=0.6)
+    now = datetime.utcnow()
+    index.add("p1", "author-a", "face-1", now, post_signature(*ORIGINAL))
+    index.add("p2", "author-b", "face-2", now, post_signature(*UNRELATED))
+    matches = index.find(post_signature(*NEAR_COPY))
+    assert [(m.post_id, m.author_id, m.face_id) for m in matches] == [("p1", "author-a", "face-1")]
+    assert index.find(post_signature(*ORIGINAL), exclude="p1") == []
+
+
+def test_duplicates_endpoint(client, db_session, seeded):
+    ids = seeded
+    duplicate_index.threshold = 0.6
+    try:
+        assert duplicate_index.rebuild(db_session) == 3
+        data = client.get(f"/api/v1/posts/{ids['original']}/duplicates").json()
+    finally:
+        duplicate_index.threshold = DuplicateIndex().threshold
+    assert data["post_id"] == ids["original"]
+    assert [d["post_id"] for d in data["duplicates"]] == [ids["copy"]]
+    assert 0.6 <= data["duplicates"][0]["similarity"] < 1
+    assert data["duplicates"][0]["author"]["username"] == "dup1"
+
+    assert client.get("/api/v1/posts/not-a-uuid/duplicates").status_code == 404
+
+
+class _FakeRedis:
+    """The hash/set commands DuplicateIndex uses, with a pass-through pipeline."""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=False):
+        redis, calls = self, []
+
+        class Pipe:
+            def __getattr__(self, name):
+                return lambda *args: calls.append(getattr(redis, name)(*args))
+
+            def execute(self):
+                return list(calls)
+        return Pipe()
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hkeys(self, key):
+        return list(self.data.get(key, {}))
+
+    def hmget(self, key, fields):
+        return [self.data.get(key, {}).get(f) for f in fields]
+
+    def hdel(self, key, *fields):
+        for f in fields:
+            self.data.get(key, {}).pop(f, None)
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def srem(self, key, member):
+        self.data.get(key, set()).discard(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, seconds):
+        pass
+
+
+def test_prune_removes_ids_from_redis_bands():
+    redis = _FakeRedis()
+    index = DuplicateIndex(redis_client=redis, threshold=0.6, window_days=1)
+    index.add("old", "a", "f", datetime.utcfromtimestamp(time.time() - 3 * 86400), post_signature(*ORIGINAL))
+    index.add("new", "b", "f", datetime.utcnow(), post_signature(*NEAR_COPY))
+    index._prune(time.time() - 86400)
+    members = set().union(*(v for k, v in redis.data.items() if isinstance(v, set)))
+    assert members == {"new"}
+    assert [m.post_id for m in index.find(post_signature(*ORIGINAL))] == ["new"]
+
+
+def test_rebuild_is_incremental_and_prunes_old_posts(db_session, seeded):
+    index = DuplicateIndex(window_days=1)
+    assert index.rebuild(db_session) == 3
+    assert index.rebuild(db_session) == 0  # already indexed
+    index.rebuild(db_session, now=time.time() + 2 * 86400)
+    assert index.find(post_signature(*ORIGINAL)) == []
+
+
+def test_rebuild_span_limits_the_load(db_session, seeded):
+    index = DuplicateIndex(window_days=7)
+    assert index.rebuild(db_session, now=time.time() + 2 * 3600, span=3600) == 0
+    assert index.rebuild(db_session, now=time.time() + 2 * 3600) == 3
@@ -0,0 +1,87 @@
+"""
+Tests for the per-face ranked feed index.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Post
+from app.services.feeds import FeedEntry, FeedIndex, feed_index, sort_order
+
+
+@pytest.fixture
+def faces(db_session, make_agent, make_face, make_post):
+    agent = make_agent("feeder")
+    faces = [make_face(agent, name) for name in ("alpha", "beta")]
+    base = datetime(2026, 3, 1)
+    for i in range(30):
+        make_post(faces[i % 2], agent, f"P{i}", upvotes=(i * 7) % 11, downvotes=i % 3,
+                  created_at=base + timedelta(hours=i * 5))
+    db_session.commit()
+    return faces
+
+
+def _sql_titles(db, sort, face=None):
+    query = db.query(Post.title)
+    if face is not None:
+        query = query.filter(Post.face_id == face.face_id)
+    return [t for (t,) in query.order_by(*sort_order(sort), Post.title).all()]
+
+
+def test_index_pages_match_sql_order(client, db_session, faces):
+    for sort in ("new", "top", "hot"):
+        data = client.get(f"/api/v1/posts?sort={sort}&limit=10&offset=5").json()
+        assert [p["title"] for p in data] == _sql_titles(db_session, sort)[5:15], sort
+        data = client.get(f"/api/v1/posts?face_name=beta&sort={sort}&limit=10").json()
+        assert [p["title"] for p in data] == _sql_titles(db_session, sort, faces[1])[:10], sort
+
+
+def test_warm_index_skips_the_sort(client, query_budget, faces):
+    client.get("/api/v1/posts?sort=hot&limit=25")
+    with query_budget(3, label="warm hot feed"):
+        response = client.get("/api/v1/posts?sort=hot&limit=25")
+    assert len(response.json()) == 25
+
+
+def test_removed_posts_leave_the_index(client, db_session, faces):
+    first = client.get("/api/v1/posts?face_name=alpha&sort=new&limit=5").json()
+    removed = db_session.query(Post).filter(Post.post_id == uuid.UUID(first[0]["post_id"])).one()
+    removed.is_removed = True
+    db_session.commit()
+
+    data = client.get("/api/v1/posts?face_name=alpha&sort=new&limit=5").json()
+    assert [p["title"] for p in data] == [p["title"] for p in first[1:]] + ["P18"]
+    assert first[0]["post_id"] not in feed_index.page(db_session, faces[0].face_id, "new", 0, 15)
+
+
+def test_deep_pages_fall_back_to_sql(client, faces):
+    data = client.get("/api/v1/posts?sort=new&limit=5&offset=1000").json()
+    assert data == []
+
+
+def test_updates_reorder_built_sets():
+    index = FeedIndex(depth=3)
+    face = str(uuid.uuid4())
+    now = datetime(2026, 3, 1)
+    entries = [FeedEntry(str(uuid.uuid4()), face, now + timedelta(minutes=i), i) for i in range(3)]
+    index._replace(f"feed:{face}:top", {})
+    for entry in entries:
+        index.add_post(entry)
+    assert index._read(f"feed:{face}:top", 0, 3) == [e.post_id for e in reversed(entries)]
+
+    index.update_scores(entries[0]._replace(karma=10))
+    assert index._read(f"feed:{face}:top", 0, 1) == [entries[0].post_id]
+    # Sets that were never built are left for the first read to load
+    assert index._read("feed:all:top", 0, 3) is None
+
+
+def test_refresh_rebuilds_every_built_set(db_session, faces, make_agent, make_post):
+    feed_index.page(db_session, None, "hot", 0, 5)
+    feed_index.page(db_session, faces[0].face_id, "new", 0, 5)
+    late = make_post(faces[0], make_agent("other-worker"), "late", created_at=datetime(2027, 1, 1))
+    db_session.commit()
+
+    assert feed_index.refresh(db_session) == 2
+    assert feed_index.page(db_session, faces[0].face_id, "new", 0, 1) == [str(late.post_id)]
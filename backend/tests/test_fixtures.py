@@ -0,0 +1,24 @@
+"""
+Tests for the transactional test fixtures themselves.
+"""
+
+from app.models import Agent
+
+
+def test_commit_inside_test_is_visible(db_session, make_agent):
+    make_agent("isolation_probe")
+    db_session.commit()
+    assert db_session.query(Agent).filter_by(username="isolation_probe").count() == 1
+
+
+def test_previous_test_was_rolled_back(db_session, make_agent):
+    assert db_session.query(Agent).filter_by(username="isolation_probe").count() == 0
+    make_agent("isolation_probe")
+    db_session.commit()
+
+
+def test_factories_link_their_rows(make_agent, make_face, make_post):
+    author = make_agent("factory-author", karma=5)
+    post = make_post(make_face(author, "factory"), author, "Hello")
+    assert (author.display_name, author.framework, author.karma) == ("Factory-Author", "pytest", 5)
+    assert post.author_agent_id == author.agent_id and post.post_id is not None
@@ -0,0 +1,122 @@
+"""
+Tests for the API key hashing pool and the login failure throttle.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.core import hashing
+from app.core.hashing import HashPool, HashPoolBusy
+from app.core.metrics import RequestStats, current_stats
+from app.core.security import RateLimitExceeded, hash_api_key, verify_api_key
+
+
+def test_pool_rejects_past_queue_limit():
+    pool = HashPool(workers=1, queue_limit=2)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert pool.pending == 2
+        with pytest.raises(HashPoolBusy):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(*running)
+        assert pool.pending == 0
+        assert await pool.run(lambda: "ok") == "ok"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_pool_keeps_request_context():
+    stats = RequestStats()
+    token = current_stats.set(stats)
+    try:
+        hashed, _ = asyncio.run(hashing.hash_api_key_async("k" * 64))
+    finally:
+        current_stats.reset(token)
+    assert hashed and stats.phases["auth"] > 0
+
+
+def test_hash_round_trip_on_pool():
+    hashed, _ = asyncio.run(hashing.hash_api_key_async("k" * 64))
+    assert asyncio.run(hashing.verify_api_key_async("k" * 64, hashed))
+    assert not asyncio.run(hashing.verify_api_key_async("x" * 64, hashed))
+
+
+def test_register_then_login(client):
+    response = client.post("/api/v1/agents/register", json={
+        "username": "hash-agent", "display_name": "Hash Agent", "framework": "pytest",
+    })
+    api_key = response.json()["api_key"]
+    response = client.post("/api/v1/agents/login", json={"username": "hash-agent", "api_key": api_key})
+    assert response.status_code == 200
+    assert "access_token" in response.json()
+    assert "auth;dur=" in response.headers["server-timing"]
+
+
+def test_unknown_username_is_rejected_without_hashing(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(hashing.hash_pool, "run", lambda *a: calls.append(a))
+    response = client.post("/api/v1/agents/login", json={"username": "nobody-here", "api_key": "x"})
+    assert response.status_code == 401
+    assert calls == []
+    hashing.clear_login_failures(None, "testclient", "nobody-here")
+
+
+def test_login_throttle_trips_before_hashing(client, monkeypatch):
+    monkeypatch.setattr(hashing, "LOGIN_FAILURE_LIMIT", 3)
+    try:
+        for _ in range(3):
+            response = client.post("/api/v1/agents/login", json={"username": "nobody-here", "api_key": "x"})
+            assert response.status_code == 401
+        response = client.post("/api/v1/agents/login", json={"username": "nobody-here", "api_key": "x"})
+        assert response.status_code == 429
+    finally:
+        hashing.clear_login_failures(None, "testclient", "nobody-here")
+
+
+def test_login_only_clears_its_own_failures(client, monkeypatch):
+    monkeypatch.setattr(hashing, "LOGIN_FAILURE_LIMIT", 2)
+    api_key = client.post("/api/v1/agents/register", json={
+        "username": "hash-agent", "display_name": "Hash Agent", "framework": "pytest",
+    }).json()["api_key"]
+    try:
+        for _ in range(2):
+            client.post("/api/v1/agents/login", json={"username": "nobody-here", "api_key": "x"})
+        ok = client.post("/api/v1/agents/login", json={"username": "hash-agent", "api_key": api_key})
+        assert ok.status_code == 200
+        again = client.post("/api/v1/agents/login", json={"username": "nobody-here", "api_key": "x"})
+        assert again.status_code == 429
+    finally:
+        hashing.clear_login_failures(None, "testclient", "nobody-here")
+
+
+def test_memory_throttle_window():
+    ip = "203.0.113.9"
+    try:
+        for _ in range(2):
+            hashing.record_login_failure(None, ip, "agent")
+        hashing.check_login_throttle(None, ip, "agent", limit=3)
+        hashing.record_login_failure(None, ip, "agent")
+        with pytest.raises(RateLimitExceeded):
+            hashing.check_login_throttle(None, ip, "Agent", limit=3)
+        hashing.check_login_throttle(None, ip, "agent", limit=3, window=-1)  # window elapsed
+        hashing.check_login_throttle(None, ip, "other", limit=3)
+        hashing.check_login_throttle(None, "198.51.100.7", "agent", limit=3)
+    finally:
+        hashing.clear_login_failures(None, ip, "agent")
+
+
+def test_work_factor_does_not_break_existing_hashes():
+    from passlib.context import CryptContext
+    old = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__rounds=1000).hash("secret")
+    assert verify_api_key("secret", old)
+    assert hash_api_key("secret")[0].startswith("$pbkdf2-sha256$")
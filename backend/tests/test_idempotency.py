@@ -0,0 +1,106 @@
+"""
+Tests for Idempotency-Key replay on write endpoints.
+"""
+
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.core.idempotency import IdempotencyStore, fingerprint, idempotency_store
+from app.core.security import create_access_token
+from app.main import VoteCreate
+from app.models import IdempotencyKey, Post, Vote
+
+
+@pytest.fixture
+def seeded(db_session, make_agent, make_face):
+    agent = make_agent("retrier")
+    make_face(agent)
+    db_session.commit()
+    token = create_access_token({"agent_id": str(agent.agent_id)})
+    return str(agent.agent_id), {"Authorization": f"Bearer {token}"}
+
+
+def _post(client, headers, key, title="Retried"):
+    return client.post("/api/v1/posts", json={"face_name": "general", "title": title, "content": "once"},
+                       headers={**headers, "Idempotency-Key": key})
+
+
+def test_retried_post_is_replayed(client, db_session, seeded, query_budget):
+    _, headers = seeded
+    first = _post(client, headers, "post-1")
+    assert first.status_code == 201 and "Idempotent-Replayed" not in first.headers
+
+    with query_budget(1, label="POST /api/v1/posts (replay)"):
+        again = _post(client, headers, "post-1")
+    assert again.status_code == 201 and again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == first.json()
+    assert db_session.query(Post).count() == 1
+
+    assert _post(client, headers, "post-1", title="Something else").status_code == 422
+    other = _post(client, headers, "post-2", title="Different topic entirely")
+    assert other.status_code == 201 and other.json()["post_id"] != first.json()["post_id"]
+    assert _post(client, headers, "x" * 256).status_code == 400
+
+
+def test_retried_vote_does_not_toggle(client, db_session, seeded):
+    _, headers = seeded
+    post_id = _post(client, headers, "post").json()["post_id"]
+    vote = {"post_id": post_id, "vote_type": 1}
+    for _ in range(2):
+        response = client.post("/api/v1/votes", json=vote, headers={**headers, "Idempotency-Key": "vote-1"})
+        assert response.json() == {"detail": "Vote cast"}
+    assert db_session.query(Vote).count() == 1
+
+    # Failed writes are not stored: the retry runs again
+    missing = {"comment_id": post_id, "vote_type": 1}
+    for _ in range(2):
+        response = client.post("/api/v1/votes", json=missing, headers={**headers, "Idempotency-Key": "vote-2"})
+        assert response.status_code == 404 and "Idempotent-Replayed" not in response.headers
+
+
+def test_duplicate_waits_for_in_flight_request(client, seeded):
+    agent_id, headers = seeded
+    vote = {"post_id": _post(client, headers, "post").json()["post_id"], "vote_type": 1}
+    digest = fingerprint("votes", VoteCreate(**vote).model_dump_json().encode())
+    assert idempotency_store.claim(agent_id, "in-flight", digest) is None  # another worker is running it
+
+    finish = threading.Timer(0.2, idempotency_store.complete,
+                             (agent_id, "in-flight", digest, 201, b'{"detail":"Vote cast"}'))
+    finish.start()
+    response = client.post("/api/v1/votes", json=vote, headers={**headers, "Idempotency-Key": "in-flight"})
+    finish.join()
+    assert response.status_code == 201 and response.headers["Idempotent-Replayed"] == "true"
+
+
+def _no_database():
+    raise RuntimeError("no database")
+
+
+def test_store_claims_and_releases():
+    store = IdempotencyStore(session_factory=_no_database)
+    assert store.claim("a", "k", "d1") is None
+    assert store.claim("a", "k", "d1").pending
+    assert store.claim("b", "k", "d1") is None  # keys are per agent
+    store.release("a", "k")
+    assert store.claim("a", "k", "d1") is None
+    store.complete("a", "k", "d1", 201, b"{}")
+    record = store.claim("a", "k", "d1")
+    assert (record.status_code, record.body) == (201, b"{}")
+
+
+def test_database_store_is_shared_between_workers(db_session, seeded):
+    agent_id, _ = seeded
+    factory = idempotency_store.session_factory  # the test's connection
+    first, second = IdempotencyStore(session_factory=factory), IdempotencyStore(session_factory=factory)
+    assert first.claim(agent_id, "k", "d1") is None
+    assert second.claim(agent_id, "k", "d1").pending
+    first.complete(agent_id, "k", "d1", 201, b"{}")
+    record = second.claim(agent_id, "k", "d1")
+    assert (record.status_code, record.body) == (201, b"{}")
+
+    second.release(agent_id, "k")
+    assert first.claim(agent_id, "k", "d2") is None
+    db_session.query(IdempotencyKey).update({"expires_at": datetime(2000, 1, 1)})
+    assert second.claim(agent_id, "k", "d3") is None  # expired claims are taken over
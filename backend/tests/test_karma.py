@@ -0,0 +1,80 @@
+"""
+Tests for set-based karma recompute.
+"""
+
+from datetime import datetime, timedelta
+
+from app.models import Agent, Comment, Face, Post, Vote
+from app.services.karma import recompute_karma
+
+
+def _agent(db, username, karma=0):
+    agent = Agent(
+        username=username,
+        display_name=username,
+        framework="pytest",
+        api_key_hash="x",
+        salt="x",
+        karma=karma,
+    )
+    db.add(agent)
+    db.flush()
+    return agent
+
+
+def _seed(db):
+    alice = _agent(db, "alice", karma=99)  # drifted
+    bob = _agent(db, "bob")
+    carol = _agent(db, "carol")
+    face = Face(name="general", display_name="General", creator_agent_id=alice.agent_id)
+    db.add(face)
+    db.flush()
+    post = Post(face_id=face.face_id, author_agent_id=alice.agent_id, title="t", content="c")
+    db.add(post)
+    db.flush()
+    comment = Comment(post_id=post.post_id, author_agent_id=bob.agent_id, content="c")
+    db.add(comment)
+    db.flush()
+    db.add_all([
+        Vote(agent_id=bob.agent_id, post_id=post.post_id, vote_type=1),
+        Vote(agent_id=carol.agent_id, post_id=post.post_id, vote_type=1),
+        Vote(agent_id=alice.agent_id, comment_id=comment.comment_id, vote_type=-1),
+    ])
+    db.commit()
+    return alice, bob, carol
+
+
+def test_full_recompute_counts_post_and_comment_votes(db_session):
+    alice, bob, carol = _seed(db_session)
+
+    result = recompute_karma(db_session)
+
+    assert result["mode"] == "full"
+    assert result["agents_scanned"] == 3
+    db_session.expire_all()
+    assert alice.karma == 2
+    assert bob.karma == -1
+    assert carol.karma == 0
+    changed = {c["username"] for c in result["karma_changes"]}
+    assert changed == {"alice", "bob"}
+
+
+def test_incremental_only_touches_recent_authors(db_session):
+    alice, bob, _ = _seed(db_session)
+    recompute_karma(db_session)
+
+    # Drift both, but only bob's content has votes newer than the watermark
+    alice.karma = 50
+    bob.karma = 50
+    db_session.commit()
+    since = datetime.utcnow() - timedelta(hours=1)
+    for vote in db_session.query(Vote).filter(Vote.post_id.isnot(None)):
+        vote.created_at = since - timedelta(hours=1)
+    db_session.commit()
+
+    result = recompute_karma(db_session, incremental=True, since=since)
+
+    assert result["mode"] == "incremental"
+    db_session.expire_all()
+    assert bob.karma == -1
+    assert alice.karma == 50
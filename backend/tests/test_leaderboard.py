@@ -0,0 +1,79 @@
+"""
+Tests for the karma leaderboard.
+"""
+
+import pytest
+
+from app.core.security import create_access_token
+from app.services.leaderboard import Leaderboard, leaderboard
+
+KARMA = [50, 40, 40, 30, 20, 10, 0]
+
+
+@pytest.fixture
+def agents(db_session, make_agent):
+    agents = [
+        make_agent(f"lb{i}", framework="LangChain" if i % 2 else "CrewAI", karma=karma)
+        for i, karma in enumerate(KARMA)
+    ]
+    agents.append(make_agent("banned", framework="CrewAI", karma=999, is_banned=True))
+    db_session.commit()
+    return agents
+
+
+def test_cursor_paging_with_shared_ranks(client, agents):
+    first = client.get("/api/v1/leaderboard?limit=3").json()
+    assert [e["username"] for e in first["entries"]][0] == "lb0"
+    assert [(e["karma"], e["rank"]) for e in first["entries"]] == [(50, 1), (40, 2), (40, 2)]
+
+    second = client.get(f"/api/v1/leaderboard?limit=3&cursor={first['next_cursor']}").json()
+    assert [(e["karma"], e["rank"]) for e in second["entries"]] == [(30, 4), (20, 5), (10, 6)]
+
+    last = client.get(f"/api/v1/leaderboard?limit=3&cursor={second['next_cursor']}").json()
+    assert [e["username"] for e in last["entries"]] == ["lb6"]
+    assert last["next_cursor"] is None
+
+
+def test_framework_board(client, agents):
+    data = client.get("/api/v1/leaderboard?framework=langchain").json()
+    assert [e["username"] for e in data["entries"]] == ["lb1", "lb3", "lb5"]
+    assert [e["rank"] for e in data["entries"]] == [1, 2, 3]
+
+
+def test_invalid_cursor(client):
+    assert client.get("/api/v1/leaderboard?cursor=!!").status_code == 400
+
+
+def test_list_agents_by_karma_uses_board(client, query_budget, agents):
+    client.get("/api/v1/agents?sort=karma&limit=1")
+    with query_budget(3, label="GET /api/v1/agents?sort=karma (warm)"):
+        data = client.get("/api/v1/agents?sort=karma&limit=3&offset=1").json()
+    assert [a["karma"] for a in data] == [40, 40, 30]
+
+
+def test_current_agent_has_rank(client, agents):
+    for agent, rank in ((agents[2], 2), (agents[6], 7), (agents[7], None)):
+        token = create_access_token({"agent_id": str(agent.agent_id)})
+        response = client.get("/api/v1/agents/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json()["rank"] == rank
+
+
+def test_updates_move_rank(db_session, agents):
+    board = Leaderboard()
+    assert board.rank(db_session, agents[6].agent_id, 0) == 7
+    board.update(agents[6].agent_id, "CrewAI", 55)
+    assert board.rank(db_session, agents[6].agent_id, 55) == 1
+    assert board.rank(db_session, agents[6].agent_id, 55, framework="crewai") == 1
+    assert board.rank(db_session, agents[6].agent_id, 55, framework="LangChain") is None
+    assert board.rank(db_session, agents[7].agent_id, 999) is None  # banned agents are not ranked
+
+
+def test_backfill_reloads_board(client, db_session, agents):
+    leaderboard.rebuild(db_session)
+    response = client.post("/api/v1/admin/backfill-karma",
+                           headers={"X-Admin-Key": "synapse-backfill-2026"})
+    assert response.status_code == 200
+    # No votes exist, so the backfill zeroes every agent and the board follows
+    assert leaderboard.rank(db_session, agents[0].agent_id, 0) == 1
+    assert client.get("/api/v1/leaderboard?limit=1").json()["entries"][0]["karma"] == 0
@@ -0,0 +1,39 @@
+"""
+Tests for the Prometheus metrics endpoint and collectors.
+"""
+
+from app.core.metrics import DB_QUERIES, HTTP_REQUESTS, Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "/a")
+    hist.observe(0.5, "/a")
+    hist.observe(5.0, "/a")
+    text = "\n".join(hist.render())
+    assert 't_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 't_seconds_count{route="/a"} 3' in text
+
+
+def test_requests_are_labelled_by_route_template(client, poster):
+    route = "/api/v1/faces/{face_name}"
+    before = HTTP_REQUESTS.value("GET", route, "200")
+    queries_before = DB_QUERIES.count("GET", route)
+
+    assert client.get("/api/v1/faces/general").status_code == 200
+
+    assert HTTP_REQUESTS.value("GET", route, "200") == before + 1
+    assert DB_QUERIES.count("GET", route) == queries_before + 1
+
+
+def test_metrics_endpoint_exposition(client):
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE synapse_http_request_duration_seconds histogram" in body
+    assert 'synapse_http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert "synapse_webhook_queue_depth" in body
@@ -0,0 +1,67 @@
+"""
+Tests for post and agent listing views and sparse fieldsets.
+"""
+
+from app.models import Subscription
+
+
+def test_list_posts_full_view(client, poster):
+    response = client.get("/api/v1/posts?sort=top")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 3
+    assert data[0]["title"] == "Post 2"
+    assert len(data[0]["content"]) == 5000
+    assert data[0]["author"]["username"] == "poster"
+    assert data[0]["face_name"] == "general"
+
+
+def test_list_posts_compact_view(client, poster):
+    response = client.get("/api/v1/posts?view=compact")
+    assert response.status_code == 200
+    post = response.json()[0]
+    assert "content" not in post
+    assert len(post["preview"]) == 150
+    assert post["author"]["username"] == "poster"
+
+
+def test_list_posts_sparse_fields(client, poster):
+    response = client.get("/api/v1/posts?fields=title,karma&sort=top")
+    assert response.status_code == 200
+    assert response.json()[0] == {
+        "post_id": response.json()[0]["post_id"],
+        "title": "Post 2",
+        "karma": 2,
+    }
+
+
+def test_list_posts_unknown_field(client):
+    response = client.get("/api/v1/posts?fields=title,api_key_hash")
+    assert response.status_code == 400
+
+
+def test_list_agents_compact_view(client, poster):
+    response = client.get("/api/v1/agents?view=compact")
+    assert response.status_code == 200
+    assert response.json() == [{
+        "username": "poster", "display_name": "Poster", "avatar_url": None,
+        "framework": "pytest", "karma": 0,
+    }]
+
+
+def test_agent_sparse_fields(client, db_session, poster, make_agent):
+    fan = make_agent("fan")
+    db_session.add(Subscription(follower_id=fan.agent_id, following_id=poster.agent_id))
+    db_session.commit()
+
+    response = client.get("/api/v1/agents/poster?fields=bio,follower_count")
+    assert response.status_code == 200
+    assert response.json() == {"username": "poster", "bio": None, "follower_count": 1}
+
+    listed = client.get("/api/v1/agents?sort=new&fields=agent_id,following_count").json()
+    assert {a["username"]: a["following_count"] for a in listed} == {"poster": 0, "fan": 1}
+    assert listed[0]["agent_id"] == str(fan.agent_id)
+    ranked = client.get("/api/v1/agents?sort=karma&fields=karma").json()
+    assert sorted(a["username"] for a in ranked) == ["fan", "poster"]
+
+    assert client.get("/api/v1/agents?fields=api_key_hash").status_code == 400
@@ -0,0 +1,40 @@
+"""
+Tests for Server-Timing headers and the debug SQL log.
+"""
+
+import json
+
+from app.core.profiling import fingerprint, normalize_sql, summarize_statements
+
+
+def test_fingerprint_ignores_literals_and_params():
+    a = "SELECT * FROM agents WHERE agent_id = :agent_id_1 LIMIT 1"
+    b = "SELECT * FROM agents  WHERE agent_id = :agent_id_2 LIMIT 5"
+    assert fingerprint(a) == fingerprint(b)
+    assert normalize_sql("SELECT 1 FROM t WHERE x IN (?, ?, ?) AND y = 'z'") == \
+        "SELECT ? FROM t WHERE x IN (?...) AND y = ?"
+
+
+def test_repeated_select_flagged_as_n_plus_one():
+    lookup = "SELECT agents.username FROM agents WHERE agents.agent_id = ?"
+    summary = summarize_statements([("SELECT * FROM comments", 0.002)] + [(lookup, 0.001)] * 5)
+    by_sql = {entry["sql"]: entry for entry in summary}
+    assert by_sql[lookup]["count"] == 5
+    assert by_sql[lookup]["n_plus_one"] is True
+    assert by_sql["SELECT * FROM comments"]["n_plus_one"] is False
+
+
+def test_server_timing_header(client, poster):
+    response = client.get("/api/v1/posts")
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert "serialize;dur=" in timing
+    assert "total;dur=" in timing
+    assert "x-debug-sql-log" not in response.headers
+
+
+def test_debug_sql_log(client, poster):
+    response = client.get("/api/v1/posts", headers={"X-Debug-SQL": "1"})
+    log = json.loads(response.headers["x-debug-sql-log"])
+    assert log["queries"] == sum(entry["count"] for entry in log["statements"])
+    assert all({"fingerprint", "sql", "count", "total_ms"} <= set(e) for e in log["statements"])
@@ -0,0 +1,104 @@
+"""
+SQL query budgets per endpoint against a seeded dataset.
+
+Budgets are upper bounds on statements per request; an N+1 regression
+(one lookup per row) blows through them immediately. Latency budgets are
+only enforced with PERF_BUDGETS=1.
+"""
+
+import pytest
+
+from app.core.security import create_access_token
+from app.main import response_cache
+from app.models import Agent, Comment, Post, Subscription
+
+
+@pytest.fixture
+def seed_dataset(db_session, make_agent, make_face, make_post):
+    """Factory for the budget dataset: agents, faces, posts, comments and follows."""
+
+    def _seed(n_agents=10, n_posts=120, comments_per_post=2):
+        agents = [make_agent(f"agent{i}", display_name=f"Agent {i}", karma=i * 10) for i in range(n_agents)]
+        faces = [make_face(agents[0], name) for name in ("general", "research", "tools")]
+        posts = [
+            make_post(faces[i % len(faces)], agents[i % n_agents], f"Post {i} about agents",
+                      f"Body of post {i} " * 40, upvotes=i % 17)
+            for i in range(n_posts)
+        ]
+        db_session.add_all(
+            Comment(post_id=post.post_id, author_agent_id=agents[(i + j) % n_agents].agent_id,
+                    content=f"Comment {j} for @agent{(i + j + 1) % n_agents}")
+            for i, post in enumerate(posts) for j in range(comments_per_post)
+        )
+        db_session.add_all(
+            Subscription(follower_id=agents[i].agent_id, following_id=agents[0].agent_id)
+            for i in range(1, n_agents)
+        )
+        db_session.commit()
+
+    return _seed
+
+
+BUDGETS = [
+    # (path, max statements, max ms)
+    ("/api/v1/posts?limit=100", 4, 150),
+    ("/api/v1/posts?limit=100&sort=top", 4, 150),
+    ("/api/v1/posts?limit=100&view=compact", 4, 100),
+    ("/api/v1/posts?limit=50&face_name=research", 4, 100),
+    ("/api/v1/search?q=agents&limit=50", 5, 150),
+    ("/api/v1/faces", 2, 50),
+    ("/api/v1/faces/general", 2, 50),
+    ("/api/v1/agents?limit=50", 4, 100),
+    ("/api/v1/agents/agent0", 4, 50),
+    ("/api/v1/agents/agent0/followers", 2, 50),
+    ("/api/v1/agents/agent1/following", 2, 50),
+    ("/api/v1/trending", 6, 100),
+    ("/api/v1/platform-info", 6, 100),
+]
+
+
+@pytest.mark.parametrize("path,max_queries,max_ms", BUDGETS)
+def test_endpoint_query_budget(client, query_budget, seed_dataset, path, max_queries, max_ms):
+    seed_dataset()
+    response_cache.invalidate("")
+    with query_budget(max_queries, max_ms=max_ms, label=f"GET {path}"):
+        response = client.get(path)
+    assert response.status_code == 200, response.text
+
+
+def test_face_filter_budget_is_filtered(client, seed_dataset):
+    seed_dataset()
+    posts = client.get("/api/v1/posts?limit=50&face_name=research").json()
+    assert len(posts) == 40 and {p["face_name"] for p in posts} == {"research"}
+
+
+def test_list_comments_query_budget(client, db_session, query_budget, seed_dataset):
+    seed_dataset(comments_per_post=30)
+    post_id = str(db_session.query(Post.post_id).first()[0])
+    for sort in ("top", "new", "best"):
+        with query_budget(3, max_ms=100, label=f"GET /api/v1/comments?sort={sort}"):
+            response = client.get(f"/api/v1/comments?post_id={post_id}&sort={sort}")
+        assert response.status_code == 200 and len(response.json()) == 30
+
+
+def test_get_activity_query_budget(client, db_session, query_budget, seed_dataset):
+    seed_dataset()
+    agent1 = db_session.query(Agent.agent_id).filter(Agent.username == "agent1").scalar()
+    headers = {"Authorization": f"Bearer {create_access_token({'agent_id': str(agent1)})}"}
+    with query_budget(7, max_ms=150, label="GET /api/v1/agents/me/activity"):
+        response = client.get("/api/v1/agents/me/activity?limit=50", headers=headers)
+    assert response.status_code == 200, response.text
+    kinds = {a["type"] for a in response.json()["activities"]}
+    assert {"comment_on_your_post", "followed_agent_post", "mention_in_comment"} <= kinds
+    assert all(a["author"] for a in response.json()["activities"])
+
+
+def test_follow_lists_and_counts(client, seed_dataset):
+    seed_dataset()
+    followers = client.get("/api/v1/agents/agent0/followers").json()
+    assert followers["count"] == 9
+    assert {"username", "display_name", "followed_at"} <= set(followers["followers"][0])
+    assert client.get("/api/v1/agents/agent1/following").json()["following"][0]["username"] == "agent0"
+    agents = {a["username"]: a for a in client.get("/api/v1/agents?limit=50").json()}
+    assert agents["agent0"]["follower_count"] == 9
+    assert agents["agent1"]["following_count"] == 1
@@ -0,0 +1,149 @@
+"""
+Tests for the TF-IDF related-posts engine.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services.related import LEADER_KEY, RelatedPosts, related_posts, tokenize
+
+POSTS = {
+    "vectors": ("Vector databases for agent memory",
+                "Embeddings stored in a vector database give agents long term memory."),
+    "embeddings": ("Choosing embeddings",
+                   "Which embeddings model works best with a vector database for retrieval?"),
+    "retrieval": ("Retrieval tricks",
+                  "Hybrid retrieval mixes keyword search with embeddings from a vector index."),
+    "soccer": ("Soccer predictions",
+               "Our agent predicts soccer match goals from team form and player stats."),
+    "football": ("Match goals model",
+                 "Predicting goals per match for soccer leagues using player stats."),
+}
+LEAGUE = {"league": ("Soccer league goals", "Soccer match goals and player stats for the league.")}
+
+
+@pytest.fixture
+def add_posts(db_session, make_agent, make_face, make_post):
+    """Factory adding `titles` as posts by one author, a minute apart from `start`."""
+    agent = make_agent("author")
+    face = make_face(agent)
+
+    def _add(titles=POSTS, start=None):
+        start = start or datetime.utcnow() - timedelta(hours=1)
+        posts = {
+            name: make_post(face, agent, title, content, created_at=start + timedelta(minutes=i))
+            for i, (name, (title, content)) in enumerate(titles.items())
+        }
+        db_session.commit()
+        return {name: str(p.post_id) for name, p in posts.items()}
+
+    return _add
+
+
+def test_tokenize_weights_titles_and_drops_stopwords():
+    counts = tokenize("Vector memory", "the vector is a memory store")
+    assert counts == {"vector": 3, "memory": 3, "store": 1}
+
+
+def test_neighbours_match_dense_cosine(db_session, add_posts):
+    ids = add_posts()
+    index = RelatedPosts(k=4)
+    assert index.refresh(db_session) == len(POSTS)
+
+    names = {v: k for k, v in ids.items()}
+    assert [names[p] for p, _ in index.neighbors(ids["football"])][0] == "soccer"
+    assert {names[p] for p, _ in index.neighbors(ids["vectors"])[:2]} == {"embeddings", "retrieval"}
+
+    # Same scores as a dense TF-IDF computation
+    post_ids, indptr, indices, data, *_ = index._matrix()
+    dense = np.zeros((len(post_ids), len(index._df)))
+    for row in range(len(post_ids)):
+        dense[row, indices[indptr[row]:indptr[row + 1]]] = data[indptr[row]:indptr[row + 1]]
+    cosine = dense @ dense.T
+    row = post_ids.index(ids["vectors"])
+    for other, score in index.neighbors(ids["vectors"]):
+        assert abs(cosine[row, post_ids.index(other)] - score) < 1e-9
+
+
+def test_incremental_refresh_merges_new_posts(db_session, add_posts):
+    ids = add_posts()
+    index = RelatedPosts(k=2)
+    index.refresh(db_session, full=True)
+    before = index.neighbors(ids["soccer"])
+
+    new = add_posts(LEAGUE, start=datetime.utcnow())
+    assert index.refresh(db_session, full=False) == 1
+    assert index.neighbors(new["league"])[0][0] in (ids["soccer"], ids["football"])
+    after = [p for p, _ in index.neighbors(ids["soccer"])]
+    assert new["league"] in after and after != [p for p, _ in before]
+    assert index.refresh(db_session, full=False) == 0  # nothing new
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def pipeline(self, transaction=False):
+        redis = self
+
+        class Pipe:
+            def set(self, key, value, ex=None):
+                redis.set(key, value)
+
+            def execute(self):
+                return []
+        return Pipe()
+
+
+def test_only_the_lease_holder_computes(db_session, add_posts):
+    ids = add_posts()
+    redis = _FakeRedis()
+    leader, follower = RelatedPosts(redis_client=redis), RelatedPosts(redis_client=redis)
+    assert leader.refresh(db_session) == len(POSTS)
+    assert follower.refresh(db_session) == 0 and not follower._docs
+    assert follower.neighbors(ids["football"])[0][0] == ids["soccer"]  # served from Redis
+
+    redis.data.pop(LEADER_KEY)  # lease expired: the next refresh takes over
+    assert follower.refresh(db_session) == len(POSTS)
+    assert leader.refresh(db_session) == 0
+
+
+def test_full_refresh_compacts_the_vocabulary(db_session, add_posts):
+    ids = add_posts()
+    index = RelatedPosts(k=2, max_posts=3)
+    index.refresh(db_session, full=True)
+    add_posts(LEAGUE, start=datetime.utcnow())
+    index.refresh(db_session, full=False)
+    assert 0 in index._df  # terms of the post that left the corpus linger until the next full pass
+
+    index.refresh(db_session, full=True)
+    kept = set().union(*(tokenize(*POSTS[name]) for name in ("soccer", "football")), tokenize(*LEAGUE["league"]))
+    assert set(index._vocab) == kept and 0 not in index._df
+    assert sorted(index._vocab.values()) == list(range(len(index._df)))
+    assert ids["soccer"] in [p for p, _ in index.neighbors(ids["football"])]
+
+
+def test_related_endpoint(client, db_session, add_posts):
+    ids = add_posts()
+    related_posts.refresh(db_session)
+    data = client.get(f"/api/v1/posts/{ids['soccer']}/related?limit=1").json()
+    assert data["post_id"] == ids["soccer"]
+    assert [r["post_id"] for r in data["related"]] == [ids["football"]]
+    assert 0 < data["related"][0]["score"] <= 1
+    assert "content" not in data["related"][0]
+
+    assert client.get("/api/v1/posts/not-a-uuid/related").status_code == 404
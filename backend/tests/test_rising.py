@@ -0,0 +1,71 @@
+"""
+Tests for the rising feed.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.feeds import FeedEntry, epoch_seconds
+from app.services.rising import RisingFeed, rising_feed, velocity
+
+
+@pytest.fixture
+def entries(db_session, make_agent, make_face, make_post):
+    agent = make_agent("riser")
+    faces = [make_face(agent, name) for name in ("general", "science")]
+    now = datetime.utcnow()
+    posts = {}
+    for i, title in enumerate(["steady", "spiking", "quiet", "elsewhere"]):
+        face = faces[1] if title == "elsewhere" else faces[0]
+        posts[title] = make_post(face, agent, title, upvotes=100 - i, created_at=now - timedelta(hours=2))
+    db_session.commit()
+    return {title: FeedEntry.from_post(p) for title, p in posts.items()}
+
+
+def test_velocity_weights_recent_minutes():
+    now = 100 * 60.0
+    assert velocity({100: 3}, now, window=600) == 3
+    assert velocity({91: 10}, now, window=600) == 1  # last minute of the window
+    assert velocity({90: 10, 101: 5}, now, window=600) == 0  # outside the window
+
+
+def test_sort_rising_reads_counters_only(client, query_budget, entries):
+    rising_feed.record(entries["steady"], 2)
+    rising_feed.record(entries["spiking"], 5)
+    rising_feed.record(entries["elsewhere"], 1)
+
+    with query_budget(3, label="GET /api/v1/posts?sort=rising"):
+        data = client.get("/api/v1/posts?sort=rising").json()
+    assert [p["title"] for p in data] == ["spiking", "steady", "elsewhere"]
+    titles = [p["title"] for p in client.get("/api/v1/posts?sort=rising&face_name=general").json()]
+    assert titles == ["spiking", "steady"]
+
+
+def test_votes_and_comments_feed_counters(entries):
+    feed = RisingFeed(window=600)
+    now = epoch_seconds(datetime.utcnow())
+    feed.record(entries["steady"], 4, now=now - 300)
+    feed.record(entries["spiking"], 3, now=now)
+    feed.record(entries["quiet"], -1, now=now)  # downvotes do not count
+    assert feed.page(None, 0, 10, now=now) == [entries["spiking"].post_id, entries["steady"].post_id]
+
+    # Ten minutes on, the old activity has left the window
+    feed.sweep(now=now + 420)
+    assert feed.page(None, 0, 10, now=now + 420) == [entries["spiking"].post_id]
+    feed.sweep(now=now + 660)
+    assert feed.page(None, 0, 10, now=now + 660) == []
+
+
+def test_old_posts_are_not_tracked(entries):
+    feed = RisingFeed()
+    old = entries["quiet"]._replace(created_at=datetime.utcnow() - timedelta(days=3))
+    feed.record(old, 10)
+    assert feed.page(None, 0, 10) == []
+
+
+def test_top_k_is_bounded(entries):
+    feed = RisingFeed(top_k=2)
+    for weight, title in enumerate(["steady", "spiking", "quiet"], start=1):
+        feed.record(entries[title], weight)
+    assert feed.page(None, 0, 10) == [entries["quiet"].post_id, entries["spiking"].post_id]
@@ -0,0 +1,85 @@
+"""
+Tests for time-windowed top rankings.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Post
+from app.services.feeds import FeedEntry, epoch_seconds, feed_score
+from app.services.top_windows import WindowedTop, merge_buckets, windowed_top
+
+
+@pytest.fixture
+def face(db_session, make_agent, make_face, make_post):
+    agent = make_agent("ranker")
+    face = make_face(agent)
+    now = datetime.utcnow()
+    ages = {  # title -> (age, upvotes)
+        "fresh": (timedelta(minutes=20), 3),
+        "today": (timedelta(hours=5), 9),
+        "this-week": (timedelta(days=3), 20),
+        "this-month": (timedelta(days=20), 50),
+        "this-year": (timedelta(days=200), 80),
+        "ancient": (timedelta(days=800), 500),
+    }
+    for title, (age, upvotes) in ages.items():
+        make_post(face, agent, title, upvotes=upvotes, created_at=now - age)
+    db_session.commit()
+    return face
+
+
+def _titles(client, query):
+    response = client.get(f"/api/v1/posts?sort=top{query}")
+    assert response.status_code == 200
+    return [p["title"] for p in response.json()]
+
+
+EXPECTED = {
+    "hour": ["fresh"],
+    "day": ["today", "fresh"],
+    "week": ["this-week", "today", "fresh"],
+    "month": ["this-month", "this-week", "today", "fresh"],
+    "year": ["this-year", "this-month", "this-week", "today", "fresh"],
+}
+
+
+def test_windows_via_sql_fallback(client, face):
+    assert not windowed_top.is_ready()
+    for t, expected in EXPECTED.items():
+        assert _titles(client, f"&t={t}") == expected, t
+    assert _titles(client, "&t=all")[0] == "ancient"
+
+
+def test_windows_via_buckets_match_sql(client, db_session, face):
+    windowed_top.rebuild(db_session, full=True)
+    assert windowed_top.is_ready()
+    for t, expected in EXPECTED.items():
+        assert _titles(client, f"&t={t}") == expected, t
+        assert _titles(client, f"&t={t}&face_name=general") == expected, t
+        assert windowed_top.page(face.face_id, t, 1, 10) == windowed_top.page(None, t, 0, 10)[1:]
+
+
+def test_vote_rerank_within_window(db_session, face):
+    index = WindowedTop()
+    index.rebuild(db_session, full=True)
+    fresh = db_session.query(Post).filter(Post.title == "fresh").one()
+    index.record(FeedEntry.from_post(fresh)._replace(karma=100))
+    top = index.page(None, "week", 0, 1)
+    assert top == [str(fresh.post_id)]
+
+
+def test_invalid_time_filter(client):
+    assert client.get("/api/v1/posts?sort=top&t=decade").status_code == 400
+
+
+def test_merge_buckets_filters_window_edge():
+    base = datetime(2026, 5, 1, 12)
+    def item(name, karma, minutes):
+        created = base + timedelta(minutes=minutes)
+        return (name, feed_score("top", karma, created))
+    newer = [item("b", 7, 70), item("c", 1, 65)]
+    older = [item("a", 9, 5), item("d", 3, 50)]  # "a" falls before the window start
+    start = epoch_seconds(base + timedelta(minutes=30))
+    assert merge_buckets([newer, older], start, 3) == ["b", "d", "c"]
@@ -0,0 +1,84 @@
+"""
+Tests for viewer state (my_vote, following_author) on feed pages.
+"""
+
+import pytest
+
+from app.core.security import create_access_token
+from app.models import Comment, Subscription, Vote
+
+
+@pytest.fixture
+def seeded(db_session, make_agent, make_face, make_post):
+    viewer, followed, stranger = (make_agent(name) for name in ("viewer", "followed", "stranger"))
+    face = make_face(viewer)
+    posts = {
+        "liked": make_post(face, followed, "liked", "x"),
+        "disliked": make_post(face, stranger, "disliked", "x"),
+        "unseen": make_post(face, stranger, "unseen", "x"),
+    }
+    comments = {
+        "upvoted": Comment(post_id=posts["liked"].post_id, author_agent_id=stranger.agent_id, content="upvoted"),
+        "plain": Comment(post_id=posts["liked"].post_id, author_agent_id=followed.agent_id, content="plain"),
+    }
+    db_session.add_all(comments.values())
+    db_session.flush()
+    db_session.add_all([
+        Subscription(follower_id=viewer.agent_id, following_id=followed.agent_id),
+        Subscription(follower_id=stranger.agent_id, following_id=stranger.agent_id),
+        Vote(agent_id=viewer.agent_id, post_id=posts["liked"].post_id, vote_type=1),
+        Vote(agent_id=viewer.agent_id, post_id=posts["disliked"].post_id, vote_type=-1),
+        Vote(agent_id=stranger.agent_id, post_id=posts["unseen"].post_id, vote_type=1),
+        Vote(agent_id=viewer.agent_id, comment_id=comments["upvoted"].comment_id, vote_type=1),
+    ])
+    db_session.commit()
+    token = create_access_token({"agent_id": str(viewer.agent_id)})
+    return {"Authorization": f"Bearer {token}"}, str(posts["liked"].post_id)
+
+
+def _state(items, key):
+    return {item[key]: (item["my_vote"], item["following_author"]) for item in items}
+
+
+EXPECTED_POSTS = {"liked": (1, True), "disliked": (-1, False), "unseen": (None, False)}
+
+
+def test_list_posts_viewer_state(client, query_budget, seeded):
+    headers, _ = seeded
+    anonymous = client.get("/api/v1/posts?sort=new").json()
+    assert "my_vote" not in anonymous[0]
+
+    with query_budget(4, label="GET /api/v1/posts (authenticated)"):
+        data = client.get("/api/v1/posts?sort=new", headers=headers).json()
+    assert _state(data, "title") == EXPECTED_POSTS
+
+    compact = client.get("/api/v1/posts?view=compact", headers=headers).json()
+    assert _state(compact, "title") == EXPECTED_POSTS
+    sparse = client.get("/api/v1/posts?fields=title,my_vote", headers=headers).json()
+    assert {p["title"]: p["my_vote"] for p in sparse} == {"liked": 1, "disliked": -1, "unseen": None}
+    assert "following_author" not in sparse[0]
+    assert "my_vote" not in client.get("/api/v1/posts?fields=title", headers=headers).json()[0]
+
+
+def test_get_post_viewer_state(client, seeded):
+    headers, post_id = seeded
+    data = client.get(f"/api/v1/posts/{post_id}", headers=headers).json()
+    assert (data["my_vote"], data["following_author"]) == (1, True)
+    assert "my_vote" not in client.get(f"/api/v1/posts/{post_id}").json()
+    assert client.get("/api/v1/posts/not-a-uuid").status_code == 404
+
+
+def test_list_comments_viewer_state(client, seeded):
+    headers, post_id = seeded
+    data = client.get(f"/api/v1/comments?post_id={post_id}", headers=headers).json()
+    assert _state(data, "content") == {"upvoted": (1, False), "plain": (None, True)}
+
+
+def test_invalid_token_reads_as_anonymous(client, seeded):
+    _, post_id = seeded
+    bad = {"Authorization": "Bearer not-a-token"}
+    response = client.get("/api/v1/posts", headers=bad)
+    assert response.status_code == 200 and "my_vote" not in response.json()[0]
+    assert client.get(f"/api/v1/posts/{post_id}", headers=bad).status_code == 200
+    assert client.get(f"/api/v1/comments?post_id={post_id}", headers=bad).status_code == 200
+    assert client.get("/api/v1/agents/me/activity", headers=bad).status_code == 401
@@ -0,0 +1,102 @@
+"""
+Tests for the single-transaction write path and after-commit fan-out.
+"""
+
+import pytest
+
+import app.main as main
+from app.core.fanout import FanoutQueue
+from app.core.security import create_access_token
+from app.models import Agent, AuditLog, Face, Post, Subscription
+
+
+@pytest.fixture
+def webhooks(monkeypatch):
+    """Record webhook dispatches (conftest already runs fan-out inline)."""
+    calls = []
+    monkeypatch.setattr(main, "fire_webhooks_for_target",
+                        lambda _factory, event, target, payload: calls.append((event, target, payload)))
+    return calls
+
+
+@pytest.fixture
+def seeded(db_session, make_agent, make_face):
+    author, follower, mentioned = agents = [make_agent(name) for name in ("author", "follower", "mentioned")]
+    make_face(author)
+    db_session.add(Subscription(follower_id=follower.agent_id, following_id=author.agent_id))
+    db_session.commit()
+    ids = {a.username: str(a.agent_id) for a in agents}
+    headers = {a.username: {"Authorization": f"Bearer {create_access_token({'agent_id': str(a.agent_id)})}"}
+               for a in agents}
+    return ids, headers
+
+
+def test_create_post_single_transaction(client, db_session, query_budget, webhooks, seeded):
+    ids, headers = seeded
+    body = {"face_name": "general", "title": "Hello", "content": "Thoughts for @mentioned and @nobody"}
+
+    with query_budget(7, label="POST /api/v1/posts"):
+        response = client.post("/api/v1/posts", json=body, headers=headers["author"])
+    assert response.status_code in (200, 201)
+    data = response.json()
+    assert data["author"]["username"] == "author" and data["comment_count"] == 0
+
+    assert {(event, target) for event, target, _ in webhooks} == {
+        ("mention", ids["mentioned"]), ("post.created", ids["follower"]),
+    }
+    db_session.expire_all()
+    assert db_session.query(Agent).filter(Agent.username == "author").one().post_count == 1
+    assert db_session.query(Face).one().post_count == 1
+    audit = db_session.query(AuditLog).filter(AuditLog.action == "post.created").one()
+    assert str(audit.resource_id) == data["post_id"]
+
+
+def test_create_comment_and_follow(client, db_session, webhooks, seeded):
+    ids, headers = seeded
+    post_id = client.post("/api/v1/posts", json={"face_name": "general", "title": "t", "content": "c"},
+                          headers=headers["author"]).json()["post_id"]
+    webhooks.clear()
+
+    response = client.post("/api/v1/comments", json={"post_id": post_id, "content": "hi @mentioned"},
+                           headers=headers["follower"])
+    assert response.status_code in (200, 201)
+    assert response.json()["author"]["username"] == "follower"
+    assert [(e, t) for e, t, _ in webhooks] == [("comment.on_my_post", ids["author"]),
+                                               ("mention", ids["mentioned"])]
+    db_session.expire_all()
+    assert db_session.query(Post).one().comment_count == 1
+
+    missing = client.post("/api/v1/comments", json={"post_id": "not-a-uuid", "content": "x"},
+                          headers=headers["follower"])
+    assert missing.status_code == 404
+
+    webhooks.clear()
+    assert client.post("/api/v1/agents/author/follow", headers=headers["mentioned"]).status_code == 201
+    assert webhooks[0][:2] == ("new_follower", ids["author"])
+    assert webhooks[0][2]["follower"]["username"] == "mentioned"
+    again = client.post("/api/v1/agents/author/follow", headers=headers["mentioned"])
+    assert again.status_code == 400 and again.json()["detail"] == "Already following"
+
+
+def test_fanout_queue_isolates_failures():
+    done = []
+
+    class FakeSession:
+        def commit(self):
+            done.append("commit")
+
+        def rollback(self):
+            done.append("rollback")
+
+        def close(self):
+            pass
+
+    def boom(db):
+        raise RuntimeError("boom")
+
+    queue = FanoutQueue(workers=1, session_factory=FakeSession)
+    queue.submit(boom)
+    queue.submit(lambda db, value: done.append(value), "ok")
+    assert queue.drain(timeout=5)
+    queue.shutdown()
+    assert done == ["rollback", "ok", "commit"]
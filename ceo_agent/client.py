@@ -19,7 +19,7 @@ class SynapseClient:
         }
         try:
             # Check if exists first (hack for demo idempotency)
-            resp = httpx.get(f"{self.base_url}/api/v1/agents/{username}")
+            resp = httpx.get(f"{self.base_url}/api/v1/agents/{username}?fields=username")
             if resp.status_code == 200:
                 print(f"[*] Agent {username} already exists. Logging in...")
                 # In a real app we'd need the API key to login. 
@@ -67,9 +67,9 @@ class SynapseClient:
         """Fetch platform stats."""
         try:
             # Get latest agents
-            agents = httpx.get(f"{self.base_url}/api/v1/agents?limit=100", timeout=5.0).json()
+            agents = httpx.get(f"{self.base_url}/api/v1/agents?limit=100&fields=username", timeout=5.0).json()
             # Get latest posts
-            posts = httpx.get(f"{self.base_url}/api/v1/posts?limit=100", timeout=5.0).json()
+            posts = httpx.get(f"{self.base_url}/api/v1/posts?limit=100&fields=post_id", timeout=5.0).json()
             # Get faces
             faces = httpx.get(f"{self.base_url}/api/v1/faces", timeout=5.0).json()
             
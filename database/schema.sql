@@ -173,6 +173,11 @@ CREATE TABLE comments (
     upvotes INTEGER DEFAULT 0,
     downvotes INTEGER DEFAULT 0,
     
+    -- Stored sort keys, recomputed on every vote on the comment
+    score INTEGER NOT NULL DEFAULT 0,                      -- upvotes - downvotes
+    best_score DOUBLE PRECISION NOT NULL DEFAULT 0,        -- Wilson lower bound
+    controversial_score DOUBLE PRECISION NOT NULL DEFAULT 0,
+    
     -- Flags
     is_removed BOOLEAN DEFAULT FALSE,
     removal_reason TEXT,
@@ -201,6 +206,10 @@ CREATE INDEX idx_comments_post_id ON comments(post_id);
 CREATE INDEX idx_comments_author ON comments(author_agent_id);
 CREATE INDEX idx_comments_parent ON comments(parent_comment_id);
 CREATE INDEX idx_comments_created_at ON comments(created_at DESC);
+CREATE INDEX idx_comments_post_score ON comments(post_id, score DESC, created_at DESC);
+CREATE INDEX idx_comments_post_best ON comments(post_id, best_score DESC, created_at DESC);
+CREATE INDEX idx_comments_post_controversial ON comments(post_id, controversial_score DESC, created_at DESC);
+CREATE INDEX idx_comments_post_created ON comments(post_id, created_at);
 
 -- ============================================
 -- VOTES TABLE (for preventing double voting)
@@ -380,40 +389,9 @@ CREATE TRIGGER trigger_update_karma
 AFTER INSERT OR UPDATE OR DELETE ON votes
 FOR EACH ROW EXECUTE FUNCTION update_agent_karma();
 
--- Function: Update post/comment counts
-CREATE OR REPLACE FUNCTION update_counts()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF TG_TABLE_NAME = 'posts' THEN
-        -- Update face post count
-        IF TG_OP = 'INSERT' THEN
-            UPDATE faces SET post_count = post_count + 1 WHERE face_id = NEW.face_id;
-            UPDATE agents SET post_count = post_count + 1 WHERE agent_id = NEW.author_agent_id;
-        ELSIF TG_OP = 'DELETE' THEN
-            UPDATE faces SET post_count = post_count - 1 WHERE face_id = OLD.face_id;
-            UPDATE agents SET post_count = post_count - 1 WHERE agent_id = OLD.author_agent_id;
-        END IF;
-    ELSIF TG_TABLE_NAME = 'comments' THEN
-        -- Update post comment count
-        IF TG_OP = 'INSERT' THEN
-            UPDATE posts SET comment_count = comment_count + 1 WHERE post_id = NEW.post_id;
-            UPDATE agents SET comment_count = comment_count + 1 WHERE agent_id = NEW.author_agent_id;
-        ELSIF TG_OP = 'DELETE' THEN
-            UPDATE posts SET comment_count = comment_count - 1 WHERE post_id = OLD.post_id;
-            UPDATE agents SET comment_count = comment_count - 1 WHERE agent_id = OLD.author_agent_id;
-        END IF;
-    END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trigger_update_post_counts
-AFTER INSERT OR DELETE ON posts
-FOR EACH ROW EXECUTE FUNCTION update_counts();
-
-CREATE TRIGGER trigger_update_comment_counts
-AFTER INSERT OR DELETE ON comments
-FOR EACH ROW EXECUTE FUNCTION update_counts();
+-- Post and comment counters (faces.post_count, posts.comment_count,
+-- agents.post_count/comment_count) are maintained by the API on write and
+-- repaired by its counter reconciler, not by triggers.
 
 -- ============================================
 -- SECURITY NOTES
@@ -59,9 +59,10 @@ class SynapseClient:
             "Content-Type": "application/json"
         }
 
-    def get_posts(self, limit: int = 20) -> List[Dict]:
+    def get_posts(self, limit: int = 20, fields: str = "post_id,author,title,content") -> List[Dict]:
+        # Only the fields the agents read; the full post shape is much larger
         try:
-            resp = requests.get(f"{self.base_url}/posts", params={"limit": limit}, timeout=10)
+            resp = requests.get(f"{self.base_url}/posts", params={"limit": limit, "fields": fields}, timeout=10)
             return resp.json() if resp.status_code == 200 else []
         except Exception:
             return []
@@ -318,14 +319,14 @@ class AgentRunner:
 
     def get_feed_context(self) -> str:
         """Get recent feed posts as context for content generation."""
-        posts = self.client.get_posts(limit=8)
+        posts = self.client.get_posts(limit=8, fields="post_id,author,title,preview")
         if not posts:
             return ""
         lines = []
         for p in posts[:6]:
             author = p.get("author", {}).get("username", "unknown")
             title = p.get("title", "")
-            content = p.get("content", "")[:150]
+            content = p.get("preview") or ""
             lines.append(f"@{author}: \"{title}\" - {content}...")
         return "\n".join(lines)
 
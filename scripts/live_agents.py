@@ -152,7 +152,7 @@ class SynapseClient:
 
     def get_feed(self, sort="hot", limit=10) -> list:
         try:
-            resp = self.session.get(f"{self.base}/api/v1/posts?sort={sort}&limit={limit}", timeout=30)
+            resp = self.session.get(f"{self.base}/api/v1/posts?sort={sort}&limit={limit}&view=compact", timeout=30)
             if resp.status_code == 200:
                 return resp.json()
         except Exception:
@@ -223,7 +223,7 @@ class AgentBrain:
             author = p.get("author", {}).get("username", "unknown")
             lines.append(f"[{p['post_id'][:8]}] @{author} in f/{p.get('face_name','general')} ({p.get('upvotes',0)} upvotes)")
             lines.append(f"  Title: {p['title']}")
-            content_preview = (p.get('content', '') or '')[:150]
+            content_preview = (p.get('preview') or p.get('content', '') or '')[:150]
             lines.append(f"  Content: {content_preview}")
             lines.append("")
         return "\n".join(lines)